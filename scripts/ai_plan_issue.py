@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 """
-Create a task breakdown plan for a GitHub Issue using an LLM (OpenAI) and post it as a comment.
+Create a task breakdown plan for a GitHub Issue using an LLM (OpenAI or Anthropic) and post it as a comment.
 
 Usage in Actions:
 - Triggered when someone comments "/plan" on an issue (or via workflow_dispatch).
-- Requires OPENAI_API_KEY; otherwise no-ops gracefully.
+- Requires OPENAI_API_KEY or ANTHROPIC_API_KEY; otherwise no-ops gracefully.
+  PLAN_PROVIDER=openai|anthropic|auto selects the provider (auto prefers OpenAI).
+  PLAN_RACE=1 with both keys set queries both providers and keeps the first answer.
 
 Security notes:
 - Reads issue via GITHUB_TOKEN. Does not write code, only comments a suggested plan.
@@ -12,21 +14,33 @@ Security notes:
 """
 from __future__ import annotations
 
+import asyncio
+import atexit
+import functools
+import hashlib
 import json
 import os
-import sys
-from datetime import datetime
-from typing import Any, Dict, Optional, Tuple
+import time
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from typing import Any
 import argparse
-import difflib
 
 try:
-    from github import Github  # type: ignore
-except Exception:
-    Github = None
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+GITHUB_API = "https://api.github.com"
+ISSUE_QUERY = (
+    "query($o:String!,$r:String!,$n:Int!)"
+    "{repository(owner:$o,name:$r){issue(number:$n){title body}}}"
+)
 
 
 MODEL = os.environ.get("PLAN_MODEL", "gpt-4o-mini")
+ANTHROPIC_MODEL = os.environ.get("PLAN_ANTHROPIC_MODEL", "claude-3-5-haiku-latest")
+# Which provider to use: "openai", "anthropic", or "auto" (OpenAI when its key is set, else Anthropic)
+PROVIDER = os.environ.get("PLAN_PROVIDER", "auto").lower()
 
 SYSTEM_PROMPT = (
     "You are an expert software project planner. Given a GitHub issue, produce a short, actionable plan: "
@@ -37,53 +51,174 @@ SYSTEM_PROMPT = (
 )
 
 
-def validate_plan_schema(plan_text: str) -> Tuple[bool, Optional[str]]:
-    """Validate LLM-produced plan text against docs/schema/plan_schema.json if present.
+# Directories already created by this process; skips repeat makedirs syscalls.
+_MKDIR_DONE: set[str] = set()
 
-    If schema is missing, returns (True, None). If schema exists, expects the plan to be valid JSON matching schema.
+
+def _ensure_dir(path: str) -> None:
+    if path not in _MKDIR_DONE:
+        os.makedirs(path, exist_ok=True)
+        _MKDIR_DONE.add(path)
+
+
+def _write_text_atomic(path: str, text: str) -> None:
+    """Write text via a temp file and os.replace so an interrupted run never leaves a partial file.
+
+    The temp name carries the PID so concurrent runs never clobber each other's temp file.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class PlanCache:
+    """Small on-disk cache of LLM plan responses keyed by a SHA-256 of the request.
+
+    Enabled with PLAN_CACHE_ENABLED=1. Entries older than PLAN_CACHE_TTL seconds
+    (default 86400) are treated as misses. Writes are atomic via os.replace so an
+    interrupted run never leaves a truncated entry behind.
+    """
+
+    def __init__(self, directory: str, ttl: float) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                self.misses += 1
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                content = json.load(f)["content"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return content
+
+    def set(self, key: str, content: str) -> None:
+        _ensure_dir(self.directory)
+        _write_text_atomic(self._path(key), json.dumps({"content": content}))
+
+    def report(self) -> None:
+        if self.hits or self.misses:
+            print(f"Plan cache: {self.hits} hit(s), {self.misses} miss(es)")
+
+
+_PLAN_CACHE: PlanCache | None = None
+
+
+def _get_plan_cache() -> PlanCache | None:
+    """Return the process-wide plan cache, or None when caching is disabled."""
+    global _PLAN_CACHE
+    if os.environ.get("PLAN_CACHE_ENABLED") != "1":
+        return None
+    if _PLAN_CACHE is None:
+        try:
+            ttl = float(os.environ.get("PLAN_CACHE_TTL", "86400"))
+        except ValueError:
+            ttl = 86400.0
+        _PLAN_CACHE = PlanCache(os.path.join(os.getcwd(), "tmp", "ai-plan-cache"), ttl)
+        atexit.register(_PLAN_CACHE.report)
+    return _PLAN_CACHE
+
+
+def _cache_key(model: str, system: str, user: str) -> str:
+    payload = json.dumps({"m": model, "s": system, "u": user}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def prompt_digest(prompt: str) -> str:
+    """SHA-256 of the user prompt, computed once per run and shared by the cache and file names."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_plan_validator(schema_path: str) -> tuple[bool, Callable[[Any], str | None] | None]:
+    """Load and compile the plan schema once per process.
+
+    Returns (schema_exists, check) where check(payload) returns an error message
+    or None. check is None when neither fastjsonschema nor jsonschema is installed.
+    fastjsonschema is preferred because it generates a specialized validator.
     """
-    schema_path = os.path.join(os.getcwd(), "docs", "schema", "plan_schema.json")
     if not os.path.exists(schema_path):
-        return True, None
+        return False, None
+    with open(schema_path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+
+    try:
+        import fastjsonschema  # type: ignore
+    except ImportError:
+        fastjsonschema = None
+    if fastjsonschema is not None:
+        compiled = fastjsonschema.compile(schema)
+
+        def check_fast(payload: Any) -> str | None:
+            try:
+                compiled(payload)
+            except fastjsonschema.JsonSchemaException as e:
+                return str(e)
+            return None
+
+        return True, check_fast
+
     try:
         from jsonschema import validate, ValidationError  # type: ignore
     except Exception:
-        return True, "jsonschema not installed; skipping schema validation"
+        return True, None
 
-    try:
-        payload = json.loads(plan_text)
-    except json.JSONDecodeError:
-        return False, "Model output is not valid JSON but schema exists at docs/schema/plan_schema.json"
+    def check(payload: Any) -> str | None:
+        try:
+            validate(instance=payload, schema=schema)
+        except ValidationError as e:
+            return str(e)
+        return None
 
-    with open(schema_path, "r", encoding="utf-8") as f:
-        schema = json.load(f)
-    try:
-        validate(instance=payload, schema=schema)
-    except ValidationError as e:
-        return False, str(e)
-    return True, None
+    return True, check
 
 
-def ensure_pygithub() -> None:
-    """Install and import PyGithub only when we need to post to GitHub.
+def validate_plan_schema(plan_text: str) -> tuple[bool, str | None]:
+    """Validate LLM-produced plan text against docs/schema/plan_schema.json if present.
 
-    This should not be called in dry-run mode so we avoid side effects.
+    If schema is missing, returns (True, None). If schema exists, expects the plan to be valid JSON matching schema.
     """
-    global Github
-    if Github is not None:
-        return
-    import subprocess
+    schema_path = os.path.join(os.getcwd(), "docs", "schema", "plan_schema.json")
+    schema_exists, check = _load_plan_validator(schema_path)
+    if not schema_exists:
+        return True, None
+    if check is None:
+        return True, "jsonschema not installed; skipping schema validation"
+
+    not_json = "Model output is not valid JSON but schema exists at docs/schema/plan_schema.json"
+    # Plans are usually prose bullets; reject those without running the JSON tokenizer.
+    stripped = plan_text.lstrip()
+    if not stripped or stripped[0] not in "{[":
+        return False, not_json
+    try:
+        payload = json.loads(stripped)
+    except json.JSONDecodeError:
+        return False, not_json
 
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "PyGithub>=2.3.0"])  # noqa: S603,S607
-    from github import Github as _Github  # type: ignore
+    error = check(payload)
+    if error is not None:
+        return False, error
+    return True, None
 
-    Github = _Github
 
-def _parse_event_issue(event_path: Optional[str]) -> Optional[int]:
+def _parse_event_issue(event_path: str | None) -> int | None:
     if not event_path or not os.path.exists(event_path):
         return None
-    with open(event_path, "r", encoding="utf-8") as f:
-        event = json.load(f)
+    with open(event_path, "rb") as f:
+        raw = f.read()
+    # Event payloads can be tens of KB; orjson parses them several times faster.
+    event = orjson.loads(raw) if orjson is not None else json.loads(raw)
     if event.get("issue") and event["issue"].get("number"):
         return int(event["issue"]["number"])
     return None
@@ -91,7 +226,7 @@ def _parse_event_issue(event_path: Optional[str]) -> Optional[int]:
 
 
 
-def get_issue_context(dry_run: bool = False) -> tuple[int, Optional[str], Optional[str]]:
+def get_issue_context(dry_run: bool = False) -> tuple[int, str | None, str | None]:
 
     """Return (issue_number, owner, repo_name).
 
@@ -103,7 +238,7 @@ def get_issue_context(dry_run: bool = False) -> tuple[int, Optional[str], Option
     repo_slug = os.environ.get("GITHUB_REPOSITORY")
 
     # Default to the issue from the comment event (if available)
-    issue_number: Optional[int] = None
+    issue_number: int | None = None
     issue_number = _parse_event_issue(os.environ.get("GITHUB_EVENT_PATH"))
 
     if not issue_number:
@@ -126,25 +261,154 @@ def get_issue_context(dry_run: bool = False) -> tuple[int, Optional[str], Option
     return issue_number or 0, owner, repo_name
 
 
-def call_llm(prompt: str) -> str:
-    # OpenAI only
-    openai_key = os.environ.get("OPENAI_API_KEY")
-    if not openai_key:
-        return (
-            "No LLM key configured. Skipping plan generation.\n"
-            "Set OPENAI_API_KEY secret to enable."
-        )
+_HTTP_CLIENT: Any = None
+
 
+def _get_http_client() -> Any:
+    """Return a module-level HTTP client so repeated LLM calls reuse one TLS connection.
+
+    Prefers httpx (with HTTP/2 when the optional h2 package is installed) and
+    falls back to a requests.Session. Both expose a compatible post().
+    """
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        return _HTTP_CLIENT
     try:
-        import requests  # type: ignore
-    except Exception:
-        import subprocess
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "requests>=2.31.0"])  # noqa: S603,S607
-        import requests  # type: ignore  # noqa: E402
+        import httpx  # type: ignore
 
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {openai_key}", "Content-Type": "application/json"}
-    data: Dict[str, Any] = {
+        try:
+            _HTTP_CLIENT = httpx.Client(http2=True)
+        except ImportError:
+            # http2=True requires the optional 'h2' package (httpx[http2])
+            _HTTP_CLIENT = httpx.Client()
+    except ImportError:
+        try:
+            import requests  # type: ignore
+        except ImportError:
+            raise SystemExit("Neither httpx nor requests is installed; install with: pip install 'httpx[http2]>=0.27'")
+        _HTTP_CLIENT = requests.Session()
+    atexit.register(_HTTP_CLIENT.close)
+    return _HTTP_CLIENT
+
+
+def _stream_lines(client: Any, url: str, headers: dict[str, str], body: bytes) -> Iterator[str]:
+    """POST a pre-serialized JSON body and yield decoded response lines as they arrive."""
+    if hasattr(client, "stream"):
+        # httpx
+        with client.stream("POST", url, headers=headers, content=body, timeout=60) as r:
+            r.raise_for_status()
+            yield from r.iter_lines()
+        return
+    # requests.Session
+    with client.post(url, headers=headers, data=body, timeout=60, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            yield line or ""
+
+
+def _github_headers(token: str) -> dict[str, str]:
+    return {"Authorization": f"bearer {token}", "Accept": "application/vnd.github+json"}
+
+
+def fetch_issue(token: str, owner: str | None, repo_name: str | None, issue_number: int) -> tuple[str, str]:
+    """Return (title, body) of an issue with a single GraphQL request."""
+    r = _get_http_client().post(
+        f"{GITHUB_API}/graphql",
+        headers=_github_headers(token),
+        json={"query": ISSUE_QUERY, "variables": {"o": owner, "r": repo_name, "n": issue_number}},
+        timeout=30,
+    )
+    r.raise_for_status()
+    payload = r.json()
+    issue = ((payload.get("data") or {}).get("repository") or {}).get("issue")
+    if issue is None:
+        errors = payload.get("errors") or [{"message": "not found"}]
+        raise SystemExit(f"Could not fetch issue #{issue_number}: {errors[0].get('message')}")
+    return issue.get("title") or "", issue.get("body") or ""
+
+
+def post_issue_comment(token: str, owner: str | None, repo_name: str | None, issue_number: int, body: str) -> None:
+    r = _get_http_client().post(
+        f"{GITHUB_API}/repos/{owner}/{repo_name}/issues/{issue_number}/comments",
+        headers=_github_headers(token),
+        json={"body": body},
+        timeout=30,
+    )
+    r.raise_for_status()
+
+
+def _collect_sse_content(lines: Iterable[str]) -> str:
+    """Concatenate the text deltas of an OpenAI or Anthropic SSE stream.
+
+    OpenAI sends chat-completion chunks with choices[0].delta.content and ends with
+    "data: [DONE]"; Anthropic sends content_block_delta events with delta.text and
+    ends with a message_stop event.
+    """
+    parts: list[str] = []
+    for line in lines:
+        if not line.startswith("data:"):
+            continue
+        frame = line[5:].strip()
+        if frame == "[DONE]":
+            break
+        try:
+            event = json.loads(frame)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(event, dict):
+            continue
+        event_type = event.get("type")
+        if event_type == "message_stop":
+            break
+        if event_type == "content_block_delta":
+            piece = (event.get("delta") or {}).get("text")
+        else:
+            choices = event.get("choices") or []
+            piece = (choices[0].get("delta") or {}).get("content") if choices else None
+        if piece:
+            parts.append(piece)
+    return "".join(parts)
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _body_prefix(static: dict[str, Any]) -> bytes:
+    """Serialize the constant part of a request once, leaving "messages" open for the user turn.
+
+    static must end with its "messages" list so the encoded bytes end in ']}'.
+    """
+    return _dumps(static)[:-2] + (b',' if static["messages"] else b'') + b'{"role":"user","content":'
+
+
+# The model, system prompt and sampling settings never change within a run, so
+# their JSON is built once at import and only the user prompt is encoded per call.
+_OPENAI_BODY_PREFIX = _body_prefix({
+    "model": MODEL,
+    "temperature": 0.2,
+    "stream": True,
+    "messages": [{"role": "system", "content": SYSTEM_PROMPT}],
+})
+_ANTHROPIC_BODY_PREFIX = _body_prefix({
+    "model": ANTHROPIC_MODEL,
+    "system": SYSTEM_PROMPT,
+    "max_tokens": 1024,
+    "temperature": 0.2,
+    "stream": True,
+    "messages": [],
+})
+_BODY_SUFFIX = b"}]}"
+
+
+def _request_body(prefix: bytes, prompt: str) -> bytes:
+    return prefix + _dumps(prompt) + _BODY_SUFFIX
+
+
+def _openai_body(prompt: str) -> dict[str, Any]:
+    return {
         "model": MODEL,
         "messages": [
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -152,20 +416,279 @@ def call_llm(prompt: str) -> str:
         ],
         "temperature": 0.2,
     }
-    r = requests.post(url, headers=headers, json=data, timeout=60)
-    r.raise_for_status()
-    j = r.json()
-    content = j["choices"][0]["message"]["content"].strip()
+
+
+def _openai_request(prompt: str, api_key: str) -> tuple[str, dict[str, str], bytes]:
+    url = "https://api.openai.com/v1/chat/completions"
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    return url, headers, _request_body(_OPENAI_BODY_PREFIX, prompt)
+
+
+def _anthropic_request(prompt: str, api_key: str) -> tuple[str, dict[str, str], bytes]:
+    url = "https://api.anthropic.com/v1/messages"
+    headers = {
+        "x-api-key": api_key,
+        "anthropic-version": "2023-06-01",
+        "Content-Type": "application/json",
+    }
+    return url, headers, _request_body(_ANTHROPIC_BODY_PREFIX, prompt)
+
+
+def _call_openai(prompt: str, api_key: str) -> str:
+    return _collect_sse_content(_stream_lines(_get_http_client(), *_openai_request(prompt, api_key))).strip()
+
+
+def _call_anthropic(prompt: str, api_key: str) -> str:
+    return _collect_sse_content(_stream_lines(_get_http_client(), *_anthropic_request(prompt, api_key))).strip()
+
+
+async def _first_success(coros: Iterable[Awaitable[str]]) -> str:
+    """Run coroutines concurrently and return the first non-empty result, cancelling the rest.
+
+    Re-raises the last error if every coroutine fails.
+    """
+    pending = {asyncio.ensure_future(c) for c in coros}
+    error: BaseException | None = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                elif task.result():
+                    return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+    raise error or RuntimeError("All LLM providers returned an empty plan")
+
+
+async def _race_providers(prompt: str, openai_key: str, anthropic_key: str) -> str:
+    """Send the prompt to OpenAI and Anthropic at once and keep whichever answers first."""
+    import httpx  # type: ignore
+
+    async with httpx.AsyncClient(timeout=60) as client:
+
+        async def run(url: str, headers: dict[str, str], body: bytes) -> str:
+            async with client.stream("POST", url, headers=headers, content=body) as r:
+                r.raise_for_status()
+                lines = [line async for line in r.aiter_lines()]
+            return _collect_sse_content(lines).strip()
+
+        return await _first_success([
+            run(*_openai_request(prompt, openai_key)),
+            run(*_anthropic_request(prompt, anthropic_key)),
+        ])
+
+
+def _race_enabled(openai_key: str | None, anthropic_key: str | None) -> bool:
+    if os.environ.get("PLAN_RACE") != "1" or not (openai_key and anthropic_key):
+        return False
+    try:
+        import httpx  # type: ignore  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def call_llm(prompt: str, prompt_hash: str | None = None) -> str:
+    openai_key = os.environ.get("OPENAI_API_KEY")
+    anthropic_key = os.environ.get("ANTHROPIC_API_KEY")
+    if PROVIDER == "openai":
+        anthropic_key = None
+    elif PROVIDER == "anthropic":
+        openai_key = None
+    if not openai_key and not anthropic_key:
+        return (
+            "No LLM key configured. Skipping plan generation.\n"
+            "Set OPENAI_API_KEY (or ANTHROPIC_API_KEY) secret to enable."
+        )
+    race = _race_enabled(openai_key, anthropic_key)
+    if race:
+        model = f"{MODEL}|{ANTHROPIC_MODEL}"
+    else:
+        model = MODEL if openai_key else ANTHROPIC_MODEL
+
+    cache = _get_plan_cache()
+    if cache is not None and prompt_hash is None:
+        prompt_hash = prompt_digest(prompt)
+    key = _cache_key(model, SYSTEM_PROMPT, prompt_hash) if cache is not None else ""  # type: ignore[arg-type]
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    if race:
+        content = asyncio.run(_race_providers(prompt, openai_key, anthropic_key))  # type: ignore[arg-type]
+    elif openai_key:
+        content = _call_openai(prompt, openai_key)
+    else:
+        content = _call_anthropic(prompt, anthropic_key)  # type: ignore[arg-type]
+    if cache is not None:
+        cache.set(key, content)
     return content
 
 
+def build_prompt(owner: str | None, repo_name: str | None, issue_number: int, title: str, body: str) -> str:
+    return (
+        f"Repo: {owner}/{repo_name}\nIssue #{issue_number}: {title}\n\n"
+        f"Body:\n{body}\n\n"
+        "Produce a concise, step-by-step implementation plan aligned to the repo layout."
+    )
+
+
+BATCH_DIR = os.path.join("tmp", "ai-plan-batch")
+BATCH_TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_batch_jsonl(prompts: dict[int, str]) -> str:
+    """Return the OpenAI Batch API input file: one chat-completions request per issue."""
+    lines = []
+    for number, prompt in prompts.items():
+        lines.append(json.dumps({
+            "custom_id": f"issue-{number}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _openai_body(prompt),
+        }))
+    return "\n".join(lines) + "\n"
+
+
+def parse_batch_output(text: str) -> dict[int, str]:
+    """Map issue number -> plan content from a Batch API output file; failed lines are skipped."""
+    plans: dict[int, str] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            number = int(str(row["custom_id"]).split("-", 1)[1])
+            content = row["response"]["body"]["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            continue
+        plans[number] = content.strip()
+    return plans
+
+
+def _run_openai_batch(prompts: dict[int, str], api_key: str, state_path: str) -> dict[int, str]:
+    """Submit prompts as one OpenAI batch (or resume a saved one) and wait for the results.
+
+    The batch id is persisted to state_path right after submission, so an
+    interrupted run resumes polling the same batch instead of paying for a new one.
+    """
+    client = _get_http_client()
+    auth = {"Authorization": f"Bearer {api_key}"}
+    base = "https://api.openai.com/v1"
+
+    state: dict[str, Any] = {}
+    if os.path.exists(state_path):
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    if state.get("issues") != sorted(prompts):
+        state = {}
+
+    if not state.get("batch_id"):
+        r = client.post(
+            f"{base}/files",
+            headers=auth,
+            data={"purpose": "batch"},
+            files={"file": ("plans.jsonl", build_batch_jsonl(prompts).encode("utf-8"), "application/jsonl")},
+            timeout=60,
+        )
+        r.raise_for_status()
+        r = client.post(
+            f"{base}/batches",
+            headers=auth,
+            json={"input_file_id": r.json()["id"], "endpoint": "/v1/chat/completions", "completion_window": "24h"},
+            timeout=60,
+        )
+        r.raise_for_status()
+        state = {"batch_id": r.json()["id"], "issues": sorted(prompts)}
+        _write_text_atomic(state_path, json.dumps(state))
+        print(f"Submitted batch {state['batch_id']} for {len(prompts)} issue(s).")
+
+    try:
+        interval = float(os.environ.get("PLAN_BATCH_POLL_SECONDS", "30"))
+    except ValueError:
+        interval = 30.0
+    while True:
+        r = client.get(f"{base}/batches/{state['batch_id']}", headers=auth, timeout=60)
+        r.raise_for_status()
+        batch = r.json()
+        if batch.get("status") in BATCH_TERMINAL:
+            break
+        time.sleep(interval)
+
+    os.remove(state_path)
+    if batch.get("status") != "completed" or not batch.get("output_file_id"):
+        raise SystemExit(f"Batch {state['batch_id']} ended with status '{batch.get('status')}'")
+    r = client.get(f"{base}/files/{batch['output_file_id']}/content", headers=auth, timeout=120)
+    r.raise_for_status()
+    return parse_batch_output(r.text)
+
+
+def run_batch(issue_numbers: list[int], dry_run: bool) -> None:
+    """Plan several issues with one OpenAI Batch API job (half price, asynchronous)."""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        print("No OPENAI_API_KEY configured; the Batch API is OpenAI-only. Skipping.")
+        return
+    token = os.environ.get("GITHUB_TOKEN")
+    repo_slug = os.environ.get("GITHUB_REPOSITORY")
+    if not token or not repo_slug:
+        raise SystemExit("GITHUB_TOKEN and GITHUB_REPOSITORY are required for --batch")
+    owner, repo_name = repo_slug.split("/", 1)
+
+    issues = {n: fetch_issue(token, owner, repo_name, n) for n in issue_numbers}
+    prompts = {n: build_prompt(owner, repo_name, n, title, body) for n, (title, body) in issues.items()}
+
+    _ensure_dir(BATCH_DIR)
+    plans = _run_openai_batch(prompts, api_key, os.path.join(BATCH_DIR, "state.json"))
+
+    timestamp = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime())
+    out_dir = os.path.join(os.getcwd(), "tmp", "ai-plan-dryrun")
+    for number in issues:
+        plan = plans.get(number)
+        if plan is None:
+            print(f"Issue #{number}: no plan returned by batch")
+            continue
+        comment = f"Automated plan ({timestamp}):\n\n{plan}"
+        if dry_run:
+            _ensure_dir(out_dir)
+            out_file = os.path.join(out_dir, f"issue-{number}-plan-{prompt_digest(prompts[number])[:16]}.txt")
+            _write_text_atomic(out_file, comment)
+            print(f"DRY-RUN: wrote plan to {out_file}")
+            continue
+        valid_schema, schema_msg = validate_plan_schema(plan)
+        if not valid_schema:
+            print(f"Issue #{number}: plan does not conform to schema: {schema_msg}")
+            post_issue_comment(token, owner, repo_name, number, f"Automated plan generation failed schema validation: {schema_msg}")
+            continue
+        post_issue_comment(token, owner, repo_name, number, comment)
+        print(f"Issue #{number}: posted plan comment.")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Generate an implementation plan for a GitHub issue using an LLM")
     parser.add_argument("--dry-run", action="store_true", help="Do not post comment; write plan to tmp/ai-plan-dryrun/")
+    parser.add_argument(
+        "--batch",
+        type=str,
+        default=os.environ.get("ISSUE_NUMBERS", ""),
+        help="Comma-separated issue numbers to plan together via the OpenAI Batch API",
+    )
     args = parser.parse_args()
 
     dry_run = args.dry_run or os.environ.get("DRY_RUN") == "1"
 
+    if args.batch:
+        try:
+            numbers = sorted({int(n) for n in args.batch.replace(",", " ").split()})
+        except ValueError:
+            raise SystemExit("--batch expects comma-separated issue numbers")
+        run_batch(numbers, dry_run)
+        return
+
     token = os.environ.get("GITHUB_TOKEN")
     if not token and not dry_run:
         raise SystemExit("GITHUB_TOKEN missing")
@@ -174,53 +697,44 @@ def main() -> None:
     # will not raise if env vars are missing.
     issue_number, owner, repo_name = get_issue_context(dry_run=dry_run)
 
-    gh = None
-    repo = None
-    issue = None
-    # Only import/initialize PyGithub and fetch the real issue when we intend to
-    # post (not dry-run) and a token is available.
-    if not dry_run and token:
-        ensure_pygithub()
-        assert Github is not None, "PyGithub not initialized"
-        gh = Github(token)
-        repo = gh.get_repo(f"{owner}/{repo_name}")
-        issue = repo.get_issue(number=issue_number)
-
-    # Build prompt from issue title and body
-    title = issue.title if issue is not None else os.environ.get("ISSUE_TITLE", "")
-    body = issue.body or "" if issue is not None else os.environ.get("ISSUE_BODY", "")
-
-    prompt = (
-        f"Repo: {owner}/{repo_name}\nIssue #{issue_number}: {title}\n\n"
-        f"Body:\n{body}\n\n"
-        "Produce a concise, step-by-step implementation plan aligned to the repo layout."
-    )
+    # Only fetch the real issue when we intend to post (not dry-run) and a
+    # token is available; otherwise fall back to ISSUE_TITLE/ISSUE_BODY.
+    post = not dry_run and bool(token)
+    if post:
+        title, body = fetch_issue(token, owner, repo_name, issue_number)  # type: ignore[arg-type]
+    else:
+        title = os.environ.get("ISSUE_TITLE", "")
+        body = os.environ.get("ISSUE_BODY", "")
+
+    prompt = build_prompt(owner, repo_name, issue_number, title, body)
+    prompt_hash = prompt_digest(prompt)
 
-    plan = call_llm(prompt)
+    # Timestamp and output directory do not depend on the plan; set them up first
+    timestamp = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime())
+    out_dir = os.path.join(os.getcwd(), "tmp", "ai-plan-dryrun")
+    if not post:
+        _ensure_dir(out_dir)
+
+    plan = call_llm(prompt, prompt_hash)
 
     # Optional schema validation: enforce only in non-dry-run mode
     if not dry_run:
         valid_schema, schema_msg = validate_plan_schema(plan)
         if not valid_schema:
-            print(f"Plan does not conform to schema: {schema_msg}")
-            if issue is not None:
-                issue.create_comment(f"Automated plan generation failed schema validation: {schema_msg}")
+            print(f"Plan does not conform to schema (prompt {prompt_hash[:16]}): {schema_msg}")
+            if post:
+                post_issue_comment(token, owner, repo_name, issue_number, f"Automated plan generation failed schema validation: {schema_msg}")  # type: ignore[arg-type]
             return
 
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
     comment = f"Automated plan ({timestamp}):\n\n{plan}"
-    if not dry_run and issue is not None:
-        issue.create_comment(comment)
+    if post:
+        post_issue_comment(token, owner, repo_name, issue_number, comment)  # type: ignore[arg-type]
         print("Posted plan comment.")
     else:
-        out_dir = os.path.join(os.getcwd(), "tmp", "ai-plan-dryrun")
-        os.makedirs(out_dir, exist_ok=True)
-        
         file_issue_part = f"{issue_number}" if issue_number != 0 else "unknown"
-        out_file = os.path.join(out_dir, f"issue-{file_issue_part}-plan.txt")
-
-        with open(out_file, "w", encoding="utf-8") as f:
-            f.write(comment)
+        # Identical input maps to the same file on re-runs; different input does not clobber it.
+        out_file = os.path.join(out_dir, f"issue-{file_issue_part}-plan-{prompt_hash[:16]}.txt")
+        _write_text_atomic(out_file, comment)
         print(f"DRY-RUN: wrote plan to {out_file}")
 
 
@@ -15,6 +15,7 @@ Checks:
 """
 from __future__ import annotations
 
+import functools
 import os
 import re
 import sys
@@ -22,14 +23,48 @@ from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 
+_FLASK_SRC_RE = re.compile(r"\bfrom\s+flask\b|\bimport\s+flask\b|\bFlask\b")
+_FASTAPI_APP_RE = re.compile(r"app\s*=\s*FastAPI\(")
+# One pass over app.py; each named group marks a required endpoint.
+_ENDPOINTS = {
+    "compute": "POST /api/compute",
+    "health": "GET /api/health",
+    "version": "GET /api/version",
+}
+_ENDPOINTS_COMBINED = re.compile(
+    r"(?P<compute>@app\.post\(\s*[\"']/api/compute[\"'])"
+    r"|(?P<health>@app\.get\(\s*[\"']/api/health[\"'])"
+    r"|(?P<version>@app\.get\(\s*[\"']/api/version[\"'])"
+)
+_CORE_REQUIRED_RES = [
+    (p, re.compile(p))
+    for p in (
+        r"@dataclass\([^)]*\bfrozen=True\b[^)]*\)",
+        r"class\s+Result\b",
+        r"def\s+_parse_pair_mgrs_digits\(",
+        r"def\s+compute_distance_bearing_xy\(",
+        r"def\s+_deg_to_mils\(",
+    )
+]
+# Substring tests run first; the word-boundary regexes only confirm a hit.
+_TESTS_SRC_RE = re.compile(r"\bsrc\.pop_fly\b")
+_TESTS_FLASK_RE = re.compile(r"\bFlask\b|\bfrom\s+flask\b")
+_PYPROJ_FLASK_RE = re.compile(r"\bflask\b", re.IGNORECASE)
 
-def read_text(path: Path) -> str:
+
+@functools.lru_cache(maxsize=None)
+def _read_text_cached(path: str) -> str:
     try:
-        return path.read_text(encoding="utf-8")
+        return Path(path).read_text(encoding="utf-8")
     except FileNotFoundError:
         return ""
 
 
+def read_text(path: Path) -> str:
+    """Read a file once per run; later checks on the same path reuse the text."""
+    return _read_text_cached(str(path))
+
+
 def fail(msg: str) -> None:
     print(f"ARCH GUARD: FAIL: {msg}")
     sys.exit(1)
@@ -44,18 +79,14 @@ def check_fastapi_and_endpoints() -> None:
     txt = read_text(web)
     if not txt:
         fail(f"Missing {web}")
-    if re.search(r"\bfrom\s+flask\b|\bimport\s+flask\b|\bFlask\b", txt):
+    if _FLASK_SRC_RE.search(txt):
         fail("Flask usage detected; FastAPI is required")
-    if "FastAPI" not in txt or re.search(r"app\s*=\s*FastAPI\(", txt) is None:
+    if "FastAPI" not in txt or _FASTAPI_APP_RE.search(txt) is None:
         fail("FastAPI app not found in web/app.py")
-    endpoint_patterns = [
-        r"@app\.post\(\s*[\"']\/api\/compute[\"']",
-        r"@app\.get\(\s*[\"']\/api\/health[\"']",
-        r"@app\.get\(\s*[\"']\/api\/version[\"']",
-    ]
-    for pat in endpoint_patterns:
-        if re.search(pat, txt) is None:
-            fail(f"Missing endpoint matching pattern: {pat} in web/app.py")
+    found = {m.lastgroup for m in _ENDPOINTS_COMBINED.finditer(txt)}
+    missing = [route for name, route in _ENDPOINTS.items() if name not in found]
+    if missing:
+        fail(f"Missing endpoint(s) in web/app.py: {', '.join(missing)}")
 
 
 def check_core_symbols() -> None:
@@ -63,15 +94,8 @@ def check_core_symbols() -> None:
     txt = read_text(core)
     if not txt:
         fail(f"Missing {core}")
-    required = [
-        r"@dataclass\(frozen=True\)",
-        r"class\s+Result\b",
-        r"def\s+_parse_pair_mgrs_digits\(",
-        r"def\s+compute_distance_bearing_xy\(",
-        r"def\s+_deg_to_mils\(",
-    ]
-    for pat in required:
-        if re.search(pat, txt) is None:
+    for pat, rx in _CORE_REQUIRED_RES:
+        if rx.search(txt) is None:
             fail(f"Missing required core symbol matching: {pat}")
 
 
@@ -82,9 +106,9 @@ def check_tests() -> None:
         txt = read_text(tf)
         if not txt:
             fail(f"Missing required test file {tf}")
-        if re.search(r"\bsrc\.pop_fly\b", txt):
+        if "src.pop_fly" in txt and _TESTS_SRC_RE.search(txt):
             fail(f"Tests must import from 'pop_fly', not 'src.pop_fly': {tf}")
-        if re.search(r"\bFlask\b|\bfrom\s+flask\b", txt):
+        if ("Flask" in txt or "flask" in txt) and _TESTS_FLASK_RE.search(txt):
             fail(f"Flask usage detected in tests: {tf}")
 
 
@@ -94,7 +118,7 @@ def check_pyproject_no_flask() -> None:
     if not txt:
         warn("pyproject.toml not found; skipping dependency checks")
         return
-    if re.search(r"\bflask\b", txt, flags=re.IGNORECASE):
+    if "flask" in txt.lower() and _PYPROJ_FLASK_RE.search(txt):
         fail("pyproject.toml must not include Flask dependencies")
 
 
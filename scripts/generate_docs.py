@@ -10,12 +10,18 @@ This script is intended to run in CI when a pull request is merged. It:
 from __future__ import annotations
 
 import argparse
+import bisect
+import functools
+import itertools
 import json
+import mmap
 import os
 import subprocess
 import sys
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
+from urllib.request import Request, urlopen
 import re
 import difflib
 
@@ -24,6 +30,12 @@ try:
 except Exception:
     Github = None
 
+try:
+    from jsonschema import validate, ValidationError  # type: ignore
+except Exception:
+    validate = None
+    ValidationError = Exception
+
 
 def ensure_pygithub() -> None:
     global Github
@@ -35,6 +47,51 @@ def ensure_pygithub() -> None:
     Github = _Github
 
 
+# Leading ```lang line and trailing ``` of a fenced model reply
+_FENCE_RE = re.compile(r"\A```[\w-]*[ \t]*\n?|\n?```\s*\Z")
+
+# Docs at or above this size are memory-mapped and decoded straight from the
+# mapping instead of being copied into an intermediate read buffer first.
+MMAP_THRESHOLD = 64 * 1024
+
+
+def read_doc(path: str) -> str:
+    """Read a UTF-8 doc with the same newline translation as text-mode open()."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            text = f.read().decode("utf-8")
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                text = str(view, "utf-8")
+    # Universal newlines: CRLF docs must not leak "\r" into prompts or the shrink guard
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _read_or_empty(path: str) -> str:
+    """read_doc() for files that may be missing; one open() instead of stat() + open()."""
+    try:
+        return read_doc(path)
+    except FileNotFoundError:
+        return ""
+
+
+# Upper bound on how much of each doc is sent to the model as context
+DOC_CTX_BYTES = int(os.environ.get("DOC_CTX_BYTES", "60000"))
+
+
+def _truncate_utf8(text: str, limit: int) -> str:
+    """Return text cut to at most limit UTF-8 bytes (on a character boundary)."""
+    if len(text) * 4 <= limit:  # at most 4 bytes per code point: cannot exceed limit
+        return text
+    head = text[:limit].encode("utf-8")
+    if len(head) <= limit and len(text) <= limit:
+        return text
+    return head[:limit].decode("utf-8", "ignore") + "\n[... truncated ...]"
+
+
 def call_llm_for_docs(
     pr_title: str,
     pr_body: str,
@@ -63,12 +120,6 @@ def call_llm_for_docs(
     if not api_key:
         return {"docs": [], "note": "OPENAI_API_KEY not set"}
 
-    try:
-        import requests
-    except Exception:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "requests>=2.31.0"])  # noqa: S603,S607
-        import requests
-
     system = (
         "You are a precise technical writer that produces minimal, targeted documentation edits. "
         "Given a merged PR, its changed files, and the current contents of README.md and PRD.md, propose small updates. "
@@ -83,12 +134,14 @@ def call_llm_for_docs(
         "When 'occurrence' is omitted and a heading is duplicated, the first instance will be edited. Limit to at most 6 ops per file."
     )
 
-    user = (
-        f"PR Title: {pr_title}\n\nPR Body:\n{pr_body}\n\nChanged files:\n" + "\n".join(changed_files) +
-        "\n\nCurrent README.md:\n" + readme_text +
-        "\n\nCurrent PRD.md:\n" + prd_text +
-        "\n\nProduce ONLY the JSON described above."
-    )
+    user = "\n\n".join([
+        f"PR Title: {pr_title}",
+        f"PR Body:\n{pr_body}",
+        "Changed files:\n" + "\n".join(changed_files),
+        "Current README.md:\n" + _truncate_utf8(readme_text, DOC_CTX_BYTES),
+        "Current PRD.md:\n" + _truncate_utf8(prd_text, DOC_CTX_BYTES),
+        "Produce ONLY the JSON described above.",
+    ])
 
     payload = {
     "model": os.environ.get("PLAN_MODEL", "gpt-4o-mini"),
@@ -101,12 +154,18 @@ def call_llm_for_docs(
     }
 
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    resp = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload, timeout=120)
-    resp.raise_for_status()
-    content = resp.json()["choices"][0]["message"]["content"].strip()
+    # Single POST; stdlib urllib avoids installing requests on cold CI runners.
+    # Non-2xx responses raise urllib.error.HTTPError.
+    req = Request(
+        "https://api.openai.com/v1/chat/completions",
+        data=json.dumps(payload).encode("utf-8"),
+        headers=headers,
+        method="POST",
+    )
+    with urlopen(req, timeout=120) as resp:  # noqa: S310
+        content = json.loads(resp.read())["choices"][0]["message"]["content"].strip()
     if content.startswith("```"):
-        lines = [ln for ln in content.splitlines() if not ln.strip().startswith("```")]
-        content = "\n".join(lines).strip()
+        content = _FENCE_RE.sub("", content).strip()
     try:
         data = json.loads(content)
     except json.JSONDecodeError:
@@ -114,23 +173,28 @@ def call_llm_for_docs(
     return data
 
 
+@functools.lru_cache(maxsize=4)
+def _load_schema(path: str, mtime: float) -> Dict[str, Any]:
+    """Parse a JSON schema once per (path, mtime); an edited file gets a fresh entry."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
 def validate_docs_ops_schema(docs: List[Dict[str, Any]]) -> Tuple[bool, Optional[str]]:
     """Validate the structure of the LLM-produced docs ops against a local JSON schema.
 
     Returns (valid, message). If jsonschema is not installed, validation is skipped and returns (True, None).
     """
     schema_path = os.path.join(os.getcwd(), "docs", "schema", "docs_ops.json")
-    if not os.path.exists(schema_path):
-        return True, None
     try:
-        from jsonschema import validate, ValidationError  # type: ignore
-    except Exception:
+        mtime = os.stat(schema_path).st_mtime
+    except FileNotFoundError:
+        return True, None
+    if validate is None:
         return True, "jsonschema not installed; skipping schema validation"
 
-    with open(schema_path, "r", encoding="utf-8") as f:
-        schema = json.load(f)
     try:
-        validate(instance={"docs": docs}, schema=schema)
+        validate(instance={"docs": docs}, schema=_load_schema(schema_path, mtime))
     except ValidationError as e:
         return False, str(e)
     return True, None
@@ -138,11 +202,17 @@ def validate_docs_ops_schema(docs: List[Dict[str, Any]]) -> Tuple[bool, Optional
 
 Heading = Tuple[int, str, int]  # (level, title, line_index)
 
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*$")
+_MARKER_START = "<!-- AUTO-DOC:{} -->"
+_MARKER_END = "<!-- /AUTO-DOC:{} -->"
+
 
 def _parse_headings(lines: List[str]) -> List[Heading]:
     headings: List[Heading] = []
+    match = _HEADING_RE.match
     for i, line in enumerate(lines):
-        m = re.match(r"^(#{1,6})\s+(.+?)\s*$", line)
+        # Only lines starting with '#' can match; skip the regex call for the rest
+        m = match(line) if line[:1] == "#" else None
         if m:
             level = len(m.group(1))
             title = m.group(2).strip()
@@ -150,13 +220,22 @@ def _parse_headings(lines: List[str]) -> List[Heading]:
     return headings
 
 
-def _find_heading(headings: List[Heading], title: str, occurrence: Optional[int] = None) -> Tuple[Optional[Heading], int]:
+def _index_by_title(headings: List[Heading]) -> Dict[str, List[Heading]]:
+    by_title: Dict[str, List[Heading]] = {}
+    for h in headings:
+        by_title.setdefault(h[1], []).append(h)
+    return by_title
+
+
+def _find_heading(
+    by_title: Dict[str, List[Heading]], title: str, occurrence: Optional[int] = None
+) -> Tuple[Optional[Heading], int]:
     """Find a heading by title and optional occurrence (1-based).
 
     Returns (heading, match_count). If no heading found, returns (None, 0).
     If multiple found and occurrence is None or out of range, defaults to first.
     """
-    matches = [h for h in headings if h[1] == title]
+    matches = by_title.get(title)
     if not matches:
         return None, 0
     if occurrence is None:
@@ -167,62 +246,129 @@ def _find_heading(headings: List[Heading], title: str, occurrence: Optional[int]
     return matches[idx], len(matches)
 
 
+def _heading_line(h: Heading) -> int:
+    return h[2]
+
+
 def _section_span(lines: List[str], headings: List[Heading], target: Heading) -> Tuple[int, int, int]:
     level, _title, start_line = target
     # Section content starts after the heading line
     content_start = start_line + 1
-    # Find next heading of same or higher level
+    # Find next heading of same or higher level; headings are sorted by line,
+    # so start scanning right after the target
     end_line = len(lines)
-    for h_level, _h_title, h_line in headings:
-        if h_line <= start_line:
-            continue
+    for h_level, _h_title, h_line in headings[bisect.bisect_right(headings, start_line, key=_heading_line):]:
         if h_level <= level:
             end_line = h_line
             break
     return start_line, content_start, end_line
 
 
-def apply_ops_to_markdown(original: str, ops: List[Dict[str, Any]], file_label: str) -> Tuple[str, List[str], List[str]]:
+def _splice(lines: List[str], headings: List[Heading], start: int, end: int, chunk: List[str]) -> List[Heading]:
+    """Replace lines[start:end] with chunk in place and return the updated heading index.
+
+    Only the inserted lines are scanned for headings; headings after the edit
+    are shifted by the net line delta instead of re-parsing the whole file.
+    """
+    lines[start:end] = chunk
+    delta = len(chunk) - (end - start)
+    inserted = [(level, title, start + i) for level, title, i in _parse_headings(chunk)]
+    before = bisect.bisect_left(headings, start, key=_heading_line)
+    after = bisect.bisect_left(headings, end, lo=before, key=_heading_line)
+    tail = headings[after:]
+    if delta:
+        tail = [(level, title, i + delta) for level, title, i in tail]
+    return headings[:before] + inserted + tail
+
+
+def _content_lines(content: str) -> List[str]:
+    return content.rstrip("\n").split("\n")
+
+
+MarkdownIndex = Tuple[List[str], List[Heading]]  # (lines, headings)
+
+
+def build_markdown_index(text: str) -> MarkdownIndex:
+    """Split text into lines and scan its headings once, for reuse across apply_ops_to_markdown calls."""
+    lines = text.splitlines()
+    return lines, _parse_headings(lines)
+
+
+def apply_ops_to_markdown(
+    original: str,
+    ops: List[Dict[str, Any]],
+    file_label: str,
+    *,
+    index: Optional[MarkdownIndex] = None,
+) -> Tuple[str, List[str], List[str]]:
     """Apply structured ops to Markdown content.
 
+    index, from build_markdown_index(original), skips re-scanning the
+    original; it is not modified, so one index can serve many calls.
+
     Returns (new_content, warnings, errors)
     """
+    if index is None:
+        lines, headings = original.splitlines(), None
+    else:
+        lines, headings = index[0][:], index[1]
+    new_text, _new_lines, warnings, errors = _apply_ops(original, lines, ops, file_label, headings)
+    return new_text, warnings, errors
+
+
+def _apply_ops(
+    original: str,
+    edited_lines: List[str],
+    ops: List[Dict[str, Any]],
+    file_label: str,
+    headings: Optional[List[Heading]] = None,
+) -> Tuple[str, Optional[List[str]], List[str], List[str]]:
+    """Apply ops to edited_lines (the split original, modified in place).
+
+    headings, when given, must be the heading index of edited_lines; it is
+    never mutated, only replaced.
+
+    Returns (new_content, new_lines, warnings, errors); new_lines is None when
+    the original is returned unchanged.
+    """
     warnings: List[str] = []
     errors: List[str] = []
     if not ops:
-        return original, warnings, errors
+        return original, None, warnings, errors
 
     # Enforce conservative limit of at most 6 operations per file (matches docs automation rules)
     if len(ops) > 6:
         errors.append(f"{file_label}: too many ops ({len(ops)}); max 6 per file")
-        return original, warnings, errors
+        return original, None, warnings, errors
 
-    lines = original.splitlines()
-    headings = _parse_headings(lines)
-    edited_lines = lines[:]
+    # Each splice moves list pointers, never the text itself
+    if headings is None:
+        headings = _parse_headings(edited_lines)
+    # Title lookup index; rebuilt lazily whenever _splice hands back a new heading list
+    by_title: Dict[str, List[Heading]] = {}
+    indexed: Optional[List[Heading]] = None
 
     # Helper for marker-based replacement
     def replace_by_marker(name: str, content: str) -> None:
-        start_marker = f"<!-- AUTO-DOC:{name} -->"
-        end_marker = f"<!-- /AUTO-DOC:{name} -->"
-        start_idx = None
-        end_idx = None
-        for i, ln in enumerate(edited_lines):
-            if start_marker in ln:
-                start_idx = i
-                break
-        if start_idx is None:
+        nonlocal headings
+        start_marker = _MARKER_START.format(name)
+        end_marker = _MARKER_END.format(name)
+        # Markers never contain a newline, so searching the joined text cannot
+        # match across lines; offsets map back to line indices via bisect.
+        full = "\n".join(edited_lines)
+        start_off = full.find(start_marker)
+        if start_off < 0:
             errors.append(f"{file_label}: marker '{name}' not found")
             return
-        for j in range(start_idx + 1, len(edited_lines)):
-            if end_marker in edited_lines[j]:
-                end_idx = j
-                break
-        if end_idx is None:
+        line_starts = list(itertools.accumulate((len(ln) + 1 for ln in edited_lines), initial=0))
+        start_idx = bisect.bisect_right(line_starts, start_off) - 1
+        end_off = full.find(end_marker, line_starts[start_idx + 1])
+        if end_off < 0:
             errors.append(f"{file_label}: end marker for '{name}' not found")
             return
-        new_block = [edited_lines[start_idx], content.rstrip("\n"), edited_lines[end_idx]]
-        edited_lines[start_idx:end_idx + 1] = new_block
+        end_idx = bisect.bisect_right(line_starts, end_off) - 1
+        new_block = [edited_lines[start_idx], *_content_lines(content), edited_lines[end_idx]]
+        headings = _splice(edited_lines, headings, start_idx, end_idx + 1, new_block)
 
     # Apply ops in order
     for idx, op in enumerate(ops):
@@ -246,21 +392,21 @@ def apply_ops_to_markdown(original: str, ops: List[Dict[str, Any]], file_label:
             errors.append(f"{file_label}: op[{idx}] missing 'heading'")
             continue
 
-        # Recompute headings each time in case structure changes
-        headings = _parse_headings(edited_lines)
         occurrence = op.get("occurrence")
         try:
             occurrence_val: Optional[int] = int(occurrence) if occurrence is not None else None
         except (ValueError, TypeError):
             occurrence_val = None
-        target, match_count = _find_heading(headings, heading_title, occurrence_val)
+        if indexed is not headings:
+            by_title, indexed = _index_by_title(headings), headings
+        target, match_count = _find_heading(by_title, heading_title, occurrence_val)
 
         if op_type == "upsert_section" and target is None:
             level = int(op.get("level", 2))
             level = min(max(level, 2), 6)
             # Append new section at EOF with heading and content
-            new_sec = ["", "#" * level + " " + heading_title, content.rstrip("\n")]  # ensure spacing
-            edited_lines.extend(new_sec)
+            new_sec = ["", "#" * level + " " + heading_title, *_content_lines(content)]  # ensure spacing
+            headings = _splice(edited_lines, headings, len(edited_lines), len(edited_lines), new_sec)
             continue
 
         if target is None:
@@ -276,46 +422,60 @@ def apply_ops_to_markdown(original: str, ops: List[Dict[str, Any]], file_label:
 
         if op_type == "replace_section":
             # Keep heading line, replace content lines
-            new_chunk = [edited_lines[h_start], content.rstrip("\n")]
-            edited_lines[h_start:h_end] = new_chunk
+            new_chunk = [edited_lines[h_start], *_content_lines(content)]
+            headings = _splice(edited_lines, headings, h_start, h_end, new_chunk)
         elif op_type == "append_to_section":
             # Insert before the first subheading within this section, if present; otherwise at section end
             target_level = target[0]
             first_subheading_line: Optional[int] = None
-            for h_level, _t, h_line in headings:
-                if h_line <= h_start:
-                    continue
+            for h_level, _t, h_line in headings[bisect.bisect_right(headings, h_start, key=_heading_line):]:
                 if h_line >= h_end:
                     break
                 if h_level > target_level:  # a subheading of this section
                     first_subheading_line = h_line
                     break
             insert_at = first_subheading_line if first_subheading_line is not None else h_end
-            to_insert = content.rstrip("\n")
             insertion: List[str] = []
             # Ensure a blank line before insertion if previous line is not blank
             if insert_at > 0 and edited_lines[insert_at - 1].strip() != "":
                 insertion.append("")
-            insertion.append(to_insert)
+            insertion.extend(_content_lines(content))
             # Ensure a blank line after insertion if next line is not blank (e.g., heading follows)
             if insert_at < len(edited_lines) and edited_lines[insert_at:insert_at + 1] and (
                 edited_lines[insert_at].strip() != ""
             ):
                 insertion.append("")
-            edited_lines[insert_at:insert_at] = insertion
+            headings = _splice(edited_lines, headings, insert_at, insert_at, insertion)
         elif op_type == "upsert_section":
             # Exists: same as replace
-            new_chunk = [edited_lines[h_start], content.rstrip("\n")]
-            edited_lines[h_start:h_end] = new_chunk
+            new_chunk = [edited_lines[h_start], *_content_lines(content)]
+            headings = _splice(edited_lines, headings, h_start, h_end, new_chunk)
 
-    new_text = "\n".join(edited_lines) + ("" if original.endswith("\n") else "")
-
-    # Simple guard against large deletions (>40%)
-    if len(new_text) < 0.6 * len(original):
+    # Simple guard against large deletions (>40%); sized from the lines so a
+    # rejected edit never builds its output string
+    new_len = sum(map(len, edited_lines)) + max(len(edited_lines) - 1, 0)
+    if new_len < 0.6 * len(original):
         errors.append(f"{file_label}: edit would shrink file by >40%; aborting edits")
-        return original, warnings, errors
+        return original, None, warnings, errors
 
-    return new_text, warnings, errors
+    new_text = "\n".join(edited_lines)
+
+    return new_text, edited_lines, warnings, errors
+
+
+def _process_doc(path: str, ops: List[Dict[str, Any]]) -> Tuple[str, List[str], List[str], str]:
+    """Apply ops to one docs file and return (new_text, warnings, errors, diff_preview)."""
+    original_text = _read_or_empty(path)
+    # Split once; the applier edits a copy and hands back its lines for the diff
+    original_lines = original_text.splitlines()
+    new_text, new_lines, warnings, errors = _apply_ops(original_text, original_lines[:], ops, path)
+    diff_preview = ""
+    if new_lines is not None:
+        # Prepare diff preview; stop generating once the preview limit is reached
+        diff_preview = "\n".join(itertools.islice(difflib.unified_diff(
+            original_lines, new_lines, fromfile=f"a/{path}", tofile=f"b/{path}", lineterm=""
+        ), 200))
+    return new_text, warnings, errors, diff_preview
 
 
 def git(cmd: List[str]) -> str:
@@ -339,7 +499,8 @@ def main() -> None:
     if Github is None:
         if not dry_run:
             raise SystemExit("PyGithub is not available after installation attempt")
-    gh = Github(token) if token and Github is not None else None
+    # per_page=100 (the API maximum) so the PR file listing needs fewer round-trips
+    gh = Github(token, per_page=100) if token and Github is not None else None
 
     repo_slug = os.environ.get("GITHUB_REPOSITORY")
     if not repo_slug and not dry_run:
@@ -370,8 +531,8 @@ def main() -> None:
     # Read current docs to include as context
     readme_path = os.path.join(os.getcwd(), "README.md")
     prd_path = os.path.join(os.getcwd(), "PRD.md")
-    readme_text = open(readme_path, "r", encoding="utf-8").read() if os.path.exists(readme_path) else ""
-    prd_text = open(prd_path, "r", encoding="utf-8").read() if os.path.exists(prd_path) else ""
+    readme_text = _read_or_empty(readme_path)
+    prd_text = _read_or_empty(prd_path)
 
     # Ask LLM for doc updates (structured ops)
     llm_result = call_llm_for_docs(pr_title, pr_body, changed_files, readme_text, prd_text)
@@ -401,7 +562,7 @@ def main() -> None:
     repo_root = os.getcwd()
 
     # Create a branch (skip if dry-run)
-    ts = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    ts = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
     branch = f"docs/update-pr-{pr_number}-{ts}"
     if not dry_run and repo is not None:
         # Use the repository's default branch instead of hardcoding 'main'
@@ -427,19 +588,11 @@ def main() -> None:
             pr_obj.create_issue_comment("Docs automation found no applicable operations to apply.")
         return
 
-    file_results: Dict[str, Tuple[str, List[str], List[str], str]] = {}
-    any_errors = False
-    for path, ops in per_file_ops.items():
-        original_text = open(path, "r", encoding="utf-8").read() if os.path.exists(path) else ""
-        new_text, warnings, errors = apply_ops_to_markdown(original_text, ops, path)
-        if errors:
-            any_errors = True
-        # Prepare diff preview
-        diff_lines = list(difflib.unified_diff(
-            original_text.splitlines(), new_text.splitlines(), fromfile=f"a/{path}", tofile=f"b/{path}", lineterm=""
-        ))
-        diff_preview = "\n".join(diff_lines[:200])  # limit preview size
-        file_results[path] = (new_text, warnings, errors, diff_preview)
+    # Each file is independent; process them concurrently, keeping per_file_ops order
+    with ThreadPoolExecutor(max_workers=len(per_file_ops)) as pool:
+        futures = {path: pool.submit(_process_doc, path, ops) for path, ops in per_file_ops.items()}
+        file_results: Dict[str, Tuple[str, List[str], List[str], str]] = {p: f.result() for p, f in futures.items()}
+    any_errors = any(errs for _t, _w, errs, _d in file_results.values())
 
     if any_errors:
         msg_lines = [
@@ -489,9 +642,13 @@ def main() -> None:
                         print(f"Warning: could not post 'no changes' comment: {_e}")
                 return
 
-            git(["git", "config", "user.name", "github-actions"])
-            git(["git", "config", "user.email", "github-actions@users.noreply.github.com"])
-            git(["git", "commit", "-m", f"docs: update README/PRD for PR #{pr_number}"])
+            # Identity via -c: one git process instead of two config writes + commit
+            git([
+                "git",
+                "-c", "user.name=github-actions",
+                "-c", "user.email=github-actions@users.noreply.github.com",
+                "commit", "-m", f"docs: update README/PRD for PR #{pr_number}",
+            ])
             git(["git", "push", "origin", branch])
 
             # Create PR
@@ -3,17 +3,28 @@ Generates a structured plan for a new feature based on a high-level request,
 leveraging an AI to create the plan.
 
 This script is intended to be called by a GitHub workflow. It requires the
-OPENAI_API_KEY environment variable to be set.
+OPENAI_API_KEY environment variable to be set and the packages in
+scripts/requirements.txt.
 """
 import argparse
+import asyncio
+import atexit
+import functools
+import hashlib
 import json
 import os
 import pathlib
-import sys
-from typing import Any, Dict
+import types
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, TextIO, Tuple
+
+import httpx
 
 
 MODEL = os.environ.get("PLAN_MODEL", "gpt-4o-mini")
+# Routes requests to OpenAI's prompt cache so the shared prefix (system prompt,
+# policy, project structure) is billed at the cached rate. Bump when SYSTEM_PROMPT
+# changes; changing MODEL starts a new cache on its own.
+PROMPT_CACHE_KEY = "pop_fly.plan_feature.v1"
 
 SYSTEM_PROMPT = """
 You are an expert software architect. Produce a minimal, surgical implementation plan for a feature.
@@ -31,46 +42,113 @@ Budget: do not exceed the profile's max files/lines. If you cannot meet it, expl
 """
 
 
-def list_project_structure(root: pathlib.Path) -> str:
-    """Lists the project structure as a string, ignoring common temporary directories."""
-    lines = ["Project Structure:"]
-    ignore_dirs = {".git", ".venv", "__pycache__", ".vscode", "node_modules", "dist"}
-    
-    paths = sorted(
-        [p for p in root.rglob("*") if not any(part in p.parts for part in ignore_dirs)]
-    )
+IGNORE_DIRS = frozenset({".git", ".venv", "__pycache__", ".vscode", "node_modules", "dist", "plan-structure-cache"})
+STRUCTURE_CACHE_DIR = pathlib.Path("tmp") / "plan-structure-cache"
 
-    for path in paths:
-        try:
-            depth = len(path.relative_to(root).parts) - 1
-            indent = "    " * depth
-            prefix = "📁" if path.is_dir() else "📄"
-            lines.append(f"{indent}{prefix} {path.name}")
-        except ValueError:
-            continue # Skips files that are not under the root
-            
+
+def _walk(path: str, depth: int) -> Iterator[Tuple[int, str, bool]]:
+    """Yield (depth, name, is_dir) depth-first in name order, never descending into IGNORE_DIRS.
+
+    Depth is carried down the recursion, so no path is ever made relative to the
+    root. Symlinked directories are listed but not followed, which rules out loops.
+    """
+    with os.scandir(path) as it:
+        entries = sorted((e for e in it if e.name not in IGNORE_DIRS), key=lambda e: e.name)
+    for entry in entries:
+        is_dir = entry.is_dir()
+        yield depth, entry.name, is_dir
+        if is_dir and not entry.is_symlink():
+            yield from _walk(entry.path, depth + 1)
+
+
+# Plain ASCII listing: two spaces per level, directories marked with a trailing
+# "/". Emoji icons and wide indents cost several tokens per line in the prompt.
+STRUCTURE_FORMAT = "ascii-v1"
+_INDENTS = ["  " * d for d in range(32)]
+
+
+def _build_project_structure(root: pathlib.Path) -> str:
+    lines = ["Project Structure:"]
+    append = lines.append
+    for depth, name, is_dir in _walk(str(root), 0):
+        if depth >= len(_INDENTS):
+            _INDENTS.extend("  " * d for d in range(len(_INDENTS), depth + 1))
+        append(_INDENTS[depth] + name + "/" if is_dir else _INDENTS[depth] + name)
     return "\n".join(lines)
 
 
-def call_llm(prompt: str) -> str:
-    """Calls the OpenAI API to get a completion."""
-    openai_key = os.environ.get("OPENAI_API_KEY")
-    if not openai_key:
-        return (
-            "No LLM key configured. Skipping plan generation.\n"
-            "Set OPENAI_API_KEY secret to enable."
-        )
+def _structure_key(root: pathlib.Path) -> str:
+    """Cheap fingerprint of the tree: (name, mtime) of the root's direct children.
+
+    STRUCTURE_FORMAT is mixed in so listings cached in an older format are rebuilt.
 
+    A directory's mtime changes when entries are added, removed or renamed in it,
+    so this catches changes up to one level below the top-level directories.
+    Deeper additions are only picked up once something nearer the root changes.
+    """
+    digest = hashlib.sha256(STRUCTURE_FORMAT.encode("utf-8"))
+    with os.scandir(root) as it:
+        entries = sorted((e for e in it if e.name not in IGNORE_DIRS), key=lambda e: e.name)
+    for entry in entries:
+        digest.update(f"{entry.name}\0{entry.stat(follow_symlinks=False).st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def list_project_structure(root: pathlib.Path) -> str:
+    """Lists the project structure as a string, ignoring common temporary directories.
+
+    The listing is cached under tmp/plan-structure-cache/ and reused while the
+    top-level fingerprint (see _structure_key) is unchanged.
+    """
+    cache_dir = root / STRUCTURE_CACHE_DIR
+    # Create the cache dir before fingerprinting so its creation does not bust the key
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    key = _structure_key(root)
+    key_file = cache_dir / "structure.key"
+    text_file = cache_dir / "structure.txt"
     try:
-        import requests
-    except ImportError:
-        import subprocess
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "requests"])
-        import requests
+        if key_file.read_text(encoding="utf-8") == key:
+            return text_file.read_text(encoding="utf-8")
+    except OSError:
+        pass
 
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {openai_key}", "Content-Type": "application/json"}
-    data: Dict[str, Any] = {
+    structure = _build_project_structure(root)
+    # Write the listing before its key so a crash never pairs a new key with an old listing
+    tmp = text_file.with_suffix(".tmp")
+    tmp.write_text(structure, encoding="utf-8")
+    os.replace(tmp, text_file)
+    tmp = key_file.with_suffix(".tmp")
+    tmp.write_text(key, encoding="utf-8")
+    os.replace(tmp, key_file)
+    return structure
+
+
+_HTTP_CLIENT: Any = None
+
+
+def _get_http_client() -> Any:
+    """Return a module-level httpx client (HTTP/2 when h2 is installed) reused across calls."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        try:
+            _HTTP_CLIENT = httpx.Client(http2=True)
+        except ImportError:
+            # http2=True requires the optional 'h2' package (httpx[http2])
+            _HTTP_CLIENT = httpx.Client()
+        atexit.register(_HTTP_CLIENT.close)
+    return _HTTP_CLIENT
+
+
+NO_KEY_MESSAGE = (
+    "No LLM key configured. Skipping plan generation.\n"
+    "Set OPENAI_API_KEY secret to enable."
+)
+OPENAI_URL = "https://api.openai.com/v1/chat/completions"
+
+
+def _request_data(prompt: str) -> Dict[str, Any]:
+    return {
         "model": MODEL,
         "messages": [
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -78,59 +156,178 @@ def call_llm(prompt: str) -> str:
         ],
         "temperature": 0.2,
         "max_tokens": 2048,
+        "prompt_cache_key": PROMPT_CACHE_KEY,
     }
 
-    response = requests.post(url, headers=headers, json=data, timeout=180)
-    response.raise_for_status()
-    return response.json()["choices"][0]["message"]["content"]
+
+def _iter_sse_content(lines: Iterable[str]) -> Iterator[str]:
+    """Yields the text deltas of an OpenAI chat-completions event stream."""
+    for line in lines:
+        if not line.startswith("data: "):
+            continue
+        data = line[len("data: "):]
+        if data == "[DONE]":
+            break
+        try:
+            content = json.loads(data)["choices"][0]["delta"].get("content")
+        except (ValueError, KeyError, IndexError):
+            continue
+        if content:
+            yield content
+
+
+def call_llm(prompt: str, out: Optional[TextIO] = None) -> str:
+    """Calls the OpenAI API to get a completion.
+
+    The reply is streamed; when `out` is given each chunk is written (and
+    flushed) to it as it arrives, so the plan file grows while tokens are generated.
+    """
+    openai_key = os.environ.get("OPENAI_API_KEY")
+    if not openai_key:
+        if out is not None:
+            out.write(NO_KEY_MESSAGE)
+        return NO_KEY_MESSAGE
+
+    headers = {"Authorization": f"Bearer {openai_key}", "Content-Type": "application/json"}
+    data = dict(_request_data(prompt), stream=True)
+    parts: List[str] = []
+    with _get_http_client().stream("POST", OPENAI_URL, headers=headers, json=data, timeout=180) as response:
+        response.raise_for_status()
+        for chunk in _iter_sse_content(response.iter_lines()):
+            parts.append(chunk)
+            if out is not None:
+                out.write(chunk)
+                out.flush()
+    return "".join(parts)
 
 
-def load_policy(root: pathlib.Path) -> dict:
-    policy_path = root / ".github" / "automation_policy.json"
+@functools.lru_cache(maxsize=1)
+def _load_policy_cached(path_str: str) -> Mapping[str, Any]:
     try:
-        import json
-        return json.loads(policy_path.read_text(encoding="utf-8"))
+        policy = json.loads(pathlib.Path(path_str).read_text(encoding="utf-8"))
     except Exception:
-        return {"invariants": {}, "profiles": {"minor": {"allowed_files": [], "max_files": 4, "max_lines": 80}}}
+        policy = {"invariants": {}, "profiles": {"minor": {"allowed_files": [], "max_files": 4, "max_lines": 80}}}
+    # Read-only view: the cached object is shared by every caller
+    return types.MappingProxyType(policy)
 
 
-def generate_plan(feature_request: str, plan_file: pathlib.Path, project_root: pathlib.Path, profile: str = "minor"):
-    """
-    Generates a structured markdown plan using an AI.
+def load_policy(root: pathlib.Path) -> Mapping[str, Any]:
+    """Returns the automation policy, parsed once per process."""
+    return _load_policy_cached(str(root / ".github" / "automation_policy.json"))
 
-    Args:
-        feature_request: The high-level feature request from the user.
-        plan_file: The path to the output plan file.
-        project_root: The root directory of the project.
-    """
+
+def build_prompt(feature_request: str, project_root: pathlib.Path, profile: str = "minor") -> str:
     policy = load_policy(project_root)
     inv = policy.get("invariants", {})
     prof = policy.get("profiles", {}).get(profile, {})
     project_structure = list_project_structure(project_root)
     policy_snippet = json.dumps({"invariants": inv, "profile": prof}, indent=2)
-    prompt = (
-        f"Feature Request: \"{feature_request}\"\n\n"
+    # Stable context first and the per-run request last, so the cacheable prefix is as long as possible
+    return (
+        f"{project_structure}\n\n"
         f"Repository constraints and scope profile (JSON):\n{policy_snippet}\n\n"
-        f"{project_structure}"
+        f"Feature Request: \"{feature_request}\""
     )
-    
-    plan_content = call_llm(prompt)
 
+
+def _write_plan(feature_request: str, plan_file: pathlib.Path, plan_content: str) -> None:
     plan_file.parent.mkdir(parents=True, exist_ok=True)
     plan_file.write_text(plan_content)
     print(f"Generated AI plan for '{feature_request}' at {plan_file}")
 
 
+def generate_plan(feature_request: str, plan_file: pathlib.Path, project_root: pathlib.Path, profile: str = "minor"):
+    """
+    Generates a structured markdown plan using an AI.
+
+    Args:
+        feature_request: The high-level feature request from the user.
+        plan_file: The path to the output plan file.
+        project_root: The root directory of the project.
+    """
+    if not os.environ.get("OPENAI_API_KEY"):
+        # call_llm would return the stub anyway; skip walking the project tree for it
+        _write_plan(feature_request, plan_file, NO_KEY_MESSAGE)
+        return
+    prompt = build_prompt(feature_request, project_root, profile)
+    plan_file.parent.mkdir(parents=True, exist_ok=True)
+    with plan_file.open("w") as f:
+        call_llm(prompt, out=f)
+    print(f"Generated AI plan for '{feature_request}' at {plan_file}")
+
+
+async def generate_plans(
+    jobs: List[Tuple[str, pathlib.Path]],
+    project_root: pathlib.Path,
+    profile: str = "minor",
+    concurrency: int = 20,
+) -> None:
+    """
+    Generates one plan per (feature_request, plan_file) job with concurrent LLM calls.
+
+    At most `concurrency` requests are in flight at once. All jobs share the same
+    project structure and policy prefix, so they also share OpenAI's prompt cache.
+    """
+    openai_key = os.environ.get("OPENAI_API_KEY")
+    if not openai_key:
+        for feature_request, plan_file in jobs:
+            _write_plan(feature_request, plan_file, NO_KEY_MESSAGE)
+        return
+
+    headers = {"Authorization": f"Bearer {openai_key}", "Content-Type": "application/json"}
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        client = httpx.AsyncClient(http2=True, timeout=180)
+    except ImportError:
+        client = httpx.AsyncClient(timeout=180)
+
+    async with client:
+        async def run(feature_request: str, plan_file: pathlib.Path) -> None:
+            data = _request_data(build_prompt(feature_request, project_root, profile))
+            async with semaphore:
+                response = await client.post(OPENAI_URL, headers=headers, json=data)
+            response.raise_for_status()
+            _write_plan(feature_request, plan_file, response.json()["choices"][0]["message"]["content"])
+
+        await asyncio.gather(*(run(request, plan_file) for request, plan_file in jobs))
+
+
+def load_request_file(path: pathlib.Path) -> List[Tuple[str, pathlib.Path]]:
+    """Reads a JSONL file of {"request": ..., "output": ...} objects."""
+    jobs: List[Tuple[str, pathlib.Path]] = []
+    for lineno, line in enumerate(path.read_text(encoding="utf-8").splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            jobs.append((str(row["request"]), pathlib.Path(row["output"])))
+        except (ValueError, KeyError, TypeError) as e:
+            raise SystemExit(f"{path}:{lineno}: expected {{\"request\": ..., \"output\": ...}} ({e})")
+    return jobs
+
+
 def main():
     """Main entry point for the script."""
     parser = argparse.ArgumentParser(description="Generate a feature plan using AI.")
-    parser.add_argument("--request", type=str, required=True, help="High-level feature request.")
-    parser.add_argument("--output", type=str, required=True, help="Output file for the plan.")
+    parser.add_argument("--request", type=str, help="High-level feature request.")
+    parser.add_argument("--output", type=str, help="Output file for the plan.")
+    parser.add_argument(
+        "--request-file",
+        type=str,
+        help="JSONL file of {\"request\", \"output\"} objects; plans are generated concurrently.",
+    )
     parser.add_argument("--profile", type=str, default="minor", choices=["minor", "moderate", "major"], help="Scope profile to use.")
     args = parser.parse_args()
 
-    plan_file = pathlib.Path(args.output)
     project_root = pathlib.Path(__file__).parent.parent # Assumes script is in scripts/
+    if args.request_file:
+        jobs = load_request_file(pathlib.Path(args.request_file))
+        asyncio.run(generate_plans(jobs, project_root, args.profile))
+        return
+    if not args.request or not args.output:
+        parser.error("--request and --output are required unless --request-file is given")
+
+    plan_file = pathlib.Path(args.output)
     generate_plan(args.request, plan_file, project_root, args.profile)
 
 
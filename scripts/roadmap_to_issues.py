@@ -5,34 +5,70 @@ Convert roadmap bullets into GitHub issues.
 - Parses ROADMAP.md and extracts bullet items under Now/Next/Later.
 - Creates or updates GitHub Issues with labels [roadmap, Now|Next|Later].
 - Idempotent: updates existing issues if a matching title exists or an inline #123 reference is present.
+  Roadmap-labelled issues are matched up front; a bullet with no match there is
+  looked up by exact title among all issues before a new one is created.
 
-Requires: GITHUB_TOKEN provided by GitHub Actions.
+Requires: GITHUB_TOKEN provided by GitHub Actions, and the packages in
+scripts/requirements.txt.
 """
 from __future__ import annotations
 
+import hashlib
 import os
 import re
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
 
-try:
-    from github import Github  # type: ignore
-except Exception:
-    Github = None  # lazy install
+import requests
+from github import Github, GithubException, UnknownObjectException
 
 
 SECTION_RE = re.compile(r"^##\s+(Now|Next|Later)")
 ITEM_RE = re.compile(r"^-\s+(.*)")
 ISSUE_REF_RE = re.compile(r"#(\d+)")
+# Trailing "(status)" of a bullet, optionally followed by an issue ref
+_TRAIL_PAREN_RE = re.compile(r"^(.*)\s*\(([^)]+)\)\s*(?:#\d+)?\s*$")
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+# Roadmap-labelled issues are fetched in bulk instead of paginating every open
+# and closed issue in the repository; #123 references and titles that miss them
+# are looked up individually (_fetch_issue_by_number, find_issue_by_title).
+ROADMAP_ISSUES_QUERY = """
+query($q: String!, $cursor: String) {
+  search(query: $q, type: ISSUE, first: 100, after: $cursor) {
+    pageInfo { hasNextPage endCursor }
+    nodes { ... on Issue { number title body state labels(first: 100) { nodes { name } } } }
+  }
+}
+"""
+UPSERT_WORKERS = 8
+MAX_RATE_LIMIT_RETRIES = 5
+# Fingerprint of the generated body, embedded in it so unchanged items skip the edit
+_BODY_HASH_RE = re.compile(r"<!-- roadmap-hash:([0-9a-f]+) -->")
 STATUS_EMOJI = {
     "Done": "🟢",
     "In progress": "🟡",
     "Planned": "⚪",
 }
+# Status markers accepted inside a bullet's trailing parentheses, built once:
+# exact (case-insensitive) words, then emojis checked in Done/In progress/Planned order.
+_STATUS_WORDS = {word.lower(): word for word in STATUS_EMOJI}
+_STATUS_EMOJI_ORDER = tuple((emoji, word) for word, emoji in STATUS_EMOJI.items())
+
 
+def _status_word(marker: str) -> Optional[str]:
+    word = _STATUS_WORDS.get(marker.lower())
+    if word is not None:
+        return word
+    for emoji, word in _STATUS_EMOJI_ORDER:
+        if emoji in marker:
+            return word
+    return None
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class RoadmapItem:
     section: str  # Now|Next|Later
     title: str
@@ -42,95 +78,71 @@ class RoadmapItem:
     issue_ref: Optional[int]
 
 
+def _make_item(section: str, main: str, body_lines: List[str]) -> RoadmapItem:
+    # Detect status emoji or word inside trailing parentheses, e.g. "Feature (🟡)" or "Feature (In progress)"
+    # status is None unless an explicit status marker (emoji or known word) was present.
+    status: Optional[str] = None
+    title = main
+    # Remove inline issue reference like "#123" before matching parentheses
+    main_no_ref = ISSUE_REF_RE.sub("", main).strip()
+    m_paren = _TRAIL_PAREN_RE.match(main_no_ref)
+    if m_paren:
+        status = _status_word(m_paren.group(2).strip())
+        if status is not None:
+            title = m_paren.group(1).strip()
+    body = "\n".join(body_lines).strip()
+    issue_ref = None
+    m_issue = ISSUE_REF_RE.search(main)
+    if m_issue:
+        issue_ref = int(m_issue.group(1))
+
+    return RoadmapItem(section=section, title=title, body=body, status=status, issue_ref=issue_ref)
+
+
 def parse_roadmap(md: str) -> List[RoadmapItem]:
-    lines = md.splitlines()
     section: Optional[str] = None
     items: List[RoadmapItem] = []
+    # (section, main bullet text, body lines) of the item whose sub-bullets are being collected
+    current: Optional[Tuple[str, str, List[str]]] = None
 
-    i = 0
-    while i < len(lines):
-        line = lines[i].rstrip()
+    # Single forward pass: each line is either body of the current item, or
+    # ends it and is then handled as a heading / top-level bullet.
+    for raw in md.splitlines():
+        if current is not None:
+            # Collect sub-bullets as body until next top-level bullet or section
+            if not (raw.startswith("## ") or ITEM_RE.match(raw)):
+                stripped = raw.strip()
+                if stripped.startswith("- "):
+                    current[2].append(stripped[2:])
+                elif stripped:
+                    current[2].append(stripped)
+                continue
+            items.append(_make_item(*current))
+            current = None
+
+        line = raw.rstrip()
         m_section = SECTION_RE.match(line)
         if m_section:
-            section = m_section.group(1)
-            i += 1
+            # Interned so every item of a section shares one string object
+            section = sys.intern(m_section.group(1))
             continue
         # If we encounter any other H2 ("## ...") that is not a roadmap section,
         # clear the current section so subsequent top-level bullets are not
         # incorrectly attributed to the previous Now/Next/Later section.
-        if line.startswith("## ") and not m_section:
+        if line.startswith("## "):
             section = None
-            i += 1
             continue
 
-        if section and ITEM_RE.match(line):
-            # Parse main bullet as title and capture following indented sub-bullets
-            main = ITEM_RE.match(line).group(1)  # type: ignore
-            # Detect status emoji or word inside trailing parentheses, e.g. "Feature (🟡)" or "Feature (In progress)"
-            status = ""
-            title = main
-            # Remove inline issue reference like "#123" before matching parentheses
-            main_no_ref = ISSUE_REF_RE.sub("", main).strip()
-            m_paren = re.match(r"^(.*)\s*\(([^)]+)\)\s*(?:#\d+)?\s*$", main_no_ref)
-            if m_paren:
-                inside = m_paren.group(2).strip()
-                candidate_title = m_paren.group(1).strip()
-                # If the parenthesized part looks like an emoji status or known status word, treat it as status
-                if any(e in inside for e in ("🟢", "🟡", "⚪")) or inside.lower() in {"done", "in progress", "planned"}:
-                    status = inside
-                    title = candidate_title
-            # Collect sub-bullets as body until next top-level bullet or section
-            body_lines: List[str] = []
-            j = i + 1
-            while j < len(lines):
-                nxt = lines[j]
-                if nxt.startswith("## ") or ITEM_RE.match(nxt):
-                    break
-                if nxt.strip().startswith("- "):
-                    body_lines.append(nxt.strip()[2:])
-                elif nxt.strip():
-                    body_lines.append(nxt.strip())
-                j += 1
-            body = "\n".join(body_lines).strip()
-            issue_ref = None
-            m_issue = ISSUE_REF_RE.search(main)
-            if m_issue:
-                issue_ref = int(m_issue.group(1))
-
-            # Normalize status to one of Done / In progress / Planned, but only
-            # if an explicit status marker (emoji or known word) was present.
-            status_word: Optional[str] = None
-            s_low = (status or "").lower()
-            if status:
-                if "🟢" in status or s_low == "done":
-                    status_word = "Done"
-                elif "🟡" in status or s_low == "in progress":
-                    status_word = "In progress"
-                elif "⚪" in status or s_low == "planned":
-                    status_word = "Planned"
-
-            items.append(RoadmapItem(section=section, title=title, body=body, status=status_word, issue_ref=issue_ref))
-            i = j
-            continue
+        m_item = ITEM_RE.match(line) if section else None
+        if m_item:
+            current = (section, m_item.group(1), [])
 
-        i += 1
+    if current is not None:
+        items.append(_make_item(*current))
 
     return items
 
 
-def ensure_pygithub() -> None:
-    global Github
-    if Github is not None:
-        return
-    # Lazy install
-    import subprocess
-
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "PyGithub>=2.3.0"])  # noqa: S603,S607
-    from github import Github as _Github  # type: ignore
-
-    Github = _Github
-
-
 def get_repo_context() -> Tuple[str, str]:
     # owner/repo from GITHUB_REPOSITORY
     gh_repo = os.environ.get("GITHUB_REPOSITORY")
@@ -140,16 +152,101 @@ def get_repo_context() -> Tuple[str, str]:
     return owner, repo
 
 
+def fetch_roadmap_issues(token: str, owner: str, repo_name: str) -> List[Dict[str, Any]]:
+    """Return {number, title, body, state, labels} for every issue labelled 'roadmap', via GraphQL search."""
+    return _search_issues(token, f"repo:{owner}/{repo_name} is:issue label:roadmap")
+
+
+def find_issue_by_title(token: str, owner: str, repo_name: str, title: str) -> Optional[Dict[str, Any]]:
+    """Return the issue (labelled or not) whose title is exactly title, else None."""
+    # Search matches words, not the whole title; keep only exact matches
+    phrase = title.replace('"', " ")
+    for iss in _search_issues(token, f'repo:{owner}/{repo_name} is:issue in:title "{phrase}"'):
+        if iss["title"].strip() == title:
+            return iss
+    return None
+
+
+def _search_issues(token: str, query: str) -> List[Dict[str, Any]]:
+    headers = {"Authorization": f"Bearer {token}"}
+    cursor: Optional[str] = None
+    issues: List[Dict[str, Any]] = []
+    while True:
+        resp = requests.post(
+            GITHUB_GRAPHQL_URL,
+            json={"query": ROADMAP_ISSUES_QUERY, "variables": {"q": query, "cursor": cursor}},
+            headers=headers,
+            timeout=30,
+        )
+        resp.raise_for_status()
+        payload = resp.json()
+        if payload.get("errors"):
+            raise SystemExit(f"GitHub GraphQL error: {payload['errors']}")
+        search = payload["data"]["search"]
+        for node in search["nodes"]:
+            if node:  # non-Issue results come back as empty objects
+                issues.append(
+                    {
+                        "number": node["number"],
+                        "title": node["title"],
+                        "body": node["body"] or "",
+                        "state": node["state"].lower(),
+                        "labels": {l["name"] for l in node["labels"]["nodes"]},
+                    }
+                )
+        if not search["pageInfo"]["hasNextPage"]:
+            return issues
+        cursor = search["pageInfo"]["endCursor"]
+
+
+def _fetch_issue_by_number(repo: Any, number: int) -> Optional[Dict[str, Any]]:
+    """Look up an explicitly referenced (#123) issue that is not labelled 'roadmap' yet."""
+    try:
+        iss = repo.get_issue(number)
+        # labels come inline with the issue payload; no separate get_labels() round-trip
+        return {
+            "number": iss.number,
+            "title": iss.title,
+            "body": iss.body or "",
+            "state": iss.state,
+            "labels": {l.name for l in (iss.labels or [])},
+        }
+    except UnknownObjectException:
+        return None
+
+
+T = TypeVar("T")
+
+
+def _with_backoff(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call fn, sleeping and retrying when GitHub answers with a (secondary) rate limit."""
+    for _ in range(MAX_RATE_LIMIT_RETRIES - 1):
+        try:
+            return fn(*args, **kwargs)
+        except GithubException as e:
+            headers = e.headers or {}
+            retry_after = headers.get("retry-after") or headers.get("Retry-After")
+            # A plain 403 is a permissions error; only back off when it is a rate limit
+            rate_limited = e.status == 429 or (
+                e.status == 403 and (retry_after is not None or "rate limit" in str(e.data).lower())
+            )
+            if not rate_limited:
+                raise
+            time.sleep(int(retry_after or 5))
+    return fn(*args, **kwargs)
+
+
 def upsert_issues(items: Iterable[RoadmapItem]) -> None:
     token = os.environ.get("GITHUB_TOKEN")
     if not token:
         raise SystemExit("GITHUB_TOKEN not provided")
 
-    ensure_pygithub()
-
     owner, repo_name = get_repo_context()
-    assert Github is not None, "PyGithub not initialized"
-    gh = Github(token)
+    # Lazy objects: get_repo/get_issue do not fetch until an attribute is needed,
+    # so editing a known issue number costs a single PATCH. PyGithub's own
+    # request spacing is disabled because upserts run concurrently and
+    # rate limits are handled by _with_backoff instead.
+    gh = Github(token, per_page=100, lazy=True, seconds_between_requests=None, seconds_between_writes=None)
     repo = gh.get_repo(f"{owner}/{repo_name}")
 
     # Ensure labels (sections + status)
@@ -171,28 +268,30 @@ def upsert_issues(items: Iterable[RoadmapItem]) -> None:
         repo.create_label(name=lab, color=color)
 
     # Build title -> issue map for idempotency
-    existing_issues = list(repo.get_issues(state="open")) + list(repo.get_issues(state="closed"))
-    by_title = {iss.title.strip(): iss for iss in existing_issues}
-    by_number = {iss.number: iss for iss in existing_issues}
+    existing_issues = fetch_roadmap_issues(token, owner, repo_name)
+    by_title = {iss["title"].strip(): iss for iss in existing_issues}
+    by_number = {iss["number"]: iss for iss in existing_issues}
 
-    for it in items:
+    def process(it: RoadmapItem) -> str:
         # Skip items that do not have an explicit status marker unless the
         # environment variable ROADMAP_INCLUDE_UNANNOTATED=true is set. This
         # reduces accidental issue creation from unannotated bullets.
         include_unannotated = os.environ.get("ROADMAP_INCLUDE_UNANNOTATED", "false").lower() in ("1", "true", "yes")
         if it.status is None and not include_unannotated:
-            print(f"Skipping unannotated roadmap item: '{it.title}' (section={it.section})")
-            continue
+            return f"Skipping unannotated roadmap item: '{it.title}' (section={it.section})"
 
         # Determine the desired status label for this item
         # At this point, it.status is not None (we skipped None above)
         status_label = it.status  # type: ignore
 
-        target_issue = None
-        if it.issue_ref and it.issue_ref in by_number:
-            target_issue = by_number[it.issue_ref]
-        elif it.title.strip() in by_title:
-            target_issue = by_title[it.title.strip()]
+        target = None
+        if it.issue_ref:
+            target = by_number.get(it.issue_ref) or _with_backoff(_fetch_issue_by_number, repo, it.issue_ref)
+        if target is None:
+            target = by_title.get(it.title.strip())
+        if target is None:
+            # An issue with this title may exist without the roadmap label; adopt it rather than duplicate it
+            target = find_issue_by_title(token, owner, repo_name, it.title.strip())
 
         body_parts = [
             f"Section: {it.section}",
@@ -201,25 +300,42 @@ def upsert_issues(items: Iterable[RoadmapItem]) -> None:
             "\nSource: ROADMAP.md",
         ]
         body = "\n".join(body_parts).strip()
+        body_hash = hashlib.blake2b(body.encode("utf-8"), digest_size=12).hexdigest()
+        body = f"{body}\n\n<!-- roadmap-hash:{body_hash} -->"
         # Build label set: preserve unrelated existing labels, but ensure roadmap/section/status are present
         desired_base = {"roadmap", it.section, status_label}
 
-        if target_issue:
-            existing_labels = {l.name for l in target_issue.get_labels()}
+        if target:
             # Remove any old status labels to avoid stale statuses
-            cleaned = existing_labels - status_labels
+            cleaned = target["labels"] - status_labels
             new_labels = sorted(cleaned | desired_base)
             # If item is Done, close the issue; otherwise ensure it is open
             new_state = "closed" if status_label == "Done" else "open"
-            target_issue.edit(body=body, labels=new_labels, state=new_state)
+            m_hash = _BODY_HASH_RE.search(target["body"])
+            if (
+                m_hash
+                and m_hash.group(1) == body_hash
+                and target["labels"] == set(new_labels)
+                and target["state"] == new_state
+            ):
+                return f"Unchanged issue #{target['number']}: {target['title']} (status={status_label})"
+            _with_backoff(repo.get_issue(target["number"]).edit, body=body, labels=new_labels, state=new_state)
+            number, title = target["number"], target["title"]
         else:
             # Create with labels; created issue is open by default
-            target_issue = repo.create_issue(title=it.title.strip(), body=body, labels=sorted(desired_base))
+            created = _with_backoff(repo.create_issue, title=it.title.strip(), body=body, labels=sorted(desired_base))
             # Immediately close if roadmap marks it Done
             if status_label == "Done":
-                target_issue.edit(state="closed")
+                _with_backoff(created.edit, state="closed")
+            number, title = created.number, created.title
+
+        return f"Upserted issue #{number}: {title} (status={status_label})"
 
-        print(f"Upserted issue #{target_issue.number}: {target_issue.title} (status={status_label})")
+    # Each upsert is independent network I/O; by_title/by_number are only read here.
+    # map() yields results in item order, so the log reads the same as a serial run.
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as executor:
+        for message in executor.map(process, items):
+            print(message)
 
 
 def main() -> None:
@@ -4,115 +4,499 @@ Create a branch and PR from a feature plan.
 
 - Triggered by a push to a branch matching 'feature/plan-**'.
 - Reads the 'feature-plan.md' file from the branch.
-- In the future, this script will use an AI to generate code from the plan.
-- For now, it creates a PR with the plan.
+- Uses an AI to turn the plan into guarded file edits, commits them and opens a PR.
+- With --collect, scaffolds every pending 'feature/plan-*' branch from one
+  OpenAI Batch API job instead.
 """
 from __future__ import annotations
 
 import argparse
+import hashlib
+import json
 import os
+import posixpath
+import shutil
 import subprocess
-import sys
 import re
+import shlex
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
 
 try:
-    from github import Github
-except ImportError:
-    Github = None
-
-def ensure_pygithub() -> None:
-    """Ensures PyGithub is installed."""
-    global Github
-    if Github is not None:
-        return
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "PyGithub>=2.3.0"])
-    from github import Github as _Github
-    Github = _Github
+    import requests
+    from github import Github, GithubRetry
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+except ImportError as e:
+    raise SystemExit(f"{e.name} is required: pip install -r scripts/requirements.txt") from e
+
+OPENAI_BASE = "https://api.openai.com/v1"
+BATCH_TERMINAL = {"completed", "failed", "expired", "cancelled"}
+HTTP_POOL_SIZE = 10
+
+_HTTP_SESSION: requests.Session | None = None
+
+
+def _get_http_session() -> requests.Session:
+    """Return a module-level Session so OpenAI calls reuse pooled TLS connections.
+
+    Transient 429/5xx answers on idempotent requests are retried with backoff.
+    """
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        _HTTP_SESSION = requests.Session()
+        _HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry))
+    return _HTTP_SESSION
+
+
+def build_batch_jsonl(payloads: dict[str, dict]) -> str:
+    """Return an OpenAI Batch API input file: one chat-completions request per custom_id."""
+    lines = []
+    for custom_id, body in payloads.items():
+        lines.append(json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}))
+    return "\n".join(lines) + "\n"
+
+
+def parse_batch_output(text: str) -> dict[str, str]:
+    """Map custom_id -> message content from a Batch API output file; failed lines are skipped."""
+    results: dict[str, str] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            results[str(row["custom_id"])] = row["response"]["body"]["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            continue
+    return results
+
+
+def run_openai_batch(payloads: dict[str, dict], api_key: str) -> dict[str, str]:
+    """Submit chat-completions payloads as one OpenAI batch (half price) and wait for the results."""
+    session = _get_http_session()
+    auth = {"Authorization": f"Bearer {api_key}"}
+    r = session.post(
+        f"{OPENAI_BASE}/files",
+        headers=auth,
+        data={"purpose": "batch"},
+        files={"file": ("scaffold.jsonl", build_batch_jsonl(payloads).encode("utf-8"), "application/jsonl")},
+        timeout=60,
+    )
+    r.raise_for_status()
+    r = session.post(
+        f"{OPENAI_BASE}/batches",
+        headers=auth,
+        json={"input_file_id": r.json()["id"], "endpoint": "/v1/chat/completions", "completion_window": "24h"},
+        timeout=60,
+    )
+    r.raise_for_status()
+    batch_id = r.json()["id"]
+    print(f"Submitted batch {batch_id} with {len(payloads)} request(s).")
 
-def git(cmd: list[str]) -> str:
+    try:
+        interval = float(os.environ.get("PLAN_BATCH_POLL_SECONDS", "30"))
+    except ValueError:
+        interval = 30.0
+    while True:
+        r = session.get(f"{OPENAI_BASE}/batches/{batch_id}", headers=auth, timeout=60)
+        r.raise_for_status()
+        batch = r.json()
+        if batch.get("status") in BATCH_TERMINAL:
+            break
+        time.sleep(interval)
+
+    if batch.get("status") != "completed" or not batch.get("output_file_id"):
+        raise SystemExit(f"Batch {batch_id} ended with status '{batch.get('status')}'")
+    r = session.get(f"{OPENAI_BASE}/files/{batch['output_file_id']}/content", headers=auth, timeout=120)
+    r.raise_for_status()
+    return parse_batch_output(r.text)
+
+
+# Core symbols that must survive scaffolded edits
+_COMPUTE_DEF_RE = re.compile(r"def\s+compute_distance_bearing_xy\(")
+_PARSE_PAIR_DEF_RE = re.compile(r"def\s+_parse_pair_mgrs_digits\(")
+# Whitespace-tolerant, like architecture_guard: the decorator may span several lines
+_COMPUTE_ROUTE_RE = re.compile(r"@app\.post\(\s*[\"']/api/compute[\"']")
+PLAN_PATH = "feature-plan.md"
+PLAN_BRANCH_PREFIX = "feature/plan-"
+# Git notes ref marking branch heads whose plan has been scaffolded (used by --collect)
+SCAFFOLD_NOTES_REF = "refs/notes/scaffold"
+SCAFFOLD_WORKERS = 8
+
+
+def git(cmd: list[str], cwd: Path | None = None) -> str:
     """Executes a git command and returns its output."""
-    return subprocess.check_output(cmd, text=True).strip()
-
-def main() -> None:
-    """Main entry point for the script."""
-    parser = argparse.ArgumentParser(description="Scaffold from a feature plan.")
-    parser.add_argument("--branch", type=str, required=True, help="The feature branch with the plan.")
-    args = parser.parse_args()
-
-    token = os.environ.get("GITHUB_TOKEN")
-    if not token:
-        raise SystemExit("GITHUB_TOKEN missing. Use POP_FLY_PAT for this script.")
-
-    repo_slug = os.environ.get("GITHUB_REPOSITORY")
-    if not repo_slug:
-        raise SystemExit("GITHUB_REPOSITORY missing")
-
-    ensure_pygithub()
-    assert Github is not None, "PyGithub failed to import"
-    gh = Github(token)
-    repo = gh.get_repo(repo_slug)
-
-    branch_name = args.branch
-    plan_path = "feature-plan.md"
-
-    if not os.path.exists(plan_path):
-        print(f"Plan file '{plan_path}' not found on branch '{branch_name}'. Exiting.")
-        return
-
-    with open(plan_path, "r", encoding="utf-8") as f:
-        plan_content = f.read()
-
-    # Use a generative AI to turn the plan into concrete file changes.
-    # Strategy:
-    # 1) Provide the plan and current project structure to the LLM.
-    # 2) Ask for a strict JSON response describing file edits to apply.
-    # 3) Apply safe changes only within src/, tests/, frontend/, or scripts/.
-    # 4) Commit and push edits back to the same branch.
+    return subprocess.check_output(cmd, text=True, cwd=cwd).strip()
 
-    from pathlib import Path  # local import to avoid top-level edits
-    import json  # local import to avoid top-level edits
 
-    repo_root = Path(".").resolve()
-    allowed_dirs = [repo_root / "src", repo_root / "tests", repo_root / "frontend", repo_root / "scripts"]
-    # Load policy
+def load_profile(repo_root: Path) -> tuple[str, dict]:
+    """Returns (profile name, profile dict) from .github/automation_policy.json."""
     policy_path = repo_root / ".github" / "automation_policy.json"
     profile_name = os.environ.get("AUTOMATION_PROFILE", "minor")
     try:
         policy = json.loads(policy_path.read_text(encoding="utf-8"))
     except Exception:
         policy = {"profiles": {"minor": {}}}
-    prof = policy.get("profiles", {}).get(profile_name, {})
+    return profile_name, policy.get("profiles", {}).get(profile_name, {})
+
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+# Repository id, default branch and the branch's open PR with its labels, in one round trip.
+# headRefName matches forks too, so the owner is checked client-side.
+PR_STATE_QUERY = """
+query($owner: String!, $name: String!, $head: String!) {
+  repository(owner: $owner, name: $name) {
+    id
+    defaultBranchRef { name }
+    pullRequests(headRefName: $head, states: OPEN, first: 5) {
+      nodes { id number url headRepositoryOwner { login } labels(first: 50) { nodes { name } } }
+    }
+  }
+}
+"""
+CREATE_PR_MUTATION = """
+mutation($input: CreatePullRequestInput!) { createPullRequest(input: $input) { pullRequest { url } } }
+"""
+UPDATE_PR_MUTATION = """
+mutation($input: UpdatePullRequestInput!) { updatePullRequest(input: $input) { pullRequest { url } } }
+"""
+
+
+def github_graphql(token: str, query: str, variables: dict) -> dict:
+    """POSTs one GraphQL request and returns its data; GraphQL errors raise RuntimeError."""
+    resp = _get_http_session().post(
+        GITHUB_GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=30,
+    )
+    resp.raise_for_status()
+    payload = resp.json()
+    if payload.get("errors"):
+        raise RuntimeError(f"GitHub GraphQL error: {payload['errors']}")
+    return payload["data"]
+
+
+def fetch_pr_state(token: str, repo_slug: str, branch_name: str) -> dict:
+    """Returns {repository_id, default_branch, pr}; pr is the branch's open PR {id, number, url, labels (a set)} or None.
+
+    Both the label gate and the final create-or-update read from this one payload.
+    """
+    owner, name = repo_slug.split("/", 1)
+    repo = github_graphql(token, PR_STATE_QUERY, {"owner": owner, "name": name, "head": branch_name})["repository"]
+    pr = None
+    for node in repo["pullRequests"]["nodes"]:
+        if ((node.get("headRepositoryOwner") or {}).get("login") or "").lower() == owner.lower():
+            pr = {
+                "id": node["id"],
+                "number": node["number"],
+                "url": node["url"],
+                "labels": {lbl["name"] for lbl in node["labels"]["nodes"]},
+            }
+            break
+    return {"repository_id": repo["id"], "default_branch": repo["defaultBranchRef"]["name"], "pr": pr}
+
+
+def passes_label_gate(pr_state: dict, branch_name: str, profile_name: str, prof: dict) -> bool:
     # Enforce profile-level gating: some profiles (for example 'major') may
     # require that a GitHub pull request already exists and is labeled before
     # automated scaffolding may proceed. This prevents large-scope automation
     # from running without explicit human sign-off.
     required_label = prof.get("requires_label")
-    if required_label:
-        try:
-            existing_prs = repo.get_pulls(state='open', head=f'{repo.owner.login}:{branch_name}')
-        except Exception:
-            existing_prs = []
-        if not existing_prs or existing_prs.totalCount == 0:
-            print(
-                f"Profile '{profile_name}' requires an open PR labeled '{required_label}' for branch '{branch_name}'."
-                " Create a PR for the branch and add the label before running the scaffolder."
-            )
+    if not required_label:
+        return True
+    pr = pr_state["pr"]
+    if pr is None:
+        print(
+            f"Profile '{profile_name}' requires an open PR labeled '{required_label}' for branch '{branch_name}'."
+            " Create a PR for the branch and add the label before running the scaffolder."
+        )
+        return False
+    if required_label not in pr["labels"]:
+        print(
+            f"Profile '{profile_name}' requires PR label '{required_label}' on PR #{pr['number']} for branch '{branch_name}'. Aborting."
+        )
+        return False
+    return True
+
+
+STRUCTURE_IGNORE = frozenset({".git", ".venv", "__pycache__", ".vscode", "node_modules", "dist"})
+STRUCTURE_MAX_DEPTH = 3
+
+
+def structure_scopes(prof: dict) -> list[str]:
+    """Returns the repo-relative paths the profile may edit: allowed_dirs plus each allowed file's directory."""
+    scopes = {d.strip("/") for d in prof.get("allowed_dirs", [])}
+    for f in prof.get("allowed_files", []):
+        parent = posixpath.dirname(f.strip("/"))
+        # A top-level file would scope the whole repo, so list just the file
+        scopes.add(parent or f.strip("/"))
+    scopes.discard("")
+    return sorted(scopes)
+
+
+def scaffold_cache_dir(root: Path) -> Path | None:
+    """Returns <git-common-dir>/scaffold-cache for root, or None outside a git checkout."""
+    try:
+        return root / git(["git", "rev-parse", "--git-common-dir"], cwd=root) / "scaffold-cache"
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Writes text via a temp file and rename so concurrent readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _in_scope(path: str, scopes: list[str], max_depth: int) -> bool:
+    # With no scopes the whole tree is in scope
+    if not scopes:
+        return path.count("/") < max_depth
+    for scope in scopes:
+        if path == scope or scope.startswith(path + "/"):
+            return True  # the scope itself or one of its ancestors
+        if path.startswith(scope + "/"):
+            return path.count("/") - scope.count("/") <= max_depth
+    return False
+
+
+def _iter_structure(path: str, rel: str, scopes: list[str], max_depth: int) -> Iterator[str]:
+    """Yields listing lines depth-first in name order, pruning ignored and out-of-scope subtrees.
+
+    A directory outside the scopes has no in-scope descendants, so it is never
+    entered. Symlinked directories are listed but not followed.
+    """
+    with os.scandir(path) as it:
+        entries = sorted((e for e in it if e.name not in STRUCTURE_IGNORE), key=lambda e: e.name)
+    for entry in entries:
+        entry_rel = f"{rel}/{entry.name}" if rel else entry.name
+        if not _in_scope(entry_rel, scopes, max_depth):
+            continue
+        is_dir = entry.is_dir(follow_symlinks=False)
+        yield f"{'  ' * entry_rel.count('/')}{entry_rel}{'/' if is_dir else ''}"
+        if is_dir:
+            yield from _iter_structure(entry.path, entry_rel, scopes, max_depth)
+
+
+def _walk_structure(root: Path, scopes: list[str], max_depth: int) -> str:
+    return "\n".join(["Project Structure (subset):", *_iter_structure(str(root), "", scopes, max_depth)])
+
+
+def list_project_structure(root: Path, scopes: Iterable[str] = (), max_depth: int = STRUCTURE_MAX_DEPTH) -> str:
+    """Lists the files tracked at HEAD under scopes, at most max_depth levels below each scope.
+
+    Only the paths the profile may edit are worth prompt tokens, so callers pass
+    structure_scopes(prof). Listings are cached under
+    <git dir>/scaffold-cache/<tree sha>-<scope key>.txt; when root is not a git
+    checkout the directory is walked instead.
+    """
+    scopes = sorted(set(scopes))
+    cache_dir = scaffold_cache_dir(root)
+    try:
+        if cache_dir is None:
+            raise OSError("not a git checkout")
+        tree_sha = git(["git", "rev-parse", "HEAD^{tree}"], cwd=root)
+    except (subprocess.CalledProcessError, OSError):
+        return _walk_structure(root, scopes, max_depth)
+    scope_key = hashlib.blake2b("\0".join([str(max_depth), *scopes]).encode("utf-8"), digest_size=8).hexdigest()
+    cache_file = cache_dir / f"{tree_sha}-{scope_key}.txt"
+    try:
+        return cache_file.read_text(encoding="utf-8")
+    except OSError:
+        pass
+
+    lines = ["Project Structure (subset):"]
+    # -t includes the directories themselves; -z keeps paths unquoted; the pathspecs keep git from walking other trees
+    listing = git(["git", "ls-tree", "-r", "-t", "-z", "HEAD", "--", *scopes], cwd=root)
+    for entry in listing.split("\0"):
+        if not entry:
+            continue
+        meta, path = entry.split("\t", 1)
+        # Vendored trees such as frontend/node_modules are tracked but not useful context
+        if not STRUCTURE_IGNORE.isdisjoint(path.split("/")):
+            continue
+        if not _in_scope(path, scopes, max_depth):
+            continue
+        is_dir = meta.split(" ")[1] == "tree"
+        lines.append(f"{'  ' * path.count('/')}{path}{'/' if is_dir else ''}")
+    structure = "\n".join(lines)
+    write_atomic(cache_file, structure)
+    return structure
+
+
+def widen_sparse_checkout(repo_root: Path, scopes: Iterable[str]) -> None:
+    """Adds the scoped directories to a sparse checkout so scaffolded writes land inside the cone.
+
+    CI checks out only the paths the scaffolder reads; this is a no-op on full checkouts.
+    """
+    try:
+        if git(["git", "config", "--bool", "core.sparseCheckout"], cwd=repo_root) != "true":
             return
-        # Check labels on the first matching PR
-        pr = existing_prs[0]
+    except subprocess.CalledProcessError:
+        return  # unset
+    # Cone mode only accepts directories; top-level files are always checked out
+    dirs = git(["git", "ls-tree", "-d", "--name-only", "-z", "HEAD", "--", *scopes], cwd=repo_root).split("\0")
+    dirs = [d for d in dirs if d]
+    if dirs:
+        git(["git", "sparse-checkout", "add", *dirs], cwd=repo_root)
+
+
+# Structured output schema: the API guarantees replies parse and match it
+CHANGES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "changes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string"},
+                    "action": {"type": "string", "enum": ["create", "update"]},
+                    "content": {"type": "string"},
+                },
+                "required": ["path", "action", "content"],
+                "additionalProperties": False,
+            },
+        }
+    },
+    "required": ["changes"],
+    "additionalProperties": False,
+}
+
+
+def build_changes_payload(plan_md: str, structure: str) -> dict:
+    """Returns the chat-completions request body asking for file changes."""
+    model = os.environ.get("PLAN_MODEL", "gpt-4o")
+    system_prompt = (
+        "You are a senior software engineer. Convert the provided feature plan into concrete file edits.\n"
+        "Rules: keep changes minimal; do not delete files; include full file content for create/update; Python 3.11.\n"
+        "Hard constraints: edit only src/pop_fly/core.py, src/pop_fly/web/app.py, tests/test_core.py, tests/test_api.py; no new files; no framework switches; no changes to dependencies or entry points; preserve public API and core symbols as-is.\n"
+        "Budget: ≤ 80 changed lines across ≤ 4 files. If you cannot meet this, return no changes."
+    )
+
+    user_prompt = (
+        "Feature Plan (Markdown):\n\n" + plan_md + "\n\n" +
+        "Repo structure: \n\n" + structure
+    )
+
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.2,
+        "max_tokens": 3000,
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": "changes", "strict": True, "schema": CHANGES_SCHEMA},
+        },
+    }
+
+
+def parse_changes_content(content: str) -> dict:
+    """Parses the model reply into {"changes": [...]}, or an empty result with a note."""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        # Structured output always parses unless max_tokens cut the reply short
+        return {"changes": [], "note": "Model reply was truncated; skipped generation."}
+
+
+def _iter_sse_content(lines: Iterable[str]) -> Iterator[str]:
+    """Yields the text deltas of an OpenAI chat-completions event stream."""
+    for line in lines:
+        if not line or not line.startswith("data: "):
+            continue
+        data = line[len("data: "):]
+        if data == "[DONE]":
+            break
         try:
-            pr_labels = [lbl.name for lbl in pr.get_labels()]
-        except Exception:
-            # Fallback: PyGithub sometimes exposes .labels as an attribute
-            try:
-                pr_labels = [lbl.name for lbl in pr.labels]
-            except Exception:
-                pr_labels = []
-        if required_label not in pr_labels:
-            print(
-                f"Profile '{profile_name}' requires PR label '{required_label}' on PR #{getattr(pr, 'number', '?')} for branch '{branch_name}'. Aborting."
-            )
-            return
+            content = json.loads(data)["choices"][0]["delta"].get("content")
+        except (ValueError, KeyError, IndexError):
+            continue
+        if content:
+            yield content
+
+
+def call_llm_for_changes(plan_md: str, structure: str) -> dict:
+    """Asks the model for file changes for the plan.
+
+    The reply is streamed and always read to the end: select_changes takes the
+    smallest changes first, so one arriving late can still fit the budget.
+    """
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        return {"changes": [], "note": "OPENAI_API_KEY not set; skipped generation."}
+
+    payload = build_changes_payload(plan_md, structure)
+    if os.environ.get("PLAN_MODE") == "batch":
+        # Batch API: half the token price, at the cost of waiting for the batch to finish
+        batch_content = run_openai_batch({"plan": payload}, api_key).get("plan")
+        if batch_content is None:
+            return {"changes": [], "note": "Batch returned no result; skipped generation."}
+        content = batch_content
+    else:
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        payload["stream"] = True
+        with _get_http_session().post(
+            f"{OPENAI_BASE}/chat/completions", headers=headers, json=payload, timeout=180, stream=True
+        ) as resp:
+            resp.raise_for_status()
+            content = "".join(_iter_sse_content(resp.iter_lines(decode_unicode=True)))
+    return parse_changes_content(content)
+
+
+def llm_cache_file(root: Path, plan_md: str, structure: str, profile_name: str, scopes: list[str]) -> Path | None:
+    """Returns where the changes generated for this exact request are cached, or None outside git.
+
+    The key covers the full request body (plan, structure, prompts, model), the
+    profile and the tree ids of the editable paths: replies carry whole-file
+    contents, so they may only be replayed onto the files they were written for.
+    """
+    cache_dir = scaffold_cache_dir(root)
+    if cache_dir is None:
+        return None
+    try:
+        trees = git(["git", "ls-tree", "-z", "HEAD", "--", *scopes], cwd=root)
+    except subprocess.CalledProcessError:
+        return None  # no commit yet
+    request = "\0".join([json.dumps(build_changes_payload(plan_md, structure), sort_keys=True), profile_name, trees])
+    key = hashlib.blake2b(request.encode("utf-8"), digest_size=16).hexdigest()
+    return cache_dir / "llm" / f"{key}.json"
+
+
+def read_cached_changes(cache_file: Path | None) -> dict | None:
+    """Returns the cached {"changes": [...]} result, or None on a miss."""
+    if cache_file is None:
+        return None
+    try:
+        return json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def cache_changes(cache_file: Path | None, llm_result: dict) -> None:
+    """Stores llm_result for reuse; empty results (no key, truncated reply) are asked again next time."""
+    if cache_file is not None and llm_result.get("changes"):
+        write_atomic(cache_file, json.dumps(llm_result))
+
+
+def select_changes(changes: list, repo_root: Path, prof: dict) -> tuple[list[tuple[Path, str]], str | None]:
+    """Applies the profile's path policy and budgets to changes.
+
+    Eligible changes are taken smallest first, so the line budget admits as many
+    files as possible. Returns the (target, content) pairs to write, in the
+    model's order, and a message when a budget left changes out.
+    """
+    allowed_dirs = [repo_root / "src", repo_root / "tests", repo_root / "frontend", repo_root / "scripts"]
     allowed_files_set = set((repo_root / p).resolve() for p in prof.get("allowed_files", []))
     allowed_dirs_extra = [repo_root / p for p in prof.get("allowed_dirs", [])]
     if allowed_dirs_extra:
@@ -120,88 +504,13 @@ def main() -> None:
     max_files = int(prof.get("max_files", 4))
     max_total_lines = int(prof.get("max_lines", 80))
     allow_new_files = bool(prof.get("allow_new_files", False))
-    forbidden_imports = list(prof.get("forbidden_imports", []))
-    forbidden_paths = set(prof.get("forbidden_paths", []))
-
-    def list_project_structure(root: Path) -> str:
-        lines = ["Project Structure (subset):"]
-        ignore = {".git", ".venv", "__pycache__", ".vscode", "node_modules", "dist"}
-        for p in sorted(root.rglob("*")):
-            if any(part in ignore for part in p.parts):
-                continue
-            try:
-                rel = p.relative_to(root)
-            except Exception:
-                continue
-            depth = len(rel.parts) - 1
-            indent = "  " * max(depth, 0)
-            lines.append(f"{indent}{rel.as_posix()}{'/' if p.is_dir() else ''}")
-        return "\n".join(lines)
-
-    def call_llm_for_changes(plan_md: str, structure: str) -> dict:
-        model = os.environ.get("PLAN_MODEL", "gpt-4o")
-        api_key = os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            return {"changes": [], "note": "OPENAI_API_KEY not set; skipped generation."}
-
-        # Lazy import and install requests if missing
-        try:
-            import requests  # type: ignore
-        except Exception:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "requests>=2.31.0"])  # noqa: S603,S607
-            import requests  # type: ignore  # noqa: E402
-
-        system_prompt = (
-            "You are a senior software engineer. Convert the provided feature plan into concrete file edits.\n"
-            "Return ONLY valid JSON with this exact schema: {\"changes\": [ {\"path\": string, \"action\": \"create\"|\"update\", \"content\": string } ]}.\n"
-            "Rules: keep changes minimal; do not delete files; include full file content for create/update; Python 3.11.\n"
-            "Hard constraints: edit only src/pop_fly/core.py, src/pop_fly/web/app.py, tests/test_core.py, tests/test_api.py; no new files; no framework switches; no changes to dependencies or entry points; preserve public API and core symbols as-is.\n"
-            "Budget: ≤ 80 changed lines across ≤ 4 files. If you cannot meet this, return {\"changes\": []}."
-        )
+    # Trailing separators so "src_extra/" does not pass as "src/"; one C-level startswith per check
+    repo_prefix = str(repo_root) + os.sep
+    allowed_prefixes = tuple(str(ad) + os.sep for ad in allowed_dirs)
 
-        user_prompt = (
-            "Feature Plan (Markdown):\n\n" + plan_md + "\n\n" +
-            "Repo structure: \n\n" + structure + "\n\n" +
-            "Produce JSON now."
-        )
-
-        payload = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            "temperature": 0.2,
-            "max_tokens": 3000,
-        }
-
-        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-        resp = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload, timeout=180)
-        resp.raise_for_status()
-        content = resp.json()["choices"][0]["message"]["content"]
-
-        # Some models might wrap JSON in code fences; strip if present
-        content = content.strip()
-        if content.startswith("```"):
-            # remove first fence line and last fence line if present
-            lines = [ln for ln in content.splitlines() if not ln.strip().startswith("```")]
-            content = "\n".join(lines).strip()
-        try:
-            data = json.loads(content)
-        except json.JSONDecodeError:
-            # Best-effort: if it returned non-JSON, skip generation
-            return {"changes": [], "note": "Model returned non-JSON; skipped generation."}
-        if not isinstance(data, dict) or "changes" not in data or not isinstance(data["changes"], list):
-            return {"changes": [], "note": "Unexpected schema; skipped generation."}
-        return data
-
-    structure = list_project_structure(repo_root)
-    llm_result = call_llm_for_changes(plan_content, structure)
-
-    applied_files: list[str] = []
-    total_lines_written = 0
-    change_count = 0
-    for change in llm_result.get("changes", []):
+    # (line count, model order, target, content) for changes the path policy allows
+    eligible: list[tuple[int, int, Path, str]] = []
+    for index, change in enumerate(changes):
         try:
             rel_path = str(change.get("path", "")).strip()
             action = str(change.get("action", "")).strip().lower()
@@ -209,97 +518,142 @@ def main() -> None:
             if not rel_path or action not in {"create", "update"}:
                 continue
             target = (repo_root / rel_path).resolve()
+            target_str = str(target)
             # Safety: must be under repo and within allowed dirs
-            if not str(target).startswith(str(repo_root)):
-                continue
-            if not any(str(target).startswith(str(ad)) for ad in allowed_dirs):
+            if not target_str.startswith(repo_prefix) or not target_str.startswith(allowed_prefixes):
                 continue
             # Enforce that only files and directories allowed by the profile can be changed or created
-            if allowed_files_set:
-                if target not in allowed_files_set:
-                    continue
-            else:
-                # If no allowed_files specified, ensure it's under the allowed dirs
-                if not any(str(target).startswith(str(ad)) for ad in allowed_dirs):
-                    continue
+            if allowed_files_set and target not in allowed_files_set:
+                continue
             # File creation policy
             if action == "create" and not target.exists() and not allow_new_files:
                 continue
-            # Enforce budgets
-            change_count += 1
-            if change_count > max_files:
-                print("Skipping change: exceeds file count budget")
-                break
             line_count = content.count("\n") + 1 if content else 0
-            if total_lines_written + line_count > max_total_lines:
-                print("Skipping change: exceeds line budget")
-                break
+            eligible.append((line_count, index, target, content))
+        except Exception as e:
+            print(f"Skipping change due to error: {e}")
+
+    # Enforce budgets, smallest changes first
+    eligible.sort(key=lambda item: (item[0], item[1]))
+    accepted: list[tuple[int, Path, str]] = []
+    total_lines_written = 0
+    note = None
+    for line_count, index, target, content in eligible:
+        if len(accepted) >= max_files:
+            note = "Skipping change: exceeds file count budget"
+            break
+        if total_lines_written + line_count > max_total_lines:
+            # Everything after this is at least as large
+            note = "Skipping change: exceeds line budget"
+            break
+        accepted.append((index, target, content))
+        total_lines_written += line_count
+    accepted.sort(key=lambda item: item[0])
+    return [(target, content) for _, target, content in accepted], note
+
+
+def diff_name_status(repo_root: Path) -> list[tuple[bytes, list[bytes]]]:
+    """Returns (status, paths) for unstaged working-tree changes, read from NUL-separated output.
+
+    Paths are raw bytes, so names with spaces or non-UTF-8 bytes survive intact.
+    Renames and copies (R100, C75, ...) carry both the old and the new path.
+    """
+    tokens = subprocess.check_output(["git", "diff", "--name-status", "-z"], cwd=repo_root).split(b"\0")
+    entries: list[tuple[bytes, list[bytes]]] = []
+    i = 0
+    while i < len(tokens) and tokens[i]:
+        status = tokens[i]
+        n_paths = 2 if status[:1] in (b"R", b"C") else 1
+        entries.append((status, tokens[i + 1:i + 1 + n_paths]))
+        i += 1 + n_paths
+    return entries
+
+
+def scaffold_changes(token: str, pr_state: dict, branch_name: str, repo_root: Path, prof: dict, plan_content: str, llm_result: dict) -> bool:
+    """Applies, validates, commits and pushes the LLM changes, then creates or updates the PR.
+
+    Returns False when validation failed and nothing was committed.
+    """
+    forbidden_imports = list(prof.get("forbidden_imports", []))
+    forbidden_paths = set(prof.get("forbidden_paths", []))
+
+    writes, budget_note = select_changes(llm_result.get("changes", []), repo_root, prof)
+    if budget_note:
+        print(budget_note)
+    # One write per file, the last listed content winning as a serial apply would;
+    # two concurrent writes to one path would race
+    writes = list({target: (target, content) for target, content in writes}.values())
+    # Forbidden imports (Flask); compiled once per run, not per file
+    forbidden_res = [(bad, re.compile(rf"\b{re.escape(bad)}\b", re.IGNORECASE)) for bad in forbidden_imports]
+
+    def apply_one(change: tuple[Path, str]) -> tuple[str | None, list[str]]:
+        # Write and scan in one task so the content is checked without re-reading it
+        target, content = change
+        try:
             target.parent.mkdir(parents=True, exist_ok=True)
             # Write full content for both create and update
             with open(target, "w", encoding="utf-8", newline="") as wf:
                 wf.write(content)
-            applied_files.append(str(target.relative_to(repo_root)))
-            total_lines_written += line_count
         except Exception as e:
             print(f"Skipping change due to error: {e}")
+            return None, []
+        rel = target.relative_to(repo_root).as_posix()
+        return rel, [f"Forbidden import '{bad}' detected in {rel}" for bad, bad_re in forbidden_res if bad_re.search(content)]
 
+    # Repo-relative path -> content written, so validation reads from memory
+    applied_contents: dict[str, str] = {}
     # Quick static validations before commit
     failures: list[str] = []
-    # Forbidden imports (Flask)
-    for path in applied_files:
-        p = repo_root / path
-        try:
-            txt = p.read_text(encoding="utf-8")
-        except Exception:
-            txt = ""
-        for bad in forbidden_imports:
-            if re.search(rf"\b{re.escape(bad)}\b", txt or "", flags=re.IGNORECASE):
-                failures.append(f"Forbidden import '{bad}' detected in {path}")
+    if writes:
+        with ThreadPoolExecutor(max_workers=min(SCAFFOLD_WORKERS, len(writes))) as executor:
+            for (_, content), (rel, file_failures) in zip(writes, executor.map(apply_one, writes)):
+                if rel is not None:
+                    applied_contents[rel] = content
+                failures.extend(file_failures)
+
+    def current_text(rel: str) -> str:
+        if rel in applied_contents:
+            return applied_contents[rel]
+        return (repo_root / rel).read_text(encoding="utf-8")
+
     # Required symbols present after edits (best-effort)
-    core_txt = (repo_root / "src/pop_fly/core.py").read_text(encoding="utf-8")
-    if not re.search(r"def\s+compute_distance_bearing_xy\(", core_txt):
+    core_txt = current_text("src/pop_fly/core.py")
+    if not _COMPUTE_DEF_RE.search(core_txt):
         failures.append("compute_distance_bearing_xy is required in core.py")
-    if not re.search(r"def\s+_parse_pair_mgrs_digits\(", core_txt):
+    if not _PARSE_PAIR_DEF_RE.search(core_txt):
         failures.append("_parse_pair_mgrs_digits is required in core.py")
-    web_txt = (repo_root / "src/pop_fly/web/app.py").read_text(encoding="utf-8")
-    if not re.search(r"FastAPI\(", web_txt) or not re.search(r"@app.post\(\"/api/compute\"\)", web_txt):
+    web_txt = current_text("src/pop_fly/web/app.py")
+    if "FastAPI(" not in web_txt or not _COMPUTE_ROUTE_RE.search(web_txt):
         failures.append("FastAPI app or /api/compute endpoint missing in web/app.py")
 
     # Guard against test deletions and dependency changes in working tree
+    forbidden_path_bytes = {os.fsencode(p) for p in forbidden_paths}
     try:
-        diff_name_status = git(["git", "diff", "--name-status"]).splitlines()
+        diff_entries = diff_name_status(repo_root)
     except Exception:
-        diff_name_status = []
-    for line in diff_name_status:
-        # Format: M	path or D	path
-        parts = line.split() if line else []
-        if len(parts) >= 2 and parts[0] == "D" and parts[1].startswith("tests/"):
+        diff_entries = []
+    for status, paths in diff_entries:
+        if status == b"D" and paths[0].startswith(b"tests/"):
             failures.append("Deletion in tests/ is forbidden")
-        if len(parts) >= 2 and parts[1] in forbidden_paths and parts[0] != "":
-            failures.append(f"Changes to {parts[1]} are forbidden")
+        for path in paths:
+            if path in forbidden_path_bytes:
+                failures.append(f"Changes to {os.fsdecode(path)} are forbidden")
 
     if failures:
         print("\nValidation failures:\n- " + "\n- ".join(failures))
         print("Aborting commit/push due to validation failures.")
-        return
+        return False
 
-    # Commit and push if there are changes
+    # Commit if there are changes, note HEAD as scaffolded, and push both back
     try:
-        status = git(["git", "status", "--porcelain"]).strip()
-        if status:
-            git(["git", "add", "-A"])
-            git(["git", "config", "user.name", "github-actions"])
-            git(["git", "config", "user.email", "github-actions@users.noreply.github.com"])
-            git(["git", "commit", "-m", "chore: scaffold code from feature plan"])
-            # Push back to the same branch
-            git(["git", "push", "origin", branch_name])
+        run_git_script(commit_and_push_script(branch_name), cwd=repo_root)
     except subprocess.CalledProcessError as e:
-        print(f"Git commit/push failed: {e}")
+        print(f"Git commit/push failed: {e}\n{e.stdout}{e.stderr}")
 
     # Prepare PR content
     pr_title = f"feat: Implement feature from plan '{branch_name}'"
-    if applied_files:
-        changed_list = "\n".join(f"- {p}" for p in applied_files)
+    if applied_contents:
+        changed_list = "\n".join(f"- {p}" for p in applied_contents)
         pr_body = (
             "This PR includes AI-scaffolded changes based on the plan.\n\n"
             "Changed files:\n" + changed_list + "\n\n---\n\n" + plan_content
@@ -310,30 +664,195 @@ def main() -> None:
             f"No scaffolded changes were generated automatically ({note}).\n\n"
             "Plan for reference:\n\n---\n\n" + plan_content
         )
-    
+
     try:
-        # Check if a PR already exists for this branch
-        existing_prs = repo.get_pulls(state='open', head=f'{repo.owner.login}:{branch_name}')
-        if existing_prs.totalCount > 0:
+        # Reuse the PR looked up before generation instead of listing pulls again
+        pr = pr_state["pr"]
+        if pr is not None:
             print(f"A pull request already exists for branch '{branch_name}'.")
-            # Optionally, update the existing PR
-            pr = existing_prs[0]
-            pr.edit(title=pr_title, body=pr_body)
-            print(f"Updated existing PR: {pr.html_url}")
-            return
-
-        pr = repo.create_pull(
-            title=pr_title,
-            body=pr_body,
-            head=branch_name,
-            base=repo.default_branch,
+            github_graphql(token, UPDATE_PR_MUTATION, {"input": {"pullRequestId": pr["id"], "title": pr_title, "body": pr_body}})
+            print(f"Updated existing PR: {pr['url']}")
+            return True
+
+        created = github_graphql(
+            token,
+            CREATE_PR_MUTATION,
+            {
+                "input": {
+                    "repositoryId": pr_state["repository_id"],
+                    "baseRefName": pr_state["default_branch"],
+                    "headRefName": branch_name,
+                    "title": pr_title,
+                    "body": pr_body,
+                }
+            },
         )
-        print(f"Created pull request: {pr.html_url}")
+        print(f"Created pull request: {created['createPullRequest']['pullRequest']['url']}")
     except Exception as e:
         print(f"Failed to create or update pull request: {e}")
         # This can happen if the branch is up-to-date with the base
         # or other permission issues.
         print("This might be because the branch has no new commits to merge.")
+    return True
+
+
+def run_git_script(script: str, cwd: Path | None = None) -> str:
+    """Runs a sequence of git commands in one shell instead of one Python subprocess per command."""
+    return subprocess.run(["sh", "-c", script], check=True, text=True, capture_output=True, cwd=cwd).stdout
+
+
+def commit_and_push_script(branch_name: str) -> str:
+    """Shell script committing pending changes and pushing them with the scaffold note.
+
+    HEAD is noted under SCAFFOLD_NOTES_REF so --collect skips the branch until it moves.
+    """
+    branch = shlex.quote(branch_name)
+    notes = shlex.quote(SCAFFOLD_NOTES_REF)
+    return (
+        "set -e\n"
+        "git config user.name github-actions\n"
+        "git config user.email github-actions@users.noreply.github.com\n"
+        'if [ -n "$(git status --porcelain)" ]; then\n'
+        "  git add -A\n"
+        "  git commit -q -m 'chore: scaffold code from feature plan'\n"
+        "fi\n"
+        # Start from the remote notes so the push below fast-forwards
+        f"git fetch -q origin +{notes}:{notes} || true\n"
+        f"git notes --ref={notes} add -f -m scaffolded HEAD\n"
+        f"git push -q origin {branch} {notes}\n"
+    )
+
+
+def collect_pending_plans(repo) -> dict[str, str]:
+    """Returns {branch: plan_md} for 'feature/plan-*' branches whose HEAD has no scaffold note."""
+    try:
+        git(["git", "fetch", "origin", f"+{SCAFFOLD_NOTES_REF}:{SCAFFOLD_NOTES_REF}"])
+    except subprocess.CalledProcessError:
+        pass  # no notes pushed yet
+    pending: dict[str, str] = {}
+    for branch in repo.get_branches():
+        if not branch.name.startswith(PLAN_BRANCH_PREFIX):
+            continue
+        try:
+            git(["git", "notes", f"--ref={SCAFFOLD_NOTES_REF}", "show", branch.commit.sha])
+            continue  # already scaffolded at this head
+        except subprocess.CalledProcessError:
+            pass
+        try:
+            plan = repo.get_contents(PLAN_PATH, ref=branch.name).decoded_content.decode("utf-8")
+        except Exception:
+            continue  # no plan on this branch
+        pending[branch.name] = plan
+    return pending
+
+
+def run_collect(repo, token: str) -> None:
+    """Scaffolds every pending plan branch from a single OpenAI Batch API job."""
+    pending = collect_pending_plans(repo)
+    if not pending:
+        print("No pending feature plans.")
+        return
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise SystemExit("OPENAI_API_KEY is required for --collect")
+
+    worktree_base = Path(tempfile.mkdtemp(prefix="scaffold-"))
+    jobs: dict[str, tuple[Path, dict, str, dict, Path | None]] = {}
+    payloads: dict[str, dict] = {}
+    try:
+        git(["git", "fetch", "origin", *pending])
+        for branch_name, plan_content in pending.items():
+            # Each branch is edited in its own worktree, so one checkout serves all of them
+            root = worktree_base / branch_name.replace("/", "-")
+            git(["git", "worktree", "add", "-B", branch_name, str(root), f"origin/{branch_name}"])
+            root = root.resolve()
+            profile_name, prof = load_profile(root)
+            widen_sparse_checkout(root, structure_scopes(prof))
+            pr_state = fetch_pr_state(token, repo.full_name, branch_name)
+            if not passes_label_gate(pr_state, branch_name, profile_name, prof):
+                continue
+            scopes = structure_scopes(prof)
+            structure = list_project_structure(root, scopes)
+            cache_file = llm_cache_file(root, plan_content, structure, profile_name, scopes)
+            jobs[branch_name] = (root, prof, plan_content, pr_state, cache_file)
+            if read_cached_changes(cache_file) is None:
+                payloads[branch_name] = build_changes_payload(plan_content, structure)
+
+        results = run_openai_batch(payloads, api_key) if payloads else {}
+        for branch_name, (root, prof, plan_content, pr_state, cache_file) in jobs.items():
+            print(f"--- {branch_name}")
+            llm_result = read_cached_changes(cache_file)
+            if llm_result is not None:
+                print("Reusing cached changes for an unchanged plan.")
+            elif branch_name not in results:
+                llm_result = {"changes": [], "note": "Batch returned no result; skipped generation."}
+            else:
+                llm_result = parse_changes_content(results[branch_name])
+                cache_changes(cache_file, llm_result)
+            scaffold_changes(token, pr_state, branch_name, root, prof, plan_content, llm_result)
+    finally:
+        shutil.rmtree(worktree_base, ignore_errors=True)
+        git(["git", "worktree", "prune"])
+
+
+def main() -> None:
+    """Main entry point for the script."""
+    parser = argparse.ArgumentParser(description="Scaffold from a feature plan.")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--branch", type=str, help="The feature branch with the plan.")
+    mode.add_argument(
+        "--collect",
+        action="store_true",
+        help=f"Scaffold all pending '{PLAN_BRANCH_PREFIX}*' branches with one OpenAI Batch API job.",
+    )
+    args = parser.parse_args()
+
+    token = os.environ.get("GITHUB_TOKEN")
+    if not token:
+        raise SystemExit("GITHUB_TOKEN missing. Use POP_FLY_PAT for this script.")
+
+    repo_slug = os.environ.get("GITHUB_REPOSITORY")
+    if not repo_slug:
+        raise SystemExit("GITHUB_REPOSITORY missing")
+
+    if args.collect:
+        # Branch listing and plan reads still go through REST
+        gh = Github(token, retry=GithubRetry(total=3, backoff_factor=0.5), per_page=100, pool_size=HTTP_POOL_SIZE)
+        run_collect(gh.get_repo(repo_slug), token)
+        return
+
+    branch_name = args.branch
+
+    if not os.path.exists(PLAN_PATH):
+        print(f"Plan file '{PLAN_PATH}' not found on branch '{branch_name}'. Exiting.")
+        return
+
+    with open(PLAN_PATH, "r", encoding="utf-8") as f:
+        plan_content = f.read()
+
+    # Use a generative AI to turn the plan into concrete file changes.
+    # Strategy:
+    # 1) Provide the plan and current project structure to the LLM.
+    # 2) Ask for a strict JSON response describing file edits to apply.
+    # 3) Apply safe changes only within src/, tests/, frontend/, or scripts/.
+    # 4) Commit and push edits back to the same branch.
+    repo_root = Path(".").resolve()
+    profile_name, prof = load_profile(repo_root)
+    pr_state = fetch_pr_state(token, repo_slug, branch_name)
+    if not passes_label_gate(pr_state, branch_name, profile_name, prof):
+        return
+
+    scopes = structure_scopes(prof)
+    widen_sparse_checkout(repo_root, scopes)
+    structure = list_project_structure(repo_root, scopes)
+    cache_file = llm_cache_file(repo_root, plan_content, structure, profile_name, scopes)
+    llm_result = read_cached_changes(cache_file)
+    if llm_result is not None:
+        print("Reusing cached changes for an unchanged plan.")
+    else:
+        llm_result = call_llm_for_changes(plan_content, structure)
+        cache_changes(cache_file, llm_result)
+    scaffold_changes(token, pr_state, branch_name, repo_root, prof, plan_content, llm_result)
 
 
 if __name__ == "__main__":
@@ -17,16 +17,55 @@ import json
 import os
 import re
 import sys
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 try:
     from github import Github  # type: ignore
 except Exception:
     Github = None
 
+try:
+    import ahocorasick  # type: ignore  # optional: pip install pyahocorasick
+except ImportError:
+    ahocorasick = None
+
 CHECKLIST_START = "<!-- PLAN-CHECKLIST:START -->"
 CHECKLIST_END = "<!-- PLAN-CHECKLIST:END -->"
 ISSUE_REF_RE = re.compile(r"#(\d+)")
+# Leading '*' bullets, then a '[ ]'/'[x]' checkbox: both markers stripped in one substitution
+_BULLET_RE = re.compile(r"^(?:\*+\s*)?(?:\[.?\]\s*)?")
+PLAN_COMMENT_PREFIX = "Automated plan ("
+MAX_TASKS = 15
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+# The PR's body and first page of commit messages plus, when the linked issue is
+# already known from the event payload, that issue's body and latest comments:
+# one round trip for any PR with at most 100 commits (GitHub GraphQL's
+# per-connection cap; PR_COMMITS_QUERY pages through the rest).
+PR_BUNDLE_QUERY = """
+query($o: String!, $r: String!, $n: Int!, $i: Int!, $withIssue: Boolean!) {
+  repository(owner: $o, name: $r) {
+    pullRequest(number: $n) {
+      id title body
+      commits(first: 100) { pageInfo { hasNextPage endCursor } nodes { commit { message } } }
+    }
+    issue(number: $i) @include(if: $withIssue) { body comments(last: 50) { nodes { body } } }
+  }
+}
+"""
+PR_COMMITS_QUERY = """
+query($o: String!, $r: String!, $n: Int!, $after: String!) {
+  repository(owner: $o, name: $r) {
+    pullRequest(number: $n) {
+      commits(first: 100, after: $after) { pageInfo { hasNextPage endCursor } nodes { commit { message } } }
+    }
+  }
+}
+"""
+GITHUB_API_URL = "https://api.github.com"
+ETAG_CACHE_NAME = "pr_checklist_etags.json"
+UPDATE_PR_BODY_MUTATION = """
+mutation($id: ID!, $body: String!) { updatePullRequest(input: {pullRequestId: $id, body: $body}) { clientMutationId } }
+"""
 
 
 def ensure_pygithub() -> None:
@@ -48,6 +87,7 @@ def get_pr_context():
     owner, repo = repo_slug.split("/", 1)
 
     pr_number: Optional[int] = None
+    issue_hint: Optional[int] = None
     event_path = os.environ.get("GITHUB_EVENT_PATH")
     event_name = os.environ.get("GITHUB_EVENT_NAME")
     if event_name and event_path and os.path.exists(event_path):
@@ -55,51 +95,230 @@ def get_pr_context():
             event = json.load(f)
         if event.get("pull_request") and event["pull_request"].get("number"):
             pr_number = int(event["pull_request"]["number"])
+            # Lets the first query fetch the linked issue alongside the PR
+            issue_hint = find_issue_number(event["pull_request"].get("title") or "", event["pull_request"].get("body") or "")
     if not pr_number:
         pr_number = int(os.environ.get("INPUT_PR", "0") or 0) or None
     if not pr_number:
         raise SystemExit("No PR number available")
-    return owner, repo, pr_number
+    return owner, repo, pr_number, issue_hint
 
 
 def find_issue_number(pr_title: str, pr_body: str) -> Optional[int]:
-    for text in (pr_title or "", pr_body or ""):
-        m = ISSUE_REF_RE.search(text)
-        if m:
-            return int(m.group(1))
-    return None
+    # One search over title then body; "#N" cannot span the joining newline
+    m = ISSUE_REF_RE.search(f"{pr_title or ''}\n{pr_body or ''}")
+    return int(m.group(1)) if m else None
+
+
+def latest_plan(bodies_newest_first: Iterable[Optional[str]]) -> str:
+    """Return the text of the first plan comment in newest-first order, or ""."""
+    for body in bodies_newest_first:
+        if body and body.startswith(PLAN_COMMENT_PREFIX):
+            return body.split("\n\n", 1)[-1].strip()
+    return ""
+
+
+def etag_cache_path() -> Optional[str]:
+    """Where conditional-request state is kept between runs (restored by the workflow's cache step)."""
+    runner_temp = os.environ.get("RUNNER_TEMP")
+    return os.path.join(runner_temp, ETAG_CACHE_NAME) if runner_temp else None
+
+
+def load_etag_cache(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_etag_cache(path: Optional[str], cache: Dict[str, Dict[str, Any]]) -> None:
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+
+
+def _conditional_get(token: str, url: str, cache: Dict[str, Dict[str, Any]], extract) -> Tuple[Dict[str, Any], bool]:
+    """GET url with If-None-Match; a 304 (free against the rate limit) reuses the cached extract(response).
+
+    Returns (entry, modified); modified is False when the entry came from the cache.
+    """
+    import requests  # installed alongside PyGithub
+
+    headers = {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"}
+    entry = cache.get(url)
+    if entry:
+        headers["If-None-Match"] = entry["etag"]
+    resp = requests.get(url, headers=headers, timeout=30)
+    if resp.status_code == 304 and entry:
+        return entry, False
+    resp.raise_for_status()
+    entry = extract(resp)
+    if resp.headers.get("ETag"):
+        cache[url] = dict(entry, etag=resp.headers["ETag"])
+    return entry, True
+
+
+def _comment_page(resp) -> Dict[str, Any]:
+    last = resp.links.get("last", {}).get("url", "")
+    m = re.search(r"[?&]page=(\d+)", last)
+    return {"bodies": [c.get("body") for c in resp.json()], "last_page": int(m.group(1)) if m else 1}
+
+
+def fetch_issue_plan(token: str, owner: str, repo: str, issue_num: int, cache: Dict[str, Dict[str, Any]]) -> str:
+    """Return the latest plan comment on the issue, else its body, via conditional REST requests.
+
+    Pages are read newest-first and the scan stops at the first plan comment;
+    unchanged pages answer 304 from their cached ETag.
+    """
+    base = f"{GITHUB_API_URL}/repos/{owner}/{repo}/issues/{issue_num}"
+
+    def page_url(page: int) -> str:
+        return f"{base}/comments?per_page=100" + (f"&page={page}" if page > 1 else "")
+
+    first, modified = _conditional_get(token, page_url(1), cache, _comment_page)
+    pages = {1: first}
+    last_page = first["last_page"]
+    if not modified:
+        # Comments past the first 100 leave page 1, and so its cached Link
+        # header, unchanged: check whether the page after the cached last one exists
+        probe, _ = _conditional_get(token, page_url(last_page + 1), cache, _comment_page)
+        if probe["bodies"]:
+            pages[last_page + 1] = probe
+            # The final page carries no rel="last" link
+            last_page = max(last_page + 1, probe["last_page"])
+    for page in range(last_page, 0, -1):
+        entry = pages.get(page) or _conditional_get(token, page_url(page), cache, _comment_page)[0]
+        plan = latest_plan(reversed(entry["bodies"]))
+        if plan:
+            return plan
+    issue, _ = _conditional_get(token, base, cache, lambda resp: {"body": resp.json().get("body") or ""})
+    return issue["body"].strip()
+
+
+def _graphql(token: str, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    import requests  # installed alongside PyGithub
+
+    resp = requests.post(
+        GITHUB_GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=30,
+    )
+    resp.raise_for_status()
+    payload = resp.json()
+    if payload.get("errors"):
+        raise RuntimeError(f"GitHub GraphQL error: {payload['errors']}")
+    return payload["data"]
+
+
+def _issue_plan_text(issue: Optional[Dict[str, Any]]) -> str:
+    if not issue:
+        return ""
+    comments = issue["comments"]["nodes"]
+    return latest_plan(c["body"] for c in reversed(comments)) or (issue.get("body") or "").strip()
+
+
+def _commit_messages(token: str, owner: str, repo: str, pr_number: int, commits: Dict[str, Any]) -> Iterator[str]:
+    """Yield every commit message of the PR, given its first commits page from PR_BUNDLE_QUERY.
+
+    Later pages are requested only as the consumer reaches them, so a caller that
+    stops early (no tasks, or every task already done) never fetches them.
+    """
+    while True:
+        for n in commits["nodes"]:
+            yield n["commit"]["message"]
+        if not commits["pageInfo"]["hasNextPage"]:
+            return
+        variables = {"o": owner, "r": repo, "n": pr_number, "after": commits["pageInfo"]["endCursor"]}
+        commits = _graphql(token, PR_COMMITS_QUERY, variables)["repository"]["pullRequest"]["commits"]
+
+
+def fetch_pr_bundle(
+    token: str, owner: str, repo: str, pr_number: int, issue_hint: Optional[int], etags: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Return {id, body, commit_messages, plan_text} for the PR via GraphQL; commit_messages is a lazy iterator.
+
+    One query covers the PR, its commits and (given a correct issue_hint) the
+    linked issue; when the hint is missing or stale the issue is read with
+    conditional REST requests instead.
+    """
+    variables = {"o": owner, "r": repo, "n": pr_number, "i": issue_hint or 0, "withIssue": bool(issue_hint)}
+    data = _graphql(token, PR_BUNDLE_QUERY, variables)["repository"]
+    pr = data["pullRequest"]
+    issue_num = find_issue_number(pr["title"], pr["body"] or "")
+    if not issue_num:
+        plan_text = ""
+    elif issue_num == issue_hint:
+        plan_text = _issue_plan_text(data.get("issue"))
+    else:
+        plan_text = fetch_issue_plan(token, owner, repo, issue_num, etags)
+    return {
+        "id": pr["id"],
+        "body": pr["body"] or "",
+        "commit_messages": _commit_messages(token, owner, repo, pr_number, pr["commits"]),
+        "plan_text": plan_text,
+    }
 
 
 def extract_tasks(plan_text: str) -> List[str]:
-    lines = [l.strip(" \t-") for l in plan_text.splitlines() if l.strip()]
-    # Take bullets or numbered items as tasks
-    tasks: List[str] = []
-    for l in lines:
-        if l.startswith(('[', '*', '•')):
+    # Take bullets or numbered items as tasks, de-duplicated in order and clipped
+    # to MAX_TASKS; the rest of the plan is never scanned once the list is full
+    seen: Dict[str, None] = {}
+    for l in plan_text.splitlines():
+        l = l.strip(" \t-")
+        if l.startswith(('[', '*')):
             # Already a checkbox or bullet; strip markers
-            l = re.sub(r"^\*+\s*", "", l)
-            l = re.sub(r"^\[.?\]\s*", "", l)
-        tasks.append(l)
-    # De-dup and clip
-    seen = set()
-    uniq = []
-    for t in tasks:
-        if t not in seen:
-            uniq.append(t)
-            seen.add(t)
-    return uniq[:15] if len(uniq) > 15 else uniq
-
-
-def build_checklist(tasks: List[str], commit_messages: List[str]) -> str:
-    done = set()
-    lower_msgs = [m.lower() for m in commit_messages]
-    for idx, task in enumerate(tasks, start=1):
-        key = task.lower()
-        tag = f"#{idx}"
-        for msg in lower_msgs:
-            if key in msg or tag in msg:
-                done.add(idx)
+            l = _BULLET_RE.sub("", l, count=1)
+        if l.strip() and l not in seen:
+            seen[l] = None
+            if len(seen) == MAX_TASKS:
+                break
+    return list(seen)
+
+
+def _done_tasks(tasks: List[str], commit_messages: Iterable[str]) -> set:
+    """Return the 1-based indexes of tasks whose text or '#<index>' appears in a commit message.
+
+    commit_messages is consumed lazily and abandoned once every task is done, so a
+    paginated source stops fetching pages at that point.
+    """
+    done: set = set()
+    keys = [(idx, task.lower(), f"#{idx}") for idx, task in enumerate(tasks, start=1)]
+    if ahocorasick is not None and tasks:
+        # One automaton pass per message finds every task key and tag at once
+        patterns: Dict[str, List[int]] = {}
+        for idx, key, tag in keys:
+            patterns.setdefault(key, []).append(idx)
+            patterns.setdefault(tag, []).append(idx)
+        always = patterns.pop("", [])  # an empty task text is in every message
+        automaton = ahocorasick.Automaton()
+        for pattern, idxs in patterns.items():
+            automaton.add_word(pattern, idxs)
+        automaton.make_automaton()
+        for msg in commit_messages:
+            done.update(always)
+            for _, idxs in automaton.iter(msg.lower()):
+                done.update(idxs)
+            if len(done) == len(tasks):
                 break
+        return done
+    # One pass over the commits, checking only still-open tasks; stop once all are done
+    for msg in commit_messages:
+        msg = msg.lower()
+        for idx, key, tag in keys:
+            if idx not in done and (key in msg or tag in msg):
+                done.add(idx)
+        if len(done) == len(tasks):
+            break
+    return done
+
+
+def build_checklist(tasks: List[str], commit_messages: Iterable[str]) -> str:
+    done = _done_tasks(tasks, commit_messages)
     lines = ["## Implementation Tasks"]
     for idx, task in enumerate(tasks, start=1):
         mark = "[x]" if idx in done else "[ ]"
@@ -115,45 +334,95 @@ def upsert_section(body: str, content: str) -> str:
     return f"{body}\n\n{CHECKLIST_START}\n{content}\n{CHECKLIST_END}\n"
 
 
-def main() -> None:
-    token = os.environ.get("GITHUB_TOKEN")
-    if not token:
-        raise SystemExit("GITHUB_TOKEN missing")
+def render_body(tasks: List[str], pr_body: str, commit_messages: Iterable[str]) -> Optional[str]:
+    """Return the PR body with the checklist section synced, or None if it would not change."""
+    new_body = upsert_section(pr_body, build_checklist(tasks, commit_messages))
+    return None if new_body == pr_body else new_body
 
-    ensure_pygithub()
 
-    owner, repo_name, pr_number = get_pr_context()
+def sync_with_pygithub(token: str, owner: str, repo_name: str, pr_number: int, etags: Dict[str, Dict[str, Any]]) -> None:
+    """REST fallback for when the GraphQL path fails."""
+    ensure_pygithub()
     assert Github is not None, "PyGithub not initialized"
-    gh = Github(token)
+    gh = Github(token, per_page=100)
     repo = gh.get_repo(f"{owner}/{repo_name}")
     pr = repo.get_pull(pr_number)
 
     issue_num = find_issue_number(pr.title, pr.body or "")
     plan_text = ""
     if issue_num:
-        issue = repo.get_issue(number=issue_num)
-        # pick the latest plan comment
-        comments = list(issue.get_comments())
-        for c in reversed(comments):
-            if c.body and c.body.startswith("Automated plan (" ):
-                plan_text = c.body.split("\n\n", 1)[-1].strip()
-                break
-        if not plan_text:
-            plan_text = (issue.body or "").strip()
+        try:
+            plan_text = fetch_issue_plan(token, owner, repo_name, issue_num, etags)
+        except Exception as e:
+            # e.g. a token the raw REST calls reject; PaginatedList.reversed still walks newest page first
+            print(f"Conditional comment fetch failed ({e}); paging comments via PyGithub.")
+            issue = repo.get_issue(issue_num)
+            plan_text = latest_plan(c.body for c in issue.get_comments().reversed) or (issue.body or "").strip()
 
     if not plan_text:
         print("No plan found; leaving PR unchanged.")
         return
-
     tasks = extract_tasks(plan_text)
-    # Collect commit messages on the PR
-    commit_messages = [c.commit.message for c in pr.get_commits()]
-    checklist = build_checklist(tasks, commit_messages)
+    if not tasks:
+        # Nothing to check off, so the commit pages are not worth fetching
+        print("Plan has no tasks; leaving PR unchanged.")
+        return
 
-    new_body = upsert_section(pr.body or "", checklist)
+    # Stream commit messages: PyGithub pages lazily, so pages after full coverage are never requested
+    commit_messages = (c.commit.message for c in pr.get_commits())
+    new_body = render_body(tasks, pr.body or "", commit_messages)
+    if new_body is None:
+        print("PR checklist already up to date.")
+        return
     pr.edit(body=new_body)
     print("PR checklist updated.")
 
 
+def sync_checklist(
+    token: str, owner: str, repo_name: str, pr_number: int, issue_hint: Optional[int], etags: Dict[str, Dict[str, Any]]
+) -> None:
+    try:
+        bundle = fetch_pr_bundle(token, owner, repo_name, pr_number, issue_hint, etags)
+    except Exception as e:
+        print(f"GraphQL lookup failed ({e}); falling back to the REST API.")
+        sync_with_pygithub(token, owner, repo_name, pr_number, etags)
+        return
+
+    if not bundle["plan_text"]:
+        print("No plan found; leaving PR unchanged.")
+        return
+    tasks = extract_tasks(bundle["plan_text"])
+    if not tasks:
+        print("Plan has no tasks; leaving PR unchanged.")
+        return
+
+    try:
+        # Pages commit messages lazily; this is where any later commit pages are fetched
+        new_body = render_body(tasks, bundle["body"], bundle["commit_messages"])
+    except Exception as e:
+        print(f"GraphQL commit paging failed ({e}); falling back to the REST API.")
+        sync_with_pygithub(token, owner, repo_name, pr_number, etags)
+        return
+    if new_body is None:
+        print("PR checklist already up to date.")
+        return
+    _graphql(token, UPDATE_PR_BODY_MUTATION, {"id": bundle["id"], "body": new_body})
+    print("PR checklist updated.")
+
+
+def main() -> None:
+    token = os.environ.get("GITHUB_TOKEN")
+    if not token:
+        raise SystemExit("GITHUB_TOKEN missing")
+
+    owner, repo_name, pr_number, issue_hint = get_pr_context()
+    cache_path = etag_cache_path()
+    etags = load_etag_cache(cache_path)
+    try:
+        sync_checklist(token, owner, repo_name, pr_number, issue_hint, etags)
+    finally:
+        save_etag_cache(cache_path, etags)
+
+
 if __name__ == "__main__":
     main()
@@ -4,15 +4,26 @@ import argparse
 import json
 import os
 import sys
+from functools import cache
 from pathlib import Path
 
 from .core import Result, _parse_pair_mgrs_digits, compute_distance_bearing_xy
 
+try:  # optional fast encoder; the stdlib json output is identical
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
 
 APP_NAME = "pop_fly"
 
+# Parsed config for the current main() run; None means not read yet
+_CONFIG_CACHE: dict | None = None
+
 
+@cache
 def _config_path() -> Path:
+    # Memoized: the env/platform lookups below are fixed for a run; _reset_config_cache() clears it
     # Windows: %APPDATA%/pop_fly/config.json
     override = os.getenv("POP_FLY_CONFIG_DIR")
     if override:
@@ -31,26 +42,49 @@ def _config_path() -> Path:
     return base / "pop_fly" / "config.json"
 
 
+def _dumps(obj: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(obj, indent=2)
+
+
+def _loads(text: str) -> dict:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def _reset_config_cache() -> None:
+    # The environment (and so the path) may differ between main() calls in one process
+    global _CONFIG_CACHE
+    _CONFIG_CACHE = None
+    _config_path.cache_clear()
+
+
 def _load_config() -> dict:
+    global _CONFIG_CACHE
+    if _CONFIG_CACHE is not None:
+        return _CONFIG_CACHE
     path = _config_path()
+    data: dict = {}
     try:
         if path.is_file():
-            return json.loads(path.read_text(encoding="utf-8"))
+            data = _loads(path.read_text(encoding="utf-8"))
     except Exception:
-        return {}
-    return {}
+        data = {}
+    _CONFIG_CACHE = data
+    return data
 
 
 def _save_config(new_data: dict) -> None:
+    global _CONFIG_CACHE
     path = _config_path()
     path.parent.mkdir(parents=True, exist_ok=True)
-    existing = _load_config()
-    existing.update(new_data)
-    path.write_text(json.dumps(existing, indent=2), encoding="utf-8")
+    merged = {**_load_config(), **new_data}
+    path.write_text(_dumps(merged), encoding="utf-8")
+    # Write-through: the saved dict is the config, so later loads need not re-read it
+    _CONFIG_CACHE = merged
 
 
-def _load_saved_start() -> tuple[float, float] | None:
-    data = _load_config()
+def _saved_start(data: dict) -> tuple[float, float] | None:
     start = data.get("start")
     if isinstance(start, list) and len(start) == 2:
         try:
@@ -64,8 +98,7 @@ def _save_start(start: tuple[float, float]) -> None:
     _save_config({"start": list(start)})
 
 
-def _load_saved_faction() -> str | None:
-    data = _load_config()
+def _saved_faction(data: dict) -> str | None:
     fac = data.get("faction")
     if isinstance(fac, str) and fac.lower() in {"nato", "ru"}:
         return fac.lower()
@@ -77,15 +110,17 @@ def _save_faction(faction: str) -> None:
 
 
 def _clear_start() -> None:
+    global _CONFIG_CACHE
     path = _config_path()
     if path.exists():
         try:
             path.unlink()
         except Exception:
             pass
+    _CONFIG_CACHE = None
 
 
-def main(argv: list[str] | None = None) -> int:
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(prog="pop_fly", description="Distance and azimuth calculator (MGRS digits only; two values E,N)")
     parser.add_argument("--start", type=str, help="Quoted 'EEE,NNN' (1-5 digit E/N)", required=False)
     parser.add_argument("--end", type=str, help="Quoted 'EEE,NNN' (1-5 digit E/N)", required=False)
@@ -97,16 +132,35 @@ def main(argv: list[str] | None = None) -> int:
     parser.add_argument("--faction", type=str, choices=["nato", "ru"], help="Select mil system for this run (overrides persisted)")
     parser.add_argument("--set-faction", dest="set_faction", type=str, choices=["nato", "ru"], help="Persist default faction (nato|ru)")
 
-    args = parser.parse_args(argv)
+    return parser
+
+
+# Built once at import; main() may run many times in one process (tests, embedding)
+_PARSER = _build_parser()
+
+
+def main(argv: list[str] | None = None, *, return_payload: bool = False) -> int | tuple[int, dict | None]:
+    """Run the CLI and return its exit code.
+
+    With return_payload=True, return (exit_code, result) instead, where result is the
+    dict --json would print (None when nothing was computed) and is not printed.
+    """
+    args = _PARSER.parse_args(argv)
+    _reset_config_cache()
+    code, payload = _run(args, return_payload)
+    return (code, payload) if return_payload else code
+
 
+def _run(args: argparse.Namespace, return_payload: bool) -> tuple[int, dict | None]:
     if args.clear_start:
         _clear_start()
         if not (args.start or args.end or args.set_start or args.show_start):
-            return 0
+            return 0, None
 
     if args.show_start:
-        saved = _load_saved_start()
-        fac_saved = _load_saved_faction()
+        cfg = _load_config()
+        saved = _saved_start(cfg)
+        fac_saved = _saved_faction(cfg)
         if saved is None and fac_saved is None:
             print("No persisted start/faction found.")
         else:
@@ -121,15 +175,15 @@ def main(argv: list[str] | None = None) -> int:
             start = _parse_pair_mgrs_digits(args.set_start)
         except Exception as e:
             print(f"Error: {e}")
-            return 2
+            return 2, None
         _save_start(start)
         if not (args.start or args.end):
-            return 0
+            return 0, None
 
     if args.set_faction:
         _save_faction(args.set_faction)
         if not (args.start or args.end or args.set_start):
-            return 0
+            return 0, None
 
     start_tuple: tuple[float, float] | None = None
     end_tuple: tuple[float, float] | None = None
@@ -139,29 +193,29 @@ def main(argv: list[str] | None = None) -> int:
             start_tuple = _parse_pair_mgrs_digits(args.start)
         except Exception as e:
             print(f"Error: {e}")
-            return 2
+            return 2, None
     else:
-        start_tuple = _load_saved_start()
+        start_tuple = _saved_start(_load_config())
 
     if args.end:
         try:
             end_tuple = _parse_pair_mgrs_digits(args.end)
         except Exception as e:
             print(f"Error: {e}")
-            return 2
+            return 2, None
 
     if start_tuple is None:
         print("Error: missing --start and no persisted start set")
-        return 2
+        return 2, None
     if end_tuple is None:
         print("Error: missing --end")
-        return 2
+        return 2, None
 
     # Resolve faction: CLI arg > persisted > default nato
-    faction = args.faction or _load_saved_faction() or "nato"
+    faction = args.faction or _saved_faction(_load_config()) or "nato"
     res: Result = compute_distance_bearing_xy(start_tuple, end_tuple, faction=faction)
 
-    if args.json:
+    if args.json or return_payload:
         payload = {
             "format": "mgrs-digits",
             "start": list(start_tuple),
@@ -170,14 +224,16 @@ def main(argv: list[str] | None = None) -> int:
             "azimuth_mils": round(res.azimuth_mils, 1),
             "faction": res.faction,
         }
-        print(json.dumps(payload, indent=2))
+        if return_payload:
+            return 0, payload
+        print(_dumps(payload))
     else:
         dist = f"{res.distance_m:.{args.precision}f}"
         az = f"{res.azimuth_mils:.1f}"
         system = "6400" if res.faction == "nato" else "6000"
         print(f"Distance: {dist} m | Azimuth: {az} mils ({res.faction.upper()} {system})")
 
-    return 0
+    return 0, None
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from math import atan2, degrees, hypot, isfinite
-from typing import Tuple
+from functools import lru_cache
+from math import atan2, hypot, isfinite, pi
+from typing import Sequence, Tuple
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Result:
     distance_m: float
     azimuth_mils: float
@@ -13,6 +14,13 @@ class Result:
     faction: str = "nato"
 
 
+# Meters per unit of a 1-5 digit MGRS component, indexed by digit count
+_MGRS_SCALE = (0.0, 10000.0, 1000.0, 100.0, 10.0, 1.0)
+
+
+# Firing points repeat across requests; hits skip the split/isdigit/int work. Errors are
+# never cached, so invalid input raises every time.
+@lru_cache(maxsize=4096)
 def _parse_pair_mgrs_digits(value: str) -> Tuple[float, float]:
     """
     Parse an MGRS-like shorthand pair such as "037,050" (3-digit easting, 3-digit northing)
@@ -27,34 +35,106 @@ def _parse_pair_mgrs_digits(value: str) -> Tuple[float, float]:
     raw = value.replace(",", " ").split()
     if len(raw) != 2:
         raise ValueError("Expected 'E N' for MGRS shorthand (two values only)")
+    return (_expand_mgrs_token(raw[0]), _expand_mgrs_token(raw[1]))
 
-    def expand(token: str) -> float:
-        if not token.isdigit():
-            raise ValueError("MGRS shorthand requires integer digit strings for E and N (1-5 digits)")
-        if not (1 <= len(token) <= 5):
-            raise ValueError("MGRS shorthand supports 1 to 5 digits for E/N components")
-        scale = 10 ** (5 - len(token))
-        return float(int(token) * scale)
 
-    try:
-        e = expand(raw[0])
-        n = expand(raw[1])
-        return (e, n)
-    except ValueError as e:
-        # Re-raise with a clearer message
-        raise ValueError(str(e))
+@lru_cache(maxsize=4096)
+def _expand_mgrs_token(token: str) -> float:
+    if not token.isdigit():
+        raise ValueError("MGRS shorthand requires integer digit strings for E and N (1-5 digits)")
+    n = len(token)  # >= 1 here: "".isdigit() is False
+    if n > 5:
+        raise ValueError("MGRS shorthand supports 1 to 5 digits for E/N components")
+    return int(token) * _MGRS_SCALE[n]
+
+
+def _mgrs_token(value: float | str) -> str:
+    """Digit token for one JSON E/N value: strings keep leading zeros, numbers are truncated."""
+    token = value.strip() if isinstance(value, str) else str(int(float(value)))
+    # Strip any decimals; only integer digits are allowed for E/N
+    return token.split(".", 1)[0]
+
+
+def _coerce_mgrs(parts: Sequence[float | str]) -> Tuple[float, float]:
+    """Expand a JSON [E, N] pair straight to meters without re-joining it into a string.
+
+    Plain digit tokens (the normal case) are expanded directly; anything else goes
+    through _parse_pair_mgrs_digits so errors read exactly as for string input.
+    """
+    e, n = _mgrs_token(parts[0]), _mgrs_token(parts[1])
+    if e.isdigit() and n.isdigit():
+        return (_expand_mgrs_token(e), _expand_mgrs_token(n))
+    return _parse_pair_mgrs_digits(f"{e} {n}")
+
+
+def _bearing_mils_from_deltas(dx: float, dy: float, mils_per_circle: float, mils_per_rad: float) -> float:
+    # Bearing from north, clockwise: atan2(E, N) lies in [-pi, pi], so one multiply
+    # goes straight to mils and a compare-and-add replaces the modulus.
+    # "+ 0.0" folds atan2's -0.0 into 0.0.
+    m = atan2(dx, dy) * mils_per_rad + 0.0
+    if m < 0.0:
+        m += mils_per_circle
+        if m == mils_per_circle:  # a tiny negative angle rounds up to a full circle
+            m = 0.0
+    return m
 
 
 def _bearing_deg_from_deltas(dx: float, dy: float) -> float:
-    # Bearing from north, clockwise: atan2(E, N)
-    b = (degrees(atan2(dx, dy)) + 360.0) % 360.0
-    return b
+    return _bearing_mils_from_deltas(dx, dy, 360.0, _DEG_PER_RAD)
 
 
 def _deg_to_mils(deg: float, mils_per_circle: float = 6400.0) -> float:
     return deg * mils_per_circle / 360.0
 
 
+_DEG_PER_RAD = 180.0 / pi
+# (mils per circle, mils per radian) for each canonical faction, so the hot path is one multiply
+_MILS = {"nato": (6400.0, 3200.0 / pi), "ru": (6000.0, 3000.0 / pi)}
+
+
+def _resolve_mils(faction: str, mils_per_circle: float | None) -> Tuple[float, float, str]:
+    """Return (mils per circle, mils per radian, canonical faction); an explicit mils_per_circle wins."""
+    if mils_per_circle is not None:
+        mpc = float(mils_per_circle)
+        return mpc, mpc / (2.0 * pi), faction
+    f = faction.lower()
+    if f in ("nato", "us", "otan"):
+        f = "nato"
+    elif f in ("ru", "russian", "warsaw", "wp"):
+        f = "ru"
+    else:
+        raise ValueError("Unsupported faction; expected 'nato' or 'ru'")
+    mpc, per_rad = _MILS[f]
+    return mpc, per_rad, f
+
+
+def _compute_raw(
+    start: Tuple[float, float],
+    end: Tuple[float, float],
+    faction: str = "nato",
+    mils_per_circle: float | None = None,
+    check_finite: bool = True,
+) -> Tuple[float, float, str]:
+    """compute_distance_bearing_xy without the Result wrapper: (distance_m, azimuth_mils, faction).
+
+    Callers whose coordinates come from _coerce_mgrs/_parse_pair_mgrs_digits (always finite)
+    may pass check_finite=False.
+    """
+    if len(start) != 2 or len(end) != 2:
+        raise ValueError("Start and end must be (E,N) pairs with two values each")
+
+    e1, n1 = start[0], start[1]
+    e2, n2 = end[0], end[1]
+
+    if check_finite and not (isfinite(e1) and isfinite(n1) and isfinite(e2) and isfinite(n2)):
+        raise ValueError("Coordinate values must be finite numbers")
+
+    dx = e2 - e1
+    dy = n2 - n1
+    mpc, per_rad, faction = _resolve_mils(faction, mils_per_circle)
+    return hypot(dx, dy), _bearing_mils_from_deltas(dx, dy, mpc, per_rad), faction
+
+
 def compute_distance_bearing_xy(
     start: Tuple[float, float],
     end: Tuple[float, float],
@@ -74,39 +154,69 @@ def compute_distance_bearing_xy(
     -------
     Result with distance and azimuth_mils appropriate to the specified system.
     """
-    if len(start) != 2 or len(end) != 2:
-        raise ValueError("Start and end must be (E,N) pairs with two values each")
+    distance_m, azimuth_mils, faction = _compute_raw(start, end, faction, mils_per_circle)
+    return Result(distance_m=distance_m, azimuth_mils=azimuth_mils, faction=faction)
 
-    e1, n1 = start[0], start[1]
-    e2, n2 = end[0], end[1]
 
-    for p in (e1, n1, e2, n2):
-        if not isfinite(p):
-            raise ValueError("Coordinate values must be finite numbers")
+def compute_distance_bearing_xy_batch(
+    start,
+    ends,
+    *,
+    faction: str = "nato",
+    mils_per_circle: float | None = None,
+    validate: bool = True,
+):
+    """Vectorized compute_distance_bearing_xy for many start/end pairs.
 
-    dx = e2 - e1
-    dy = n2 - n1
-    horizontal = hypot(dx, dy)
-    bearing_deg = _bearing_deg_from_deltas(dx, dy)
-    # Determine mils per circle
-    mpc: float
-    if mils_per_circle is not None:
-        mpc = float(mils_per_circle)
-    else:
-        f = faction.lower()
-        if f in ("nato", "us", "otan"):
-            mpc = 6400.0
-            faction = "nato"
-        elif f in ("ru", "russian", "warsaw", "wp"):
-            mpc = 6000.0
-            faction = "ru"
-        else:
-            raise ValueError("Unsupported faction; expected 'nato' or 'ru'")
-
-    azimuth_mils = _deg_to_mils(bearing_deg, mpc)
-
-    return Result(
-        distance_m=horizontal,
-        azimuth_mils=azimuth_mils,
-        faction=faction,
-    )
+    Requires NumPy (``pip install pop_fly[batch]``).
+
+    Parameters
+    ----------
+    start: one (E, N) pair shared by every end, or an array-like of shape (N, 2)
+        paired row-wise with ends
+    ends: array-like of shape (N, 2) holding (E, N) rows
+    faction, mils_per_circle: as for compute_distance_bearing_xy
+    validate: check every coordinate is finite (a full extra pass); pass False for
+        inputs already known to be finite, such as expanded MGRS digits
+
+    Returns
+    -------
+    (distance_m, azimuth_mils) as two float64 arrays of length N.
+    """
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("compute_distance_bearing_xy_batch requires numpy: pip install pop_fly[batch]") from e
+
+    pts = np.asarray(ends, dtype=np.float64)
+    if pts.ndim != 2 or pts.shape[1] != 2:
+        raise ValueError("Ends must be an array of (E,N) pairs with shape (N, 2)")
+    origin = np.asarray(start, dtype=np.float64)
+    if origin.shape != (2,) and origin.shape != pts.shape:
+        raise ValueError("Start must be an (E,N) pair or an (N, 2) array matching ends")
+    if validate and not (np.isfinite(origin).all() and np.isfinite(pts).all()):
+        raise ValueError("Coordinate values must be finite numbers")
+    mpc, per_rad, _ = _resolve_mils(faction, mils_per_circle)
+
+    # A single start broadcasts across every row of ends
+    deltas = pts - origin
+    dx = deltas[:, 0]
+    dy = deltas[:, 1]
+    # Plain sqrt(dx^2 + dy^2) is ~3x faster than np.hypot's overflow-safe scaling;
+    # fall back to hypot only if a square overflowed (deltas beyond ~1e154 m)
+    with np.errstate(over="ignore"):
+        distance = dx * dx
+        distance += dy * dy
+    np.sqrt(distance, out=distance)
+    if not np.isfinite(distance).all():
+        distance = np.hypot(dx, dy)
+    # Branchless wrap into [0, mpc): x - mpc*floor(x/mpc). Subtracting floor's -0.0
+    # also turns atan2's -0.0 into 0.0; tiny negatives that round up to mpc become 0.
+    bearing = np.arctan2(dx, dy)
+    bearing *= per_rad
+    turns = bearing * (1.0 / mpc)
+    np.floor(turns, out=turns)
+    turns *= mpc
+    bearing -= turns
+    bearing[bearing == mpc] = 0.0
+    return distance, bearing
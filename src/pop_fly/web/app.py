@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import json
 import os
+from math import isfinite
+from importlib.util import find_spec
 from importlib.metadata import PackageNotFoundError, version as pkg_version
 import subprocess
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, ValidationError, model_validator
 
-from ..core import Result, compute_distance_bearing_xy, _parse_pair_mgrs_digits
+from ..core import _coerce_mgrs, _compute_raw, _resolve_mils, compute_distance_bearing_xy_batch
+
+# Upper bound on rows per /api/compute_batch request
+MAX_BATCH = 10_000
 
 
 def _round_distance(value: float, precision: int) -> float:
@@ -33,10 +40,12 @@ class ComputeRequest(BaseModel):
                 raise ValueError(f"{name} must have at least 2 values [E, N]")
             for idx, v in enumerate(arr[:2]):
                 try:
-                    # Accept numeric strings as well
-                    _ = float(v)  # type: ignore[arg-type]
+                    # Accept numeric strings as well; one cast, then the C-level finite check
+                    ok = isfinite(float(v))  # type: ignore[arg-type]
                 except Exception:
-                    raise ValueError(f"{name}[{idx}] must be a number or numeric string")
+                    ok = False
+                if not ok:
+                    raise ValueError(f"{name}[{idx}] must be a finite number or numeric string")
         return self
 
 
@@ -49,60 +58,158 @@ class ComputeResponse(BaseModel):
     faction: str
 
 
-app = FastAPI(title="pop_fly API", docs_url="/docs")
+class ComputeBatchRequest(BaseModel):
+    starts: list[list[float | str]] = Field(
+        ..., min_length=1, max_length=MAX_BATCH, description="One [E, N] shared by all ends, or one per end"
+    )
+    ends: list[list[float | str]] = Field(..., min_length=1, max_length=MAX_BATCH, description="[E, N] rows")
+    precision: int = Field(0, ge=0, le=6, description="Decimal places for distances; azimuth uses 1 decimal")
+    faction: str = Field("nato", description="'nato' (6400 mils) or 'ru' (6000 mils)")
+
+    @model_validator(mode="after")
+    def check_pairing(self) -> "ComputeBatchRequest":
+        if len(self.starts) not in (1, len(self.ends)):
+            raise ValueError("starts must hold one [E, N] or exactly one per end")
+        return self
+
 
+class ComputeBatchResponse(BaseModel):
+    format: str
+    distance_m: list[float]
+    azimuth_mils: list[float]
+    faction: str
 
-@app.get("/api/health")
-def health() -> dict:
-    return {"status": "ok"}
+
+app = FastAPI(title="pop_fly API", docs_url="/docs")
 
 
-@app.get("/api/version")
-def get_version() -> dict:
+def _resolve_version() -> str:
     try:
-        v = pkg_version("pop_fly")
+        return pkg_version("pop_fly")
     except PackageNotFoundError:
-        v = "0.0.0"
-    return {"version": v}
+        return "0.0.0"
+
+
+# Resolved once at import: the installed version cannot change under a running server
+_VERSION = _resolve_version()
+
+# Constant payloads, encoded once; async handlers also skip the threadpool hop
+_HEALTH_RESPONSE = Response(content=b'{"status":"ok"}', media_type="application/json")
+_VERSION_RESPONSE = Response(content=json.dumps({"version": _VERSION}).encode(), media_type="application/json")
+
 
+@app.get("/api/health", response_model=None)
+async def health() -> Response:
+    return _HEALTH_RESPONSE
 
-@app.post("/api/compute", response_model=ComputeResponse, response_model_exclude_none=True)
-def compute(req: ComputeRequest) -> ComputeResponse:
+
+@app.get("/api/version", response_model=None)
+async def get_version() -> Response:
+    return _VERSION_RESPONSE
+
+
+async def _validated_body(request: Request, model: type[BaseModel]):
+    """Validate the raw body in pydantic-core, skipping the stdlib json.loads + dict validation pass."""
+    try:
+        return model.model_validate_json(await request.body())
+    except ValidationError as e:
+        # Same 422 shape FastAPI produces for a declared body model
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False, include_context=False)]
+        )
+
+
+def _json_response(model: BaseModel) -> Response:
+    # Encode in pydantic-core (Rust) rather than jsonable_encoder + json.dumps
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+
+def _body_schema(model: type[BaseModel]) -> dict:
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": model.model_json_schema()}}}}
+
+
+@app.post(
+    "/api/compute",
+    # Documented but not re-validated: the response is built from values computed here
+    response_model=None,
+    responses={200: {"model": ComputeResponse}},
+    openapi_extra=_body_schema(ComputeRequest),
+)
+async def compute(request: Request) -> Response:
+    req: ComputeRequest = await _validated_body(request, ComputeRequest)
     try:
         # Business rule: exactly two values only (no elevation). Return 400.
         if len(req.start) != 2 or len(req.end) != 2:
             raise HTTPException(status_code=400, detail="Start and end must have exactly two values [E, N]; elevation is no longer supported")
-        # Build strings for the MGRS-digit parser while preserving leading zeros on E/N.
-        def to_mgrs_str(parts: list[float | str]) -> str:
-            e_raw = parts[0]
-            n_raw = parts[1]
-            e_token = str(e_raw).strip() if isinstance(e_raw, str) else str(int(float(e_raw)))
-            n_token = str(n_raw).strip() if isinstance(n_raw, str) else str(int(float(n_raw)))
-            # Strip any decimals from tokens; only integer digits allowed for E/N
-            if "." in e_token:
-                e_token = e_token.split(".")[0]
-            if "." in n_token:
-                n_token = n_token.split(".")[0]
-            s = f"{e_token} {n_token}"
-            return s
-
-        start_t = _parse_pair_mgrs_digits(to_mgrs_str(list(req.start)))
-        end_t = _parse_pair_mgrs_digits(to_mgrs_str(list(req.end)))
-        res: Result = compute_distance_bearing_xy(start_t, end_t, faction=req.faction)  # type: ignore[arg-type]
+        start_t = _coerce_mgrs(req.start)
+        end_t = _coerce_mgrs(req.end)
+        # Raw tuple path (no Result); expanded MGRS digits are always finite
+        distance_m, azimuth_mils, faction = _compute_raw(start_t, end_t, req.faction, check_finite=False)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    resp = ComputeResponse.model_construct(
+        format="mgrs-digits",
+        start=list(start_t),
+        end=list(end_t),
+        distance_m=_round_distance(distance_m, req.precision),
+        azimuth_mils=round(azimuth_mils, 1),
+        faction=faction,
+    )
+    return _json_response(resp)
+
+
+@app.post(
+    "/api/compute_batch",
+    response_model=None,
+    responses={200: {"model": ComputeBatchResponse}},
+    openapi_extra=_body_schema(ComputeBatchRequest),
+)
+async def compute_batch(request: Request) -> Response:
+    """Many start/end pairs in one request, computed column-wise with NumPy."""
+    req: ComputeBatchRequest = await _validated_body(request, ComputeBatchRequest)
+    try:
+        rows = []
+        for name, pairs in ("starts", req.starts), ("ends", req.ends):
+            for idx, parts in enumerate(pairs):
+                if len(parts) != 2:
+                    raise ValueError(f"{name}[{idx}] must have exactly two values [E, N]")
+                rows.append(_coerce_mgrs(parts))
+        starts, ends = rows[: len(req.starts)], rows[len(req.starts) :]
+        _, _, faction = _resolve_mils(req.faction, None)
+        distance, azimuth = compute_distance_bearing_xy_batch(
+            starts[0] if len(starts) == 1 else starts, ends, faction=faction, validate=False
+        )
+    except ImportError as e:
+        raise HTTPException(status_code=501, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    precision = req.precision
-    payload = {
-        "format": "mgrs-digits",
-        "start": list(start_t),
-        "end": list(end_t),
-    "distance_m": _round_distance(res.distance_m, precision),
-    "azimuth_mils": round(res.azimuth_mils, 1),
-    "faction": res.faction,
-    }
+    resp = ComputeBatchResponse.model_construct(
+        format="mgrs-digits",
+        distance_m=[_round_distance(d, req.precision) for d in distance.tolist()],
+        azimuth_mils=[round(a, 1) for a in azimuth.tolist()],
+        faction=faction,
+    )
+    return _json_response(resp)
 
-    return ComputeResponse(**payload)
+
+def build_frontend() -> None:
+    """Install frontend deps and build frontend/dist (entry point: pop_fly_build_frontend)."""
+    try:
+        project_root = Path(__file__).resolve().parents[3]
+        fe_dir = project_root / "frontend"
+        pkg_json = fe_dir / "package.json"
+        if pkg_json.is_file():
+            npm_exe = "npm.cmd" if os.name == "nt" else "npm"
+            lockfile = fe_dir / "package-lock.json"
+            install_cmd = [npm_exe, "ci"] if lockfile.is_file() else [npm_exe, "install"]
+            # Install deps (quiet-ish) and build
+            subprocess.run(install_cmd, cwd=str(fe_dir), check=False)
+            subprocess.run([npm_exe, "run", "build"], cwd=str(fe_dir), check=False)
+    except Exception:
+        # Non-fatal: the API still works without a built UI
+        pass
 
 
 def main() -> None:
@@ -115,23 +222,13 @@ def main() -> None:
     except ValueError:
         port = 8000
 
-    # Optional: build frontend before starting the server so latest UI is served
-    if os.getenv("POP_FLY_SKIP_FRONTEND_BUILD", "0") != "1":
-        try:
-            project_root = Path(__file__).resolve().parents[3]
-            fe_dir = project_root / "frontend"
-            pkg_json = fe_dir / "package.json"
-            if pkg_json.is_file():
-                npm_exe = "npm.cmd" if os.name == "nt" else "npm"
-                lockfile = fe_dir / "package-lock.json"
-                install_cmd = [npm_exe, "ci"] if lockfile.is_file() else [npm_exe, "install"]
-                # Install deps (quiet-ish) and build
-                subprocess.run(install_cmd, cwd=str(fe_dir), check=False)
-                subprocess.run([npm_exe, "run", "build"], cwd=str(fe_dir), check=False)
-        except Exception:
-            # Non-fatal: continue to start API even if build fails
-            pass
-    uvicorn.run("pop_fly.web.app:app", host=host, port=port, reload=False)
+    # Opt-in: building on every start adds npm install/build time to cold starts
+    if os.getenv("POP_FLY_BUILD_FRONTEND", "0") == "1":
+        build_frontend()
+    # C event loop and HTTP parser when present (uvloop has no Windows build)
+    loop = "uvloop" if os.name != "nt" and find_spec("uvloop") else "asyncio"
+    http = "httptools" if find_spec("httptools") else "h11"
+    uvicorn.run("pop_fly.web.app:app", host=host, port=port, reload=False, loop=loop, http=http)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,14 @@
+"""Put src/ and scripts/ on sys.path once for the whole test run.
+
+Test modules import this instead of each inserting the paths themselves, so sys.path
+gets a single entry per directory under both pytest and ``unittest discover``.
+"""
+import os
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for _sub in ("scripts", "src"):
+    _path = os.path.join(_ROOT, _sub)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
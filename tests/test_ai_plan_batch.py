@@ -0,0 +1,40 @@
+import importlib.util
+import json
+import os
+import sys
+import unittest
+
+
+# Import module by path to avoid executing main()
+MODULE_PATH = os.path.join(os.path.dirname(__file__), "..", "scripts", "ai_plan_issue.py")
+spec = importlib.util.spec_from_file_location("ai_plan_issue", MODULE_PATH)
+if spec is None or spec.loader is None:
+    raise ImportError(f"Could not load module spec from {MODULE_PATH}")
+ai_mod = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = ai_mod
+spec.loader.exec_module(ai_mod)  # type: ignore
+
+
+class TestBatchFiles(unittest.TestCase):
+    def test_build_batch_jsonl_one_request_per_issue(self):
+        text = ai_mod.build_batch_jsonl({7: "plan seven", 9: "plan nine"})
+        rows = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual([r["custom_id"] for r in rows], ["issue-7", "issue-9"])
+        for r in rows:
+            self.assertEqual(r["method"], "POST")
+            self.assertEqual(r["url"], "/v1/chat/completions")
+            self.assertNotIn("stream", r["body"])
+        self.assertEqual(rows[0]["body"]["messages"][-1]["content"], "plan seven")
+
+    def test_parse_batch_output_skips_failed_lines(self):
+        ok = {
+            "custom_id": "issue-7",
+            "response": {"status_code": 200, "body": {"choices": [{"message": {"content": " - step \n"}}]}},
+        }
+        failed = {"custom_id": "issue-9", "response": None, "error": {"message": "boom"}}
+        text = json.dumps(ok) + "\n" + json.dumps(failed) + "\n\n"
+        self.assertEqual(ai_mod.parse_batch_output(text), {7: "- step"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+
+# Import module by path to avoid executing main()
+MODULE_PATH = os.path.join(os.path.dirname(__file__), "..", "scripts", "ai_plan_issue.py")
+spec = importlib.util.spec_from_file_location("ai_plan_issue", MODULE_PATH)
+if spec is None or spec.loader is None:
+    raise ImportError(f"Could not load module spec from {MODULE_PATH}")
+ai_mod = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = ai_mod
+spec.loader.exec_module(ai_mod)  # type: ignore
+
+
+class TestPlanCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.td = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.td.cleanup()
+
+    def test_cache_key_is_deterministic(self):
+        k1 = ai_mod._cache_key("m", "sys", "user")
+        k2 = ai_mod._cache_key("m", "sys", "user")
+        self.assertEqual(k1, k2)
+        self.assertNotEqual(k1, ai_mod._cache_key("m2", "sys", "user"))
+
+    def test_set_then_get_hits(self):
+        cache = ai_mod.PlanCache(self.td.name, ttl=60)
+        self.assertIsNone(cache.get("abc"))
+        cache.set("abc", "- task 1")
+        self.assertEqual(cache.get("abc"), "- task 1")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_expired_entry_is_a_miss(self):
+        cache = ai_mod.PlanCache(self.td.name, ttl=60)
+        cache.set("abc", "- task 1")
+        old = time.time() - 120
+        os.utime(os.path.join(self.td.name, "abc.json"), (old, old))
+        self.assertIsNone(cache.get("abc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
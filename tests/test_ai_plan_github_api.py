@@ -0,0 +1,68 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+
+# Import module by path to avoid executing main()
+MODULE_PATH = os.path.join(os.path.dirname(__file__), "..", "scripts", "ai_plan_issue.py")
+spec = importlib.util.spec_from_file_location("ai_plan_issue", MODULE_PATH)
+if spec is None or spec.loader is None:
+    raise ImportError(f"Could not load module spec from {MODULE_PATH}")
+ai_mod = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = ai_mod
+spec.loader.exec_module(ai_mod)  # type: ignore
+
+
+class _Resp:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class _Client:
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.calls.append((url, headers, json))
+        return _Resp(self.payload)
+
+
+class TestGithubApi(unittest.TestCase):
+    def tearDown(self) -> None:
+        ai_mod._HTTP_CLIENT = None
+
+    def test_fetch_issue_uses_single_graphql_request(self):
+        client = _Client({"data": {"repository": {"issue": {"title": "T", "body": None}}}})
+        ai_mod._HTTP_CLIENT = client
+        self.assertEqual(ai_mod.fetch_issue("tok", "o", "r", 7), ("T", ""))
+        self.assertEqual(len(client.calls), 1)
+        url, headers, body = client.calls[0]
+        self.assertTrue(url.endswith("/graphql"))
+        self.assertEqual(headers["Authorization"], "bearer tok")
+        self.assertEqual(body["variables"], {"o": "o", "r": "r", "n": 7})
+
+    def test_fetch_issue_missing_exits(self):
+        ai_mod._HTTP_CLIENT = _Client({"data": {"repository": {"issue": None}}, "errors": [{"message": "nope"}]})
+        with self.assertRaises(SystemExit) as ctx:
+            ai_mod.fetch_issue("tok", "o", "r", 7)
+        self.assertIn("nope", str(ctx.exception))
+
+    def test_post_issue_comment_hits_rest_endpoint(self):
+        client = _Client({})
+        ai_mod._HTTP_CLIENT = client
+        ai_mod.post_issue_comment("tok", "o", "r", 7, "hello")
+        url, _, body = client.calls[0]
+        self.assertTrue(url.endswith("/repos/o/r/issues/7/comments"))
+        self.assertEqual(body, {"body": "hello"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import glob
 import os
 import sys
 import subprocess
@@ -34,12 +35,12 @@ class TestAIPlanIssueDryRun(unittest.TestCase):
             shutil.rmtree(self.tmp_dir)
 
     def test_writes_default_issue_file_when_no_issue_env(self):
-        """When no ISSUE_NUMBER or event is provided, dry-run should write issue-unknown-plan.txt"""
+        """When no ISSUE_NUMBER or event is provided, dry-run should write issue-unknown-plan-<hash>.txt"""
         res = _run_dry_run_env()
         self.assertEqual(res.returncode, 0, msg=f"Stdout: {res.stdout}\nStderr: {res.stderr}")
-        out_file = os.path.join(self.tmp_dir, "issue-unknown-plan.txt")
-        self.assertTrue(os.path.exists(out_file), msg=res.stdout + res.stderr)
-        with open(out_file, "r", encoding="utf-8") as f:
+        out_files = glob.glob(os.path.join(self.tmp_dir, "issue-unknown-plan-*.txt"))
+        self.assertEqual(len(out_files), 1, msg=res.stdout + res.stderr)
+        with open(out_files[0], "r", encoding="utf-8") as f:
             content = f.read()
         self.assertIn("Automated plan", content)
 
@@ -47,12 +48,19 @@ class TestAIPlanIssueDryRun(unittest.TestCase):
         """If ISSUE_NUMBER is provided it should be used in the dry-run filename"""
         res = _run_dry_run_env({"ISSUE_NUMBER": "42"})
         self.assertEqual(res.returncode, 0, msg=f"Stdout: {res.stdout}\nStderr: {res.stderr}")
-        out_file = os.path.join(self.tmp_dir, "issue-42-plan.txt")
-        self.assertTrue(os.path.exists(out_file), msg=res.stdout + res.stderr)
-        with open(out_file, "r", encoding="utf-8") as f:
+        out_files = glob.glob(os.path.join(self.tmp_dir, "issue-42-plan-*.txt"))
+        self.assertEqual(len(out_files), 1, msg=res.stdout + res.stderr)
+        with open(out_files[0], "r", encoding="utf-8") as f:
             content = f.read()
         self.assertIn("Automated plan", content)
 
+    def test_rerun_with_same_input_reuses_file(self):
+        self.assertEqual(_run_dry_run_env({"ISSUE_NUMBER": "42"}).returncode, 0)
+        self.assertEqual(_run_dry_run_env({"ISSUE_NUMBER": "42"}).returncode, 0)
+        out_files = glob.glob(os.path.join(self.tmp_dir, "issue-42-plan-*.txt"))
+        self.assertEqual(len(out_files), 1)
+        self.assertEqual(glob.glob(os.path.join(self.tmp_dir, "*.tmp")), [])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,105 @@
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import unittest
+
+
+# Import module by path to avoid executing main()
+MODULE_PATH = os.path.join(os.path.dirname(__file__), "..", "scripts", "ai_plan_issue.py")
+spec = importlib.util.spec_from_file_location("ai_plan_issue", MODULE_PATH)
+if spec is None or spec.loader is None:
+    raise ImportError(f"Could not load module spec from {MODULE_PATH}")
+ai_mod = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = ai_mod
+spec.loader.exec_module(ai_mod)  # type: ignore
+
+
+def _frame(content):
+    return "data: " + json.dumps({"choices": [{"delta": {"content": content}}]})
+
+
+class TestCollectSseContent(unittest.TestCase):
+    def test_concatenates_deltas_until_done(self):
+        lines = [
+            _frame("- step"),
+            "",
+            ": keep-alive",
+            _frame(" one"),
+            "data: [DONE]",
+            _frame(" ignored"),
+        ]
+        self.assertEqual(ai_mod._collect_sse_content(lines), "- step one")
+
+    def test_skips_frames_without_content(self):
+        lines = [
+            "data: " + json.dumps({"choices": [{"delta": {"role": "assistant"}}]}),
+            _frame("plan"),
+            "data: not-json",
+        ]
+        self.assertEqual(ai_mod._collect_sse_content(lines), "plan")
+
+    def test_anthropic_content_block_deltas(self):
+        lines = [
+            "event: message_start",
+            "data: " + json.dumps({"type": "message_start", "message": {}}),
+            "event: content_block_delta",
+            "data: " + json.dumps({"type": "content_block_delta", "delta": {"type": "text_delta", "text": "- a"}}),
+            "data: " + json.dumps({"type": "content_block_delta", "delta": {"type": "text_delta", "text": "b"}}),
+            "data: " + json.dumps({"type": "message_stop"}),
+        ]
+        self.assertEqual(ai_mod._collect_sse_content(lines), "- ab")
+
+
+class TestRequestBody(unittest.TestCase):
+    PROMPT = 'Issue #1: "quotes", \\ backslash, ünïcode\nnewline'
+
+    def test_openai_body_matches_dict_encoding(self):
+        body = json.loads(ai_mod._request_body(ai_mod._OPENAI_BODY_PREFIX, self.PROMPT))
+        expected = dict(ai_mod._openai_body(self.PROMPT), stream=True)
+        self.assertEqual(body, expected)
+
+    def test_anthropic_body_is_valid_json(self):
+        body = json.loads(ai_mod._request_body(ai_mod._ANTHROPIC_BODY_PREFIX, self.PROMPT))
+        self.assertEqual(body["model"], ai_mod.ANTHROPIC_MODEL)
+        self.assertEqual(body["system"], ai_mod.SYSTEM_PROMPT)
+        self.assertEqual(body["messages"], [{"role": "user", "content": self.PROMPT}])
+
+
+class TestFirstSuccess(unittest.TestCase):
+    def test_returns_fastest_and_cancels_slower(self):
+        cancelled = []
+
+        async def answer(text, delay):
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(text)
+                raise
+            return text
+
+        result = asyncio.run(ai_mod._first_success([answer("slow", 1.0), answer("fast", 0.01)]))
+        self.assertEqual(result, "fast")
+        self.assertEqual(cancelled, ["slow"])
+
+    def test_failure_falls_through_to_other_provider(self):
+        async def fail():
+            raise RuntimeError("provider down")
+
+        async def answer():
+            await asyncio.sleep(0.01)
+            return "plan"
+
+        self.assertEqual(asyncio.run(ai_mod._first_success([fail(), answer()])), "plan")
+
+    def test_all_failures_reraise(self):
+        async def fail():
+            raise RuntimeError("provider down")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(ai_mod._first_success([fail(), fail()]))
+
+
+if __name__ == "__main__":
+    unittest.main()
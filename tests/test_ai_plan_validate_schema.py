@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+
+# Import module by path to avoid executing main()
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODULE_PATH = os.path.join(ROOT, "scripts", "ai_plan_issue.py")
+spec = importlib.util.spec_from_file_location("ai_plan_issue", MODULE_PATH)
+if spec is None or spec.loader is None:
+    raise ImportError(f"Could not load module spec from {MODULE_PATH}")
+ai_mod = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = ai_mod
+spec.loader.exec_module(ai_mod)  # type: ignore
+
+
+class TestValidatePlanSchema(unittest.TestCase):
+    def setUp(self) -> None:
+        # validate_plan_schema resolves docs/schema relative to the working directory
+        self._cwd = os.getcwd()
+        os.chdir(ROOT)
+        ai_mod._load_plan_validator.cache_clear()
+        _exists, check = ai_mod._load_plan_validator(os.path.join(ROOT, "docs", "schema", "plan_schema.json"))
+        if check is None:
+            self.skipTest("no JSON schema validator installed")
+
+    def tearDown(self) -> None:
+        os.chdir(self._cwd)
+        ai_mod._load_plan_validator.cache_clear()
+
+    def test_valid_plan_passes(self):
+        ok, msg = ai_mod.validate_plan_schema('{"tasks": ["Add endpoint"]}')
+        self.assertTrue(ok, msg)
+        self.assertIsNone(msg)
+
+    def test_schema_violation_fails(self):
+        ok, msg = ai_mod.validate_plan_schema('{"tasks": []}')
+        self.assertFalse(ok)
+        self.assertTrue(msg)
+
+    def test_non_json_fails(self):
+        ok, msg = ai_mod.validate_plan_schema("- step one\n- step two")
+        self.assertFalse(ok)
+        self.assertIn("not valid JSON", msg)
+
+
+if __name__ == "__main__":
+    unittest.main()
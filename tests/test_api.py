@@ -1,17 +1,27 @@
 import unittest
-import os
-import sys
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import _paths  # noqa: F401  (puts src/ and scripts/ on the import path)
 
 from fastapi.testclient import TestClient
 
 from pop_fly.web.app import app
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class TestAPI(unittest.TestCase):
-    def setUp(self):
-        self.client = TestClient(app)
+    @classmethod
+    def setUpClass(cls):
+        # One client (and one lifespan startup) shared by every test in the class
+        cls.client = TestClient(app)
+        cls.client.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client.__exit__(None, None, None)
 
     def test_health(self):
         r = self.client.get("/api/health")
@@ -55,6 +65,11 @@ class TestAPI(unittest.TestCase):
         r = self.client.post("/api/compute", json=payload)
         self.assertEqual(r.status_code, 422)  # pydantic validation error
 
+    def test_non_finite_values_rejected_at_validation(self):
+        for bad in ("inf", "-Infinity", "nan"):
+            r = self.client.post("/api/compute", json={"start": [bad, "00000"], "end": ["03000", "00000"]})
+            self.assertEqual(r.status_code, 422, bad)
+
     def test_cli_vs_api_parity_example(self):
         # Example from report: start "021,032" end "084,069" should be 7306 m
         payload = {"start": ["021", "032"], "end": ["084", "069"], "precision": 0}
@@ -63,6 +78,24 @@ class TestAPI(unittest.TestCase):
         data = r.json()
         self.assertEqual(data["distance_m"], 7306)
 
+    @unittest.skipUnless(numpy, "numpy not installed")
+    def test_compute_batch_matches_single(self):
+        ends = [["084", "069"], ["03000", "00000"]]
+        r = self.client.post("/api/compute_batch", json={"starts": [["021", "032"]], "ends": ends, "faction": "RU"})
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertEqual(data["faction"], "ru")
+        for i, end in enumerate(ends):
+            single = self.client.post("/api/compute", json={"start": ["021", "032"], "end": end, "faction": "ru"}).json()
+            self.assertEqual(data["distance_m"][i], single["distance_m"])
+            self.assertEqual(data["azimuth_mils"][i], single["azimuth_mils"])
+
+    def test_compute_batch_rejects_mismatched_rows(self):
+        r = self.client.post("/api/compute_batch", json={"starts": [["0", "0"], ["1", "1"]], "ends": [["2", "2"]] * 3})
+        self.assertEqual(r.status_code, 422)
+        r = self.client.post("/api/compute_batch", json={"starts": [["0", "0", "5"]], "ends": [["2", "2"]]})
+        self.assertEqual(r.status_code, 400)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,24 +1,37 @@
 import io
 import json
 import os
+import shutil
 import tempfile
-import sys
 import unittest
 from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import _paths  # noqa: F401  (puts src/ and scripts/ on the import path)
 from pop_fly import cli
 
 
 class TestCLI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # One config dir for the class; setUp empties it so each test starts clean
+        cls.td = tempfile.TemporaryDirectory()
+        os.environ["POP_FLY_CONFIG_DIR"] = cls.td.name
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.td.cleanup()
+        os.environ.pop("POP_FLY_CONFIG_DIR", None)
+
     def setUp(self) -> None:
-        self.td = tempfile.TemporaryDirectory()
-        os.environ["POP_FLY_CONFIG_DIR"] = self.td.name
+        shutil.rmtree(self.td.name)
+        os.makedirs(self.td.name)
         super().setUp()
 
     def tearDown(self) -> None:
-        self.td.cleanup()
-        os.environ.pop("POP_FLY_CONFIG_DIR", None)
+        # _config_path is memoized; drop it so later tests re-resolve the dir
+        cli._reset_config_cache()
         super().tearDown()
 
     def run_cli(self, argv):
@@ -49,9 +62,8 @@ class TestCLI(unittest.TestCase):
 
     def test_json_output(self):
         self.assertEqual(self.run_cli(["--set-start", "00000 00000"])[0], 0)
-        code, out = self.run_cli(["--end", "03000 00000", "--json", "--precision", "0"])
+        code, data = cli.main(["--end", "03000 00000", "--json", "--precision", "0"], return_payload=True)
         self.assertEqual(code, 0)
-        data = json.loads(out)
         self.assertEqual(data["format"], "mgrs-digits")
         self.assertEqual(data["start"], [0.0, 0.0])
         self.assertEqual(data["end"], [3000.0, 0.0])
@@ -61,18 +73,13 @@ class TestCLI(unittest.TestCase):
 
     def test_faction_flag(self):
         self.assertEqual(self.run_cli(["--set-start", "00000 00000"])[0], 0)
-        # NATO 3km east = 1600 mils
-        code, out = self.run_cli(["--end", "03000 00000", "--json", "--faction", "nato"])        
-        self.assertEqual(code, 0)
-        nato = json.loads(out)
-        self.assertEqual(nato["azimuth_mils"], 1600.0)
-        self.assertEqual(nato["faction"], "nato")
-        # RU 3km east = 1500 mils
-        code, out = self.run_cli(["--end", "03000 00000", "--json", "--faction", "ru"])        
-        self.assertEqual(code, 0)
-        ru = json.loads(out)
-        self.assertEqual(ru["azimuth_mils"], 1500.0)
-        self.assertEqual(ru["faction"], "ru")
+        # 3km east = 1600 mils NATO, 1500 mils RU
+        for faction, mils in (("nato", 1600.0), ("ru", 1500.0)):
+            with self.subTest(faction=faction):
+                code, data = cli.main(["--end", "03000 00000", "--faction", faction], return_payload=True)
+                self.assertEqual(code, 0)
+                self.assertEqual(data["azimuth_mils"], mils)
+                self.assertEqual(data["faction"], faction)
 
     def test_persisted_faction(self):
         # Persist start and faction then run without --faction
@@ -90,6 +97,40 @@ class TestCLI(unittest.TestCase):
         self.assertEqual(data2["faction"], "nato")
         self.assertEqual(data2["azimuth_mils"], 1600.0)
 
+    def test_return_payload_skips_stdout(self):
+        buf = io.StringIO()
+        with redirect_stdout(buf):
+            self.assertEqual(cli.main(["--set-start", "00000 00000"], return_payload=True), (0, None))
+            code, data = cli.main(["--end", "03000 00000"], return_payload=True)
+        self.assertEqual((code, data["distance_m"]), (0, 3000))
+        self.assertEqual(buf.getvalue(), "")
+
+    def test_config_read_once_per_run(self):
+        self.assertEqual(self.run_cli(["--set-start", "00000,00000"])[0], 0)
+        self.assertEqual(self.run_cli(["--set-faction", "ru"])[0], 0)
+        read_text = Path.read_text
+        with mock.patch.object(Path, "read_text", autospec=True, side_effect=read_text) as reads:
+            code, out = self.run_cli(["--show-start", "--end", "03000 00000"])
+        self.assertEqual(code, 0)
+        self.assertIn("Persisted faction: ru", out)
+        self.assertIn("(RU 6000)", out)
+        self.assertEqual(reads.call_count, 1)
+
+    def test_save_keeps_config_cached(self):
+        cli._save_start((1000.0, 0.0))
+        cli._save_faction("RU")
+        with mock.patch.object(Path, "read_text") as reads:
+            data = cli._load_config()
+        reads.assert_not_called()
+        self.assertEqual(data, {"start": [1000.0, 0.0], "faction": "ru"})
+        self.assertEqual(json.loads(cli._config_path().read_text(encoding="utf-8")), data)
+
+    def test_set_start_then_compute_uses_new_start(self):
+        self.assertEqual(self.run_cli(["--set-start", "00000,00000"])[0], 0)
+        code, out = self.run_cli(["--set-start", "01000,00000", "--end", "03000 00000", "--json"])
+        self.assertEqual(code, 0)
+        self.assertEqual(json.loads(out)["distance_m"], 2000)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,40 +1,44 @@
 import math
 import unittest
-import os
-import sys
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import _paths  # noqa: F401  (puts src/ and scripts/ on the import path)
 
-from pop_fly.core import compute_distance_bearing_xy
+from pop_fly.core import _bearing_deg_from_deltas, compute_distance_bearing_xy, compute_distance_bearing_xy_batch
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-class TestCore(unittest.TestCase):
-    def test_basic_cardinals(self):
-        # North
-        r = compute_distance_bearing_xy((0, 0), (0, 100))
-        self.assertAlmostEqual(r.distance_m, 100.0, places=6)
-        self.assertAlmostEqual(r.azimuth_mils, 0.0, places=6)
+# North, east, south, west at 100 m: (end, NATO mils)
+CARDINALS = [((0, 100), 0.0), ((100, 0), 1600.0), ((0, -100), 3200.0), ((-100, 0), 4800.0)]
 
-        # East
-        r = compute_distance_bearing_xy((0, 0), (100, 0))
-        self.assertAlmostEqual(r.distance_m, 100.0, places=6)
-        self.assertAlmostEqual(r.azimuth_mils, 1600.0, places=6)
 
-        # South
-        r = compute_distance_bearing_xy((0, 0), (0, -100))
-        self.assertAlmostEqual(r.distance_m, 100.0, places=6)
-        self.assertAlmostEqual(r.azimuth_mils, 3200.0, places=6)
+class TestCore(unittest.TestCase):
+    def test_basic_cardinals(self):
+        for end, mils in CARDINALS:
+            with self.subTest(end=end):
+                r = compute_distance_bearing_xy((0, 0), end)
+                self.assertAlmostEqual(r.distance_m, 100.0, places=6)
+                self.assertAlmostEqual(r.azimuth_mils, mils, places=6)
 
-        # West
-        r = compute_distance_bearing_xy((0, 0), (-100, 0))
-        self.assertAlmostEqual(r.distance_m, 100.0, places=6)
-        self.assertAlmostEqual(r.azimuth_mils, 4800.0, places=6)
+    @unittest.skipUnless(numpy, "numpy not installed")
+    def test_batch_cardinals(self):
+        dist, mils = compute_distance_bearing_xy_batch(numpy.zeros((4, 2)), [end for end, _ in CARDINALS])
+        numpy.testing.assert_allclose(dist, 100.0, atol=1e-6)
+        numpy.testing.assert_allclose(mils, [m for _, m in CARDINALS], atol=1e-6)
 
     def test_zero_distance(self):
         r = compute_distance_bearing_xy((10, 10), (10, 10))
         self.assertEqual(r.distance_m, 0.0)
         self.assertAlmostEqual(r.azimuth_mils, 0.0, places=6)
 
+    def test_bearing_stays_in_half_open_circle(self):
+        # atan2 edge cases: signed zero and a tiny negative angle that rounds to 360
+        self.assertEqual(str(_bearing_deg_from_deltas(-0.0, 1.0)), "0.0")
+        self.assertEqual(_bearing_deg_from_deltas(-1e-20, 1.0), 0.0)
+        self.assertAlmostEqual(_bearing_deg_from_deltas(-1.0, 1.0), 315.0, places=9)
+
     def test_faction_ru_vs_nato(self):
         # East direction bearing 90 deg should be 1600 NATO, 1500 RU
         nato = compute_distance_bearing_xy((0,0), (100,0), faction="nato")
@@ -50,6 +54,25 @@ class TestCore(unittest.TestCase):
         with self.assertRaises(ValueError):
             compute_distance_bearing_xy((0, 0), (3000, 0, 20))  # type: ignore[arg-type]
 
+    @unittest.skipUnless(numpy, "numpy not installed")
+    def test_batch_matches_scalar(self):
+        start = (120.0, -45.5)
+        ends = [(0, 100), (100, 0), (0, -100), (-100, 0), (120.0, -45.5), (3000.25, 812.75)]
+        for faction in ("nato", "ru"):
+            dist, mils = compute_distance_bearing_xy_batch(start, ends, faction=faction)
+            for i, end in enumerate(ends):
+                r = compute_distance_bearing_xy(start, end, faction=faction)
+                self.assertAlmostEqual(dist[i], r.distance_m, places=9)
+                self.assertAlmostEqual(mils[i], r.azimuth_mils, places=9)
+        with self.assertRaises(ValueError):
+            compute_distance_bearing_xy_batch(start, [(0, 0, 1)])
+
+    @unittest.skipUnless(numpy, "numpy not installed")
+    def test_batch_distance_survives_huge_deltas(self):
+        dist, _ = compute_distance_bearing_xy_batch((0.0, 0.0), [(3e200, 4e200), (3.0, 4.0)])
+        self.assertAlmostEqual(dist[0] / 5e200, 1.0, places=12)
+        self.assertEqual(dist[1], 5.0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,9 @@
+import os
+import re
+import tempfile
 import unittest
 
-from scripts.generate_docs import apply_ops_to_markdown
+from scripts.generate_docs import MMAP_THRESHOLD, apply_ops_to_markdown, build_markdown_index, read_doc
 
 
 SAMPLE_MD = """# Title
@@ -16,85 +19,140 @@ Content B
 Content B1
 """
 
+DUP_MD = (
+    "# Title\n\n"
+    "## Dup\n"
+    "First\n\n"
+    "## Dup\n"
+    "Second\n\n"
+    "## Tail\n"
+    "End\n"
+)
+
+_HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t]*$", re.M)
+
+
+def sections(md):
+    """[(level, title, body)] for every heading, from one scan of md; body runs to the next heading."""
+    marks = list(_HEADING_RE.finditer(md))
+    ends = [m.start() for m in marks[1:]] + [len(md)]
+    return [(len(m[1]), m[2], md[m.end() + 1 : end]) for m, end in zip(marks, ends)]
+
+
+def bodies(md, title):
+    return [body for _level, t, body in sections(md) if t == title]
+
 
 class TestDocsApplier(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Each fixture is scanned once and shared; apply_ops_to_markdown never mutates an index
+        cls.sample_index = build_markdown_index(SAMPLE_MD)
+        cls.dup_index = build_markdown_index(DUP_MD)
+
     def test_replace_section(self):
         ops = [
             {"type": "replace_section", "heading": "Section A", "content": "New A\n- bullet"}
         ]
-        new_text, warnings, errors = apply_ops_to_markdown(SAMPLE_MD, ops, "README.md")
+        new_text, warnings, errors = apply_ops_to_markdown(SAMPLE_MD, ops, "README.md", index=self.sample_index)
         self.assertFalse(errors)
-        self.assertIn("## Section A\nNew A\n- bullet", new_text)
-        self.assertIn("## Section B\nContent B", new_text)
+        self.assertEqual(bodies(new_text, "Section A"), ["New A\n- bullet\n"])
+        self.assertEqual(bodies(new_text, "Section B"), ["Content B\n\n"])
 
     def test_append_to_section(self):
         ops = [
             {"type": "append_to_section", "heading": "Section B", "content": "Appended line"}
         ]
-        new_text, warnings, errors = apply_ops_to_markdown(SAMPLE_MD, ops, "PRD.md")
+        new_text, warnings, errors = apply_ops_to_markdown(SAMPLE_MD, ops, "PRD.md", index=self.sample_index)
         self.assertFalse(errors)
-        self.assertIn("## Section B\nContent B\n\nAppended line\n\n### Subsection B1", new_text)
+        self.assertEqual(
+            [(level, title) for level, title, _ in sections(new_text)],
+            [(1, "Title"), (2, "Section A"), (2, "Section B"), (3, "Subsection B1")],
+        )
+        self.assertEqual(bodies(new_text, "Section B"), ["Content B\n\nAppended line\n\n"])
 
     def test_upsert_new_section(self):
         ops = [
             {"type": "upsert_section", "heading": "New Section", "level": 2, "content": "Hello"}
         ]
-        new_text, warnings, errors = apply_ops_to_markdown(SAMPLE_MD, ops, "PRD.md")
+        new_text, warnings, errors = apply_ops_to_markdown(SAMPLE_MD, ops, "PRD.md", index=self.sample_index)
         self.assertFalse(errors)
-        self.assertIn("\n## New Section\nHello", new_text)
+        self.assertEqual(sections(new_text)[-1], (2, "New Section", "Hello"))
 
     def test_marker_replace_missing(self):
         ops = [
             {"type": "replace_block_by_marker", "name": "FRONTEND_BUILD", "content": "X"}
         ]
-        _new_text, warnings, errors = apply_ops_to_markdown(SAMPLE_MD, ops, "README.md")
+        _new_text, warnings, errors = apply_ops_to_markdown(SAMPLE_MD, ops, "README.md", index=self.sample_index)
         self.assertTrue(errors)
         self.assertIn("marker 'FRONTEND_BUILD' not found", "\n".join(errors))
 
     def test_occurrence_disambiguation_replace(self):
-        md = (
-            "# Title\n\n"
-            "## Dup\n"
-            "First\n\n"
-            "## Dup\n"
-            "Second\n\n"
-            "## Tail\n"
-            "End\n"
-        )
         ops = [
             {"type": "replace_section", "heading": "Dup", "content": "Repl2", "occurrence": 2}
         ]
-        new_text, warnings, errors = apply_ops_to_markdown(md, ops, "README.md")
+        new_text, warnings, errors = apply_ops_to_markdown(DUP_MD, ops, "README.md", index=self.dup_index)
         self.assertFalse(errors)
-        # First occurrence unchanged
-        self.assertIn("## Dup\nFirst", new_text)
-        # Second occurrence replaced
-        self.assertIn("## Dup\nRepl2", new_text)
+        # First occurrence unchanged, second replaced
+        self.assertEqual(bodies(new_text, "Dup"), ["First\n\n", "Repl2\n"])
         # No defaulting warning since occurrence was provided
         self.assertTrue(all("defaulted to first occurrence" not in w for w in warnings))
 
     def test_occurrence_default_first_with_warning(self):
-        md = (
-            "# Title\n\n"
-            "## Dup\n"
-            "First\n\n"
-            "## Dup\n"
-            "Second\n\n"
-            "## Tail\n"
-            "End\n"
-        )
         ops = [
             {"type": "replace_section", "heading": "Dup", "content": "Repl1"}
         ]
-        new_text, warnings, errors = apply_ops_to_markdown(md, ops, "PRD.md")
+        new_text, warnings, errors = apply_ops_to_markdown(DUP_MD, ops, "PRD.md", index=self.dup_index)
         self.assertFalse(errors)
-        # First occurrence replaced
-        self.assertIn("## Dup\nRepl1", new_text)
-        # Second occurrence unchanged
-        self.assertIn("## Dup\nSecond", new_text)
+        # First occurrence replaced, second unchanged
+        self.assertEqual(bodies(new_text, "Dup"), ["Repl1\n", "Second\n\n"])
         # Warning emitted about defaulting
         self.assertTrue(any("defaulted to first occurrence" in w for w in warnings))
 
+    def test_heading_inserted_by_earlier_op_is_addressable(self):
+        ops = [
+            {"type": "append_to_section", "heading": "Section A", "content": "Intro\n\n### Details\nOld"},
+            {"type": "replace_section", "heading": "Details", "content": "New"},
+        ]
+        new_text, warnings, errors = apply_ops_to_markdown(SAMPLE_MD, ops, "README.md", index=self.sample_index)
+        self.assertFalse(errors)
+        self.assertFalse(warnings)
+        self.assertEqual(
+            sections(new_text)[1:4],
+            [(2, "Section A", "Line 1\nLine 2\n\nIntro\n\n"), (3, "Details", "New\n"), (2, "Section B", "Content B\n\n")],
+        )
+
+    def test_index_matches_unindexed_and_is_not_mutated(self):
+        before = (list(self.sample_index[0]), list(self.sample_index[1]))
+        ops = [{"type": "upsert_section", "heading": "Section A", "content": "X\n\n## Added\nY"}]
+        self.assertEqual(
+            apply_ops_to_markdown(SAMPLE_MD, ops, "README.md", index=self.sample_index),
+            apply_ops_to_markdown(SAMPLE_MD, ops, "README.md"),
+        )
+        self.assertEqual(self.sample_index, before)
+
+
+class TestReadDoc(unittest.TestCase):
+    def test_small_and_mmapped_reads_match_file(self):
+        with tempfile.TemporaryDirectory() as td:
+            for size in (10, MMAP_THRESHOLD + 10):
+                text = ("## Sección\n" * size)[:size]
+                path = os.path.join(td, f"doc-{size}.md")
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    f.write(text)
+                self.assertEqual(read_doc(path), text)
+
+    def test_newlines_translated_like_text_mode(self):
+        with tempfile.TemporaryDirectory() as td:
+            for size in (10, MMAP_THRESHOLD + 10):
+                path = os.path.join(td, f"crlf-{size}.md")
+                with open(path, "wb") as f:
+                    f.write(("## Sección\r\nbody\rend\n" * size).encode("utf-8"))
+                with open(path, encoding="utf-8") as f:
+                    expected = f.read()
+                self.assertNotIn("\r", expected)
+                self.assertEqual(read_doc(path), expected)
+
 
 if __name__ == "__main__":
     unittest.main()
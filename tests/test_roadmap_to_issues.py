@@ -1,13 +1,10 @@
 import unittest
 import os
-import sys
+from unittest import mock
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
-
-# Import the parser directly from scripts by adjusting sys.path
-scripts_dir = os.path.join(os.path.dirname(__file__), "..", "scripts")
-sys.path.insert(0, scripts_dir)
+import _paths  # noqa: F401  (puts src/ and scripts/ on the import path)
 
+import roadmap_to_issues
 from roadmap_to_issues import parse_roadmap, RoadmapItem
 
 
@@ -62,5 +59,134 @@ class TestRoadmapParser(unittest.TestCase):
         self.assertEqual(y.body, "details")
 
 
+class _Resp:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+def _page(nodes, end_cursor=None):
+    return _Resp(
+        {
+            "data": {
+                "search": {
+                    "pageInfo": {"hasNextPage": end_cursor is not None, "endCursor": end_cursor},
+                    "nodes": nodes,
+                }
+            }
+        }
+    )
+
+
+class TestFetchRoadmapIssues(unittest.TestCase):
+    def test_paginates_search_and_flattens_labels(self):
+        pages = [
+            _page(
+                [
+                    {
+                        "number": 1,
+                        "title": "A",
+                        "body": "a",
+                        "state": "OPEN",
+                        "labels": {"nodes": [{"name": "roadmap"}, {"name": "Now"}]},
+                    }
+                ],
+                "c1",
+            ),
+            _page([{}, {"number": 2, "title": "B", "body": None, "state": "CLOSED", "labels": {"nodes": []}}]),
+        ]
+        with mock.patch("requests.post", side_effect=pages) as post:
+            issues = roadmap_to_issues.fetch_roadmap_issues("tok", "me", "repo")
+
+        self.assertEqual(
+            issues,
+            [
+                {"number": 1, "title": "A", "body": "a", "state": "open", "labels": {"roadmap", "Now"}},
+                {"number": 2, "title": "B", "body": "", "state": "closed", "labels": set()},
+            ],
+        )
+        first, second = (c.kwargs["json"]["variables"] for c in post.call_args_list)
+        self.assertEqual(first["q"], "repo:me/repo is:issue label:roadmap")
+        self.assertIsNone(first["cursor"])
+        self.assertEqual(second["cursor"], "c1")
+
+
+class TestWithBackoff(unittest.TestCase):
+    def test_retries_secondary_rate_limit_then_succeeds(self):
+        from github import GithubException
+
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise GithubException(403, {"message": "secondary rate limit"}, {"retry-after": "2"})
+            return "ok"
+
+        with mock.patch.object(roadmap_to_issues.time, "sleep") as sleep:
+            self.assertEqual(roadmap_to_issues._with_backoff(flaky), "ok")
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [2, 2])
+
+    def test_plain_forbidden_is_not_retried(self):
+        from github import GithubException
+
+        def forbidden():
+            raise GithubException(403, {"message": "Resource not accessible"}, {})
+
+        with mock.patch.object(roadmap_to_issues.time, "sleep") as sleep:
+            with self.assertRaises(GithubException):
+                roadmap_to_issues._with_backoff(forbidden)
+        sleep.assert_not_called()
+
+
+class TestUpsertIssues(unittest.TestCase):
+    ITEM = RoadmapItem(section="Now", title="Feature A", body="Do stuff", status="In progress", issue_ref=None)
+
+    def _upsert(self, existing, by_title=None):
+        repo = mock.MagicMock()
+        repo.get_labels.return_value = []
+        env = {"GITHUB_TOKEN": "tok", "GITHUB_REPOSITORY": "me/repo"}
+        with mock.patch.dict(os.environ, env), mock.patch.object(roadmap_to_issues, "Github") as gh, mock.patch.object(
+            roadmap_to_issues, "fetch_roadmap_issues", return_value=existing
+        ), mock.patch.object(roadmap_to_issues, "find_issue_by_title", return_value=by_title), mock.patch("builtins.print"):
+            gh.return_value.get_repo.return_value = repo
+            roadmap_to_issues.upsert_issues([self.ITEM])
+        return repo
+
+    def test_unchanged_issue_is_not_edited(self):
+        issue = {"number": 5, "title": "Feature A", "body": "old", "state": "open", "labels": {"roadmap"}}
+        repo = self._upsert([issue])
+        edit = repo.get_issue.return_value.edit
+        edit.assert_called_once()
+        new_body = edit.call_args.kwargs["body"]
+        self.assertIn("<!-- roadmap-hash:", new_body)
+
+        synced = dict(issue, body=new_body, labels=set(edit.call_args.kwargs["labels"]))
+        repo = self._upsert([synced])
+        repo.get_issue.return_value.edit.assert_not_called()
+
+    def test_unlabelled_issue_with_same_title_is_updated_not_duplicated(self):
+        issue = {"number": 9, "title": "Feature A", "body": "", "state": "open", "labels": {"bug"}}
+        repo = self._upsert([], by_title=issue)
+        repo.create_issue.assert_not_called()
+        repo.get_issue.assert_called_with(9)
+        self.assertEqual(repo.get_issue.return_value.edit.call_args.kwargs["labels"], ["In progress", "Now", "bug", "roadmap"])
+
+    def test_find_issue_by_title_keeps_exact_matches_only(self):
+        nodes = [
+            {"number": 3, "title": "Feature A plus", "body": "", "state": "OPEN", "labels": {"nodes": []}},
+            {"number": 4, "title": "Feature A", "body": "", "state": "OPEN", "labels": {"nodes": []}},
+        ]
+        with mock.patch("requests.post", return_value=_page(nodes)) as post:
+            found = roadmap_to_issues.find_issue_by_title("tok", "me", "repo", "Feature A")
+        self.assertEqual(found["number"], 4)
+        self.assertEqual(post.call_args.kwargs["json"]["variables"]["q"], 'repo:me/repo is:issue in:title "Feature A"')
+
+
 if __name__ == "__main__":
     unittest.main()
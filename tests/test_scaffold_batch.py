@@ -0,0 +1,232 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+
+# Import module by path to avoid executing main()
+MODULE_PATH = os.path.join(os.path.dirname(__file__), "..", "scripts", "scaffold_from_plan.py")
+spec = importlib.util.spec_from_file_location("scaffold_from_plan", MODULE_PATH)
+if spec is None or spec.loader is None:
+    raise ImportError(f"Could not load module spec from {MODULE_PATH}")
+scaffold = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = scaffold
+spec.loader.exec_module(scaffold)  # type: ignore
+
+
+class TestBatchJsonl(unittest.TestCase):
+    def test_one_request_line_per_custom_id(self):
+        text = scaffold.build_batch_jsonl({"a": {"model": "m"}, "b": {"model": "n"}})
+        rows = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual([r["custom_id"] for r in rows], ["a", "b"])
+        self.assertEqual(rows[0]["url"], "/v1/chat/completions")
+        self.assertEqual(rows[1]["body"], {"model": "n"})
+
+    def test_parse_output_skips_failed_lines(self):
+        ok = {"custom_id": "plan", "response": {"body": {"choices": [{"message": {"content": "{}"}}]}}}
+        failed = {"custom_id": "other", "response": None, "error": {"message": "boom"}}
+        text = "\n".join([json.dumps(ok), json.dumps(failed), "", "not-json"])
+        self.assertEqual(scaffold.parse_batch_output(text), {"plan": "{}"})
+
+
+class TestParseChangesContent(unittest.TestCase):
+    def test_payload_requests_strict_structured_output(self):
+        fmt = scaffold.build_changes_payload("plan", "structure")["response_format"]
+        self.assertEqual(fmt["type"], "json_schema")
+        self.assertTrue(fmt["json_schema"]["strict"])
+        self.assertEqual(fmt["json_schema"]["schema"]["required"], ["changes"])
+
+    def test_parses_reply(self):
+        content = '{"changes": [{"path": "a.py", "action": "update", "content": "x"}]}'
+        self.assertEqual(scaffold.parse_changes_content(content)["changes"][0]["path"], "a.py")
+
+    def test_truncated_reply_yields_no_changes(self):
+        result = scaffold.parse_changes_content('{"changes": [{"path": "a.py", "act')
+        self.assertEqual(result["changes"], [])
+        self.assertIn("truncated", result["note"])
+
+    def test_streamed_reply_is_read_past_an_oversized_change(self):
+        changes = [{"path": "big.py", "action": "update", "content": "x\n" * 500}, {"path": "small.py", "action": "update", "content": "y"}]
+        reply = json.dumps({"changes": changes})
+        lines = [f"data: {json.dumps({'choices': [{'delta': {'content': reply[i:i + 50]}}]})}" for i in range(0, len(reply), 50)]
+        resp = mock.MagicMock()
+        resp.__enter__.return_value.iter_lines.return_value = [*lines, "data: [DONE]"]
+        session = mock.Mock(post=mock.Mock(return_value=resp))
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "k"}), mock.patch.object(
+            scaffold, "_get_http_session", return_value=session
+        ):
+            os.environ.pop("PLAN_MODE", None)  # restored by patch.dict
+            self.assertEqual(scaffold.call_llm_for_changes("plan", "tree")["changes"], changes)
+
+
+class TestPullRequestState(unittest.TestCase):
+    def _repository(self, *nodes):
+        return {
+            "repository": {
+                "id": "R_1",
+                "defaultBranchRef": {"name": "main"},
+                "pullRequests": {"nodes": list(nodes)},
+            }
+        }
+
+    def _node(self, owner, labels=()):
+        return {
+            "id": f"PR_{owner}",
+            "number": 7,
+            "url": f"https://example.test/{owner}",
+            "headRepositoryOwner": {"login": owner},
+            "labels": {"nodes": [{"name": n} for n in labels]},
+        }
+
+    def test_ignores_fork_prs_with_the_same_branch_name(self):
+        data = self._repository(self._node("someone-else"), self._node("Octo", ["approved"]))
+        with mock.patch.object(scaffold, "github_graphql", return_value=data) as gql:
+            state = scaffold.fetch_pr_state("t", "octo/repo", "feature/plan-x")
+        self.assertEqual(gql.call_args.args[2], {"owner": "octo", "name": "repo", "head": "feature/plan-x"})
+        self.assertEqual(state["repository_id"], "R_1")
+        self.assertEqual(state["default_branch"], "main")
+        self.assertEqual(state["pr"]["id"], "PR_Octo")
+        self.assertEqual(state["pr"]["labels"], {"approved"})
+
+    def test_label_gate(self):
+        no_pr = {"repository_id": "R_1", "default_branch": "main", "pr": None}
+        unlabeled = dict(no_pr, pr={"id": "P", "number": 1, "url": "u", "labels": set()})
+        labeled = dict(no_pr, pr={"id": "P", "number": 1, "url": "u", "labels": {"approved"}})
+        prof = {"requires_label": "approved"}
+        self.assertTrue(scaffold.passes_label_gate(no_pr, "b", "minor", {}))
+        self.assertFalse(scaffold.passes_label_gate(no_pr, "b", "major", prof))
+        self.assertFalse(scaffold.passes_label_gate(unlabeled, "b", "major", prof))
+        self.assertTrue(scaffold.passes_label_gate(labeled, "b", "major", prof))
+
+
+class TestStructureScopes(unittest.TestCase):
+    def test_scopes_from_allowed_files_and_dirs(self):
+        prof = {"allowed_files": ["src/pop_fly/core.py", "tests/test_core.py", "README.md"], "allowed_dirs": ["frontend/"]}
+        self.assertEqual(scaffold.structure_scopes(prof), ["README.md", "frontend", "src/pop_fly", "tests"])
+
+    def test_in_scope_keeps_ancestors_and_limits_depth(self):
+        scopes = ["src/pop_fly"]
+        self.assertTrue(scaffold._in_scope("src", scopes, 1))
+        self.assertTrue(scaffold._in_scope("src/pop_fly", scopes, 1))
+        self.assertTrue(scaffold._in_scope("src/pop_fly/core.py", scopes, 1))
+        self.assertFalse(scaffold._in_scope("src/pop_fly/web/app.py", scopes, 1))
+        self.assertFalse(scaffold._in_scope("src/pop_fly_extra/x.py", scopes, 3))
+        self.assertFalse(scaffold._in_scope("docs/index.md", scopes, 3))
+
+
+class TestRequiredSymbolPatterns(unittest.TestCase):
+    def test_compute_route_matches_current_app(self):
+        app_path = os.path.join(os.path.dirname(__file__), "..", "src", "pop_fly", "web", "app.py")
+        with open(app_path, encoding="utf-8") as f:
+            self.assertTrue(scaffold._COMPUTE_ROUTE_RE.search(f.read()))
+        self.assertTrue(scaffold._COMPUTE_ROUTE_RE.search("@app.post('/api/compute', response_model=X)"))
+        self.assertFalse(scaffold._COMPUTE_ROUTE_RE.search('@app.post("/api/compute_batch")'))
+
+
+class TestLlmResultCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = scaffold.Path(self._tmp.name)
+        (self.root / "src").mkdir()
+        (self.root / "src" / "core.py").write_text("x = 1\n", encoding="utf-8")
+        for cmd in (
+            ["git", "init", "-q"],
+            ["git", "add", "-A"],
+            ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "-q", "-m", "init"],
+        ):
+            subprocess.run(cmd, cwd=self.root, check=True)
+
+    def _commit_edit(self):
+        (self.root / "src" / "core.py").write_text("x = 2\n", encoding="utf-8")
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "-qam", "edit"],
+            cwd=self.root,
+            check=True,
+        )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip_keyed_by_plan_and_profile(self):
+        cache_file = scaffold.llm_cache_file(self.root, "plan", "structure", "minor", ["src"])
+        self.assertIsNone(scaffold.read_cached_changes(cache_file))
+        result = {"changes": [{"path": "a.py", "action": "update", "content": "x"}]}
+        scaffold.cache_changes(cache_file, result)
+        self.assertEqual(scaffold.read_cached_changes(cache_file), result)
+        self.assertEqual(scaffold.llm_cache_file(self.root, "plan", "structure", "minor", ["src"]), cache_file)
+        self.assertNotEqual(scaffold.llm_cache_file(self.root, "plan v2", "structure", "minor", ["src"]), cache_file)
+        self.assertNotEqual(scaffold.llm_cache_file(self.root, "plan", "structure", "major", ["src"]), cache_file)
+
+    def test_editing_scoped_files_invalidates(self):
+        cache_file = scaffold.llm_cache_file(self.root, "plan", "structure", "minor", ["src"])
+        self._commit_edit()
+        self.assertNotEqual(scaffold.llm_cache_file(self.root, "plan", "structure", "minor", ["src"]), cache_file)
+
+    def test_empty_results_are_not_cached(self):
+        cache_file = scaffold.llm_cache_file(self.root, "plan", "structure", "minor", ["src"])
+        scaffold.cache_changes(cache_file, {"changes": [], "note": "OPENAI_API_KEY not set; skipped generation."})
+        self.assertIsNone(scaffold.read_cached_changes(cache_file))
+
+
+class TestSelectChanges(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = scaffold.Path(self._tmp.name).resolve()
+        for name in ("big.py", "small.py", "mid.py"):
+            (self.root / "src").mkdir(exist_ok=True)
+            (self.root / "src" / name).write_text("", encoding="utf-8")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _change(self, name, lines):
+        return {"path": f"src/{name}", "action": "update", "content": "x\n" * lines}
+
+    def test_smallest_changes_fill_the_line_budget_first(self):
+        changes = [self._change("big.py", 70), self._change("small.py", 5), self._change("mid.py", 10)]
+        writes, note = scaffold.select_changes(changes, self.root, {"max_files": 4, "max_lines": 80})
+        # Accepted in the model's order
+        self.assertEqual([t.name for t, _ in writes], ["small.py", "mid.py"])
+        self.assertEqual(note, "Skipping change: exceeds line budget")
+
+    def test_file_budget_and_path_policy(self):
+        changes = [self._change("big.py", 1), {"path": "../outside.py", "action": "update", "content": "x"}, self._change("mid.py", 1)]
+        writes, note = scaffold.select_changes(changes, self.root, {"max_files": 1, "max_lines": 80})
+        self.assertEqual([t.name for t, _ in writes], ["big.py"])
+        self.assertEqual(note, "Skipping change: exceeds file count budget")
+
+
+class TestScaffoldChanges(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = scaffold.Path(self._tmp.name).resolve()
+        (self.root / "src" / "pop_fly" / "web").mkdir(parents=True)
+        (self.root / "src" / "pop_fly" / "core.py").write_text("", encoding="utf-8")
+        (self.root / "src" / "pop_fly" / "web" / "app.py").write_text(
+            'app = FastAPI()\n@app.post("/api/compute")\n', encoding="utf-8"
+        )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_duplicate_path_is_written_once_with_the_last_content(self):
+        core = "def compute_distance_bearing_xy(): ...\ndef _parse_pair_mgrs_digits(): ...\n"
+        changes = [
+            {"path": "src/pop_fly/core.py", "action": "update", "content": "import flask\n"},
+            {"path": "src/pop_fly/core.py", "action": "update", "content": core},
+        ]
+        pr_state = {"pr": {"id": "PR_1", "url": "u"}}
+        prof = {"max_files": 4, "max_lines": 80, "forbidden_imports": ["flask"]}
+        with mock.patch.object(scaffold, "run_git_script"), mock.patch.object(scaffold, "github_graphql") as gql:
+            ok = scaffold.scaffold_changes("t", pr_state, "feature/x", self.root, prof, "plan", {"changes": changes})
+        self.assertTrue(ok)
+        self.assertEqual((self.root / "src" / "pop_fly" / "core.py").read_text(encoding="utf-8"), core)
+        self.assertEqual(gql.call_args.args[2]["input"]["body"].count("- src/pop_fly/core.py"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import importlib.util
+import os
+import re
+import sys
+import unittest
+from unittest import mock
+
+
+# Import module by path to avoid executing main()
+MODULE_PATH = os.path.join(os.path.dirname(__file__), "..", "scripts", "update_pr_checklist.py")
+spec = importlib.util.spec_from_file_location("update_pr_checklist", MODULE_PATH)
+if spec is None or spec.loader is None:
+    raise ImportError(f"Could not load module spec from {MODULE_PATH}")
+checklist = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = checklist
+spec.loader.exec_module(checklist)  # type: ignore
+
+
+def _response(status=200, payload=None, etag=None, last_page=None):
+    resp = mock.Mock(status_code=status, headers={"ETag": etag} if etag else {})
+    resp.json.return_value = payload
+    resp.links = {"last": {"url": f"https://api.github.com/x?per_page=100&page={last_page}"}} if last_page else {}
+    return resp
+
+
+class TestFetchIssuePlan(unittest.TestCase):
+    def test_reads_newest_page_first_and_stops_at_plan(self):
+        pages = {
+            "https://api.github.com/repos/o/r/issues/5/comments?per_page=100": _response(
+                payload=[{"body": "Automated plan (old)\n\n- old"}], etag='"p1"', last_page=2
+            ),
+            "https://api.github.com/repos/o/r/issues/5/comments?per_page=100&page=2": _response(
+                payload=[{"body": "Automated plan (new)\n\n- new"}, {"body": "thanks"}], etag='"p2"'
+            ),
+        }
+        with mock.patch("requests.get", side_effect=lambda url, **kw: pages[url]) as get:
+            cache = {}
+            self.assertEqual(checklist.fetch_issue_plan("t", "o", "r", 5, cache), "- new")
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(cache["https://api.github.com/repos/o/r/issues/5/comments?per_page=100&page=2"]["etag"], '"p2"')
+
+    def test_not_modified_reuses_cache_and_falls_back_to_body(self):
+        comments_url = "https://api.github.com/repos/o/r/issues/5/comments?per_page=100"
+        issue_url = "https://api.github.com/repos/o/r/issues/5"
+        cache = {
+            comments_url: {"etag": '"c"', "bodies": ["hello", None], "last_page": 1},
+            # The page after the last one, empty when last probed
+            comments_url + "&page=2": {"etag": '"e"', "bodies": [], "last_page": 1},
+            issue_url: {"etag": '"i"', "body": " plan in body "},
+        }
+        with mock.patch("requests.get", return_value=_response(status=304)) as get:
+            self.assertEqual(checklist.fetch_issue_plan("t", "o", "r", 5, cache), "plan in body")
+        self.assertEqual([c.kwargs["headers"]["If-None-Match"] for c in get.call_args_list], ['"c"', '"e"', '"i"'])
+
+    def test_unchanged_first_page_still_finds_new_pages(self):
+        comments_url = "https://api.github.com/repos/o/r/issues/5/comments?per_page=100"
+        # Last run saw one page; since then the issue grew to three
+        cache = {comments_url: {"etag": '"p1"', "bodies": ["Automated plan (old)\n\n- old"], "last_page": 1}}
+        pages = {
+            comments_url: _response(status=304),
+            comments_url + "&page=2": _response(payload=[{"body": "chatter"}], etag='"p2"', last_page=3),
+            comments_url + "&page=3": _response(payload=[{"body": "Automated plan (new)\n\n- new"}], etag='"p3"'),
+        }
+        with mock.patch("requests.get", side_effect=lambda url, **kw: pages[url]) as get:
+            self.assertEqual(checklist.fetch_issue_plan("t", "o", "r", 5, cache), "- new")
+        self.assertEqual([c.args[0] for c in get.call_args_list], [comments_url, comments_url + "&page=2", comments_url + "&page=3"])
+
+
+def _commits(messages, end_cursor=None):
+    return {
+        "pageInfo": {"hasNextPage": end_cursor is not None, "endCursor": end_cursor},
+        "nodes": [{"commit": {"message": m}} for m in messages],
+    }
+
+
+def _pr(title="Fixes #5", body="", messages=("fix a",), end_cursor=None):
+    return {"id": "PR_1", "title": title, "body": body, "commits": _commits(messages, end_cursor)}
+
+
+def _issue(body="issue body", comments=()):
+    return {"body": body, "comments": {"nodes": [{"body": c} for c in comments]}}
+
+
+class TestFetchPrBundle(unittest.TestCase):
+    def test_issue_hint_served_by_one_query(self):
+        data = {"repository": {"pullRequest": _pr(), "issue": _issue(comments=["Automated plan (x)\n\n- task", "ok"])}}
+        with mock.patch.object(checklist, "_graphql", return_value=data) as gql:
+            bundle = checklist.fetch_pr_bundle("t", "o", "r", 1, 5, {})
+        self.assertEqual(gql.call_count, 1)
+        self.assertTrue(gql.call_args.args[2]["withIssue"])
+        self.assertEqual(bundle["plan_text"], "- task")
+        self.assertEqual(list(bundle["commit_messages"]), ["fix a"])
+        self.assertEqual(bundle["id"], "PR_1")
+
+    def test_stale_hint_fetches_linked_issue(self):
+        data = {"repository": {"pullRequest": _pr(title="Closes #9")}}
+        with mock.patch.object(checklist, "_graphql", return_value=data) as gql, mock.patch.object(
+            checklist, "fetch_issue_plan", return_value="plan"
+        ) as fetch:
+            bundle = checklist.fetch_pr_bundle("t", "o", "r", 1, None, {})
+        self.assertFalse(gql.call_args.args[2]["withIssue"])
+        self.assertEqual(fetch.call_args.args[3], 9)
+        self.assertEqual(bundle["plan_text"], "plan")
+
+    def test_no_issue_reference(self):
+        data = {"repository": {"pullRequest": _pr(title="Tidy up")}}
+        with mock.patch.object(checklist, "_graphql", return_value=data):
+            self.assertEqual(checklist.fetch_pr_bundle("t", "o", "r", 1, None, {})["plan_text"], "")
+
+
+    def test_connections_stay_within_graphql_page_limit(self):
+        for query in (checklist.PR_BUNDLE_QUERY, checklist.PR_COMMITS_QUERY):
+            sizes = [int(n) for n in re.findall(r"\b(?:first|last):\s*(\d+)", query)]
+            self.assertTrue(sizes)
+            self.assertTrue(all(1 <= n <= 100 for n in sizes), sizes)
+
+    def test_pages_through_commits_beyond_the_first_hundred(self):
+        first = {"repository": {"pullRequest": _pr(title="Tidy up", messages=["m1"], end_cursor="c1")}}
+        rest = [
+            {"repository": {"pullRequest": {"commits": _commits(["m2"], end_cursor="c2")}}},
+            {"repository": {"pullRequest": {"commits": _commits(["m3"])}}},
+        ]
+        with mock.patch.object(checklist, "_graphql", side_effect=[first, *rest]) as gql:
+            bundle = checklist.fetch_pr_bundle("t", "o", "r", 1, None, {})
+            self.assertEqual(gql.call_count, 1)  # later pages wait for the consumer
+            self.assertEqual(list(bundle["commit_messages"]), ["m1", "m2", "m3"])
+        self.assertEqual([c.args[2].get("after") for c in gql.call_args_list], [None, "c1", "c2"])
+
+
+class TestExtractTasks(unittest.TestCase):
+    def test_strips_bullets_and_checkboxes(self):
+        plan = "- [ ] First\n* [x] Second\n  ** Third\n\n---\n- [ ] * Fourth"
+        self.assertEqual(checklist.extract_tasks(plan), ["First", "Second", "Third", "* Fourth"])
+
+
+class TestBuildChecklist(unittest.TestCase):
+    def test_marks_tasks_by_text_or_index(self):
+        out = checklist.build_checklist(["Add API", "Write docs", "Ship"], ["feat: add api", "chore: #3 done"])
+        self.assertEqual(
+            out.splitlines()[1:],
+            ["- [x] Add API", "- [ ] Write docs", "- [x] Ship"],
+        )
+
+    def test_no_tasks(self):
+        self.assertEqual(checklist.build_checklist([], ["anything"]), "## Implementation Tasks")
+
+    def test_stops_consuming_commits_once_all_tasks_done(self):
+        messages = iter(["feat: add api", "#2", "never read"])
+        self.assertEqual(checklist._done_tasks(["Add API", "Write docs"], messages), {1, 2})
+        self.assertEqual(list(messages), ["never read"])
+
+    @unittest.skipUnless(checklist.ahocorasick, "pyahocorasick not installed")
+    def test_automaton_matches_substring_scan(self):
+        tasks = ["Add API", "", "add", "Ship #1"]
+        messages = ["ADD api now", "see #12", "nothing"]
+        fast = checklist._done_tasks(tasks, messages)
+        with mock.patch.object(checklist, "ahocorasick", None):
+            self.assertEqual(checklist._done_tasks(tasks, messages), fast)
+
+
+class TestSyncChecklist(unittest.TestCase):
+    def _bundle(self, plan_text, body=""):
+        return {"id": "PR_1", "body": body, "commit_messages": ["done: first"], "plan_text": plan_text}
+
+    def test_writes_checklist_then_skips_unchanged_body(self):
+        with mock.patch.object(checklist, "fetch_pr_bundle", return_value=self._bundle("- First\n- Second")), mock.patch.object(
+            checklist, "_graphql"
+        ) as gql:
+            checklist.sync_checklist("t", "o", "r", 1, None, {})
+        new_body = gql.call_args.args[2]["body"]
+        self.assertIn("- [x] First", new_body)
+        with mock.patch.object(
+            checklist, "fetch_pr_bundle", return_value=self._bundle("- First\n- Second", body=new_body)
+        ), mock.patch.object(checklist, "_graphql") as gql:
+            checklist.sync_checklist("t", "o", "r", 1, None, {})
+        gql.assert_not_called()
+
+    def test_plan_without_tasks_leaves_pr_alone(self):
+        with mock.patch.object(checklist, "fetch_pr_bundle", return_value=self._bundle("---\n[ ]")), mock.patch.object(
+            checklist, "_graphql"
+        ) as gql:
+            checklist.sync_checklist("t", "o", "r", 1, None, {})
+        gql.assert_not_called()
+
+    def _paged_pr(self, plan_comment):
+        return {"repository": {"pullRequest": _pr(messages=["done: first"], end_cursor="c1"), "issue": _issue(comments=[plan_comment])}}
+
+    def _queries(self, gql):
+        return [c.args[1] for c in gql.call_args_list]
+
+    def test_no_tasks_never_pages_commits(self):
+        with mock.patch.object(checklist, "_graphql", side_effect=[self._paged_pr("Automated plan (x)\n\n---")]) as gql:
+            checklist.sync_checklist("t", "o", "r", 1, 5, {})
+        self.assertEqual(self._queries(gql), [checklist.PR_BUNDLE_QUERY])
+
+    def test_stops_paging_once_every_task_is_done(self):
+        with mock.patch.object(checklist, "_graphql", side_effect=[self._paged_pr("Automated plan (x)\n\n- First"), {}]) as gql:
+            checklist.sync_checklist("t", "o", "r", 1, 5, {})
+        self.assertEqual(self._queries(gql), [checklist.PR_BUNDLE_QUERY, checklist.UPDATE_PR_BODY_MUTATION])
+
+
+if __name__ == "__main__":
+    unittest.main()